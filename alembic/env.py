@@ -9,6 +9,7 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from app.database import Base
+import app.models  # noqa: F401  # register models on Base.metadata
 from app.config import settings
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,63 @@
+"""add composite indexes for hot query shapes and uniqueness constraints
+
+Revision ID: 3c9e1f2a7b4d
+Revises:
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e1f2a7b4d'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# (索引名, 表名, 列, 是否唯一)
+INDEXES = [
+    ("ix_courses_teacher_id", "courses", ["teacher_id"], False),
+    ("ix_enrollments_user_course", "enrollments", ["user_id", "course_id"], True),
+    ("ix_enrollments_course_id", "enrollments", ["course_id"], False),
+    ("ix_tasks_course_published_due", "tasks", ["course_id", "is_published", "due_date"], False),
+    ("ix_task_attachments_task_id", "task_attachments", ["task_id"], False),
+    ("ix_task_submissions_task_user", "task_submissions", ["task_id", "user_id"], True),
+    ("ix_task_submissions_user_status", "task_submissions", ["user_id", "status"], False),
+    ("ix_submission_attachments_submission_id", "submission_attachments", ["submission_id"], False),
+    ("ix_course_resources_course_id", "course_resources", ["course_id"], False),
+    ("ix_attendance_user_status", "attendance", ["user_id", "status"], False),
+    ("ix_attendance_user_course_date", "attendance", ["user_id", "course_id", "date"], False),
+    ("ix_calendar_events_user_start", "calendar_events", ["user_id", "start_time"], False),
+    ("ix_calendar_events_course_start", "calendar_events", ["course_id", "start_time"], False),
+]
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    # 重复注册没有意义，保留最早的一条
+    connection.execute(sa.text(
+        "DELETE FROM enrollments WHERE id NOT IN "
+        "(SELECT MIN(id) FROM enrollments GROUP BY user_id, course_id)"
+    ))
+
+    # 重复提交可能带有附件和成绩，不自动删除，需要人工合并
+    duplicates = connection.execute(sa.text(
+        "SELECT task_id, user_id FROM task_submissions "
+        "GROUP BY task_id, user_id HAVING COUNT(*) > 1"
+    )).fetchall()
+    if duplicates:
+        raise RuntimeError(
+            f"task_submissions contains duplicate (task_id, user_id) rows, merge them first: {duplicates[:10]}"
+        )
+
+    # 由 create_all 新建的数据库已经包含这些索引
+    for name, table, columns, unique in INDEXES:
+        op.create_index(name, table, columns, unique=unique, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, columns, unique in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
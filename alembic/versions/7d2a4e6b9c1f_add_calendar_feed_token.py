@@ -0,0 +1,30 @@
+"""add users.calendar_feed_token for calendar subscription feeds
+
+Revision ID: 7d2a4e6b9c1f
+Revises: 3c9e1f2a7b4d
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2a4e6b9c1f'
+down_revision = '3c9e1f2a7b4d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 由 create_all 新建的数据库已经包含该列
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("users")}
+    if "calendar_feed_token" not in columns:
+        op.add_column("users", sa.Column("calendar_feed_token", sa.String(), nullable=True))
+    op.create_index("ix_users_calendar_feed_token", "users", ["calendar_feed_token"], unique=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_calendar_feed_token", table_name="users", if_exists=True)
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("calendar_feed_token")
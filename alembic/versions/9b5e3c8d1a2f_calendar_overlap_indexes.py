@@ -0,0 +1,32 @@
+"""index calendar events by (owner, end_time, start_time) for overlap queries
+
+Revision ID: 9b5e3c8d1a2f
+Revises: 7d2a4e6b9c1f
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9b5e3c8d1a2f'
+down_revision = '7d2a4e6b9c1f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 由 create_all 新建的数据库已经包含新索引
+    op.create_index("ix_calendar_events_user_end_start", "calendar_events",
+                    ["user_id", "end_time", "start_time"], if_not_exists=True)
+    op.create_index("ix_calendar_events_course_end_start", "calendar_events",
+                    ["course_id", "end_time", "start_time"], if_not_exists=True)
+    op.drop_index("ix_calendar_events_user_start", table_name="calendar_events", if_exists=True)
+    op.drop_index("ix_calendar_events_course_start", table_name="calendar_events", if_exists=True)
+
+
+def downgrade() -> None:
+    op.create_index("ix_calendar_events_user_start", "calendar_events", ["user_id", "start_time"], if_not_exists=True)
+    op.create_index("ix_calendar_events_course_start", "calendar_events", ["course_id", "start_time"], if_not_exists=True)
+    op.drop_index("ix_calendar_events_course_end_start", table_name="calendar_events", if_exists=True)
+    op.drop_index("ix_calendar_events_user_end_start", table_name="calendar_events", if_exists=True)
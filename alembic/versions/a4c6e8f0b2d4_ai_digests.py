@@ -0,0 +1,39 @@
+"""add ai_digests table for precomputed dashboard summaries
+
+Revision ID: a4c6e8f0b2d4
+Revises: f2b8d4e6a0c7
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c6e8f0b2d4'
+down_revision = 'f2b8d4e6a0c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 由 create_all 新建的数据库已经包含该表
+    if not sa.inspect(op.get_bind()).has_table("ai_digests"):
+        op.create_table(
+            "ai_digests",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("response", sa.Text(), nullable=False),
+            sa.Column("suggestions", sa.JSON(), nullable=True),
+            sa.Column("learning_tips", sa.JSON(), nullable=True),
+            sa.Column("agent_role", sa.String(), nullable=False),
+            sa.Column("generated_at", sa.DateTime(timezone=True), nullable=False),
+        )
+    op.create_index("ix_ai_digests_id", "ai_digests", ["id"], if_not_exists=True)
+    op.create_index("ix_ai_digests_user_id", "ai_digests", ["user_id"], unique=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ai_digests_user_id", table_name="ai_digests", if_exists=True)
+    op.drop_index("ix_ai_digests_id", table_name="ai_digests", if_exists=True)
+    op.drop_table("ai_digests")
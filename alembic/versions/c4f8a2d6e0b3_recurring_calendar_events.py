@@ -0,0 +1,47 @@
+"""add recurrence columns and series indexes to calendar_events
+
+Revision ID: c4f8a2d6e0b3
+Revises: 9b5e3c8d1a2f
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f8a2d6e0b3'
+down_revision = '9b5e3c8d1a2f'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    sa.Column("rrule", sa.String(), nullable=True),
+    sa.Column("exdates", sa.JSON(), nullable=True),
+    sa.Column("recurrence_end", sa.DateTime(timezone=True), nullable=True),
+]
+SERIES_INDEXES = [
+    ("ix_calendar_events_user_series", ["user_id", "recurrence_end"]),
+    ("ix_calendar_events_course_series", ["course_id", "recurrence_end"]),
+]
+
+
+def upgrade() -> None:
+    # 由 create_all 新建的数据库已经包含这些列和索引
+    existing = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("calendar_events")}
+    for column in COLUMNS:
+        if column.name not in existing:
+            op.add_column("calendar_events", column)
+    for name, columns in SERIES_INDEXES:
+        op.create_index(
+            name, "calendar_events", columns, if_not_exists=True,
+            sqlite_where=sa.text("rrule IS NOT NULL"), postgresql_where=sa.text("rrule IS NOT NULL")
+        )
+
+
+def downgrade() -> None:
+    for name, columns in reversed(SERIES_INDEXES):
+        op.drop_index(name, table_name="calendar_events", if_exists=True)
+    with op.batch_alter_table("calendar_events") as batch_op:
+        for column in reversed(COLUMNS):
+            batch_op.drop_column(column.name)
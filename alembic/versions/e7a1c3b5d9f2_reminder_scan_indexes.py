@@ -0,0 +1,33 @@
+"""index task due dates and event start times for the reminder scheduler
+
+Revision ID: e7a1c3b5d9f2
+Revises: c4f8a2d6e0b3
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a1c3b5d9f2'
+down_revision = 'c4f8a2d6e0b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 由 create_all 新建的数据库已经包含新索引
+    op.create_index("ix_tasks_published_due", "tasks", ["is_published", "due_date"], if_not_exists=True)
+    for name, predicate in (("ix_calendar_events_single_start", "rrule IS NULL"),
+                            ("ix_calendar_events_series_start", "rrule IS NOT NULL")):
+        op.create_index(
+            name, "calendar_events", ["start_time"], if_not_exists=True,
+            sqlite_where=sa.text(predicate), postgresql_where=sa.text(predicate)
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_calendar_events_series_start", table_name="calendar_events", if_exists=True)
+    op.drop_index("ix_calendar_events_single_start", table_name="calendar_events", if_exists=True)
+    op.drop_index("ix_tasks_published_due", table_name="tasks", if_exists=True)
@@ -0,0 +1,44 @@
+"""add outbox_events table for the domain event bus
+
+Revision ID: f2b8d4e6a0c7
+Revises: e7a1c3b5d9f2
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b8d4e6a0c7'
+down_revision = 'e7a1c3b5d9f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 由 create_all 新建的数据库已经包含该表
+    if not sa.inspect(op.get_bind()).has_table("outbox_events"):
+        op.create_table(
+            "outbox_events",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("event_type", sa.String(), nullable=False),
+            sa.Column("payload", sa.JSON(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("claimed_by", sa.String(), nullable=True),
+            sa.Column("claimed_until", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("dispatched_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("last_error", sa.Text(), nullable=True),
+        )
+    op.create_index(
+        "ix_outbox_events_pending", "outbox_events", ["id"], if_not_exists=True,
+        sqlite_where=sa.text("dispatched_at IS NULL"), postgresql_where=sa.text("dispatched_at IS NULL")
+    )
+    op.create_index("ix_outbox_events_dispatched_at", "outbox_events", ["dispatched_at"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_outbox_events_dispatched_at", table_name="outbox_events", if_exists=True)
+    op.drop_index("ix_outbox_events_pending", table_name="outbox_events", if_exists=True)
+    op.drop_table("outbox_events")
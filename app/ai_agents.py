@@ -5,11 +5,11 @@ SUMA LMS AI智能体系统
 
 from typing import Dict, List, Optional, Any
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 import json
-import ollama
 from app.config import settings
+from app.ollama_client import OllamaClient, ollama_client
 
 
 class AgentRole(Enum):
@@ -42,6 +42,42 @@ class AgentLimitations:
     must_guide_learning: bool = True
 
 
+@dataclass
+class GenerationConfig:
+    """智能体使用的模型与生成参数；extra_options 为其他Ollama参数（top_p、num_ctx等），原样传给Ollama"""
+    model: str
+    temperature: float = 0.7
+    num_predict: int = 500
+    extra_options: Dict[str, Any] = field(default_factory=dict)
+    
+    @property
+    def options(self) -> Dict[str, Any]:
+        return {**self.extra_options, "temperature": self.temperature, "num_predict": self.num_predict}
+
+
+# 各角色默认生成参数：分析、提示类回答较短，概念解释和写作/代码评审保留较长输出
+DEFAULT_GENERATION_OPTIONS = {
+    AgentRole.LEARNING_MENTOR: {"temperature": 0.7, "num_predict": 400},
+    AgentRole.CONCEPT_EXPLAINER: {"temperature": 0.6, "num_predict": 500},
+    AgentRole.PROBLEM_GUIDE: {"temperature": 0.6, "num_predict": 400},
+    AgentRole.WRITING_ASSISTANT: {"temperature": 0.7, "num_predict": 500},
+    AgentRole.CODE_REVIEWER: {"temperature": 0.3, "num_predict": 500},
+    AgentRole.LEARNING_ANALYST: {"temperature": 0.5, "num_predict": 300},
+}
+
+
+def get_generation_config(role: AgentRole) -> GenerationConfig:
+    """合并默认值与配置中的按角色覆盖项"""
+    options = dict(DEFAULT_GENERATION_OPTIONS.get(role, {}))
+    options.update(settings.ollama_agent_options.get(role.value, {}))
+    return GenerationConfig(
+        model=settings.ollama_agent_models.get(role.value, settings.ollama_model),
+        temperature=options.pop("temperature", GenerationConfig.temperature),
+        num_predict=options.pop("num_predict", GenerationConfig.num_predict),
+        extra_options=options
+    )
+
+
 @dataclass
 class UserContext:
     """用户上下文信息"""
@@ -63,28 +99,44 @@ class AIAgent:
         self.capabilities = capabilities
         self.limitations = limitations
         self.system_prompt = system_prompt
-        self.client = ollama.Client(host=settings.ollama_base_url)
+        # 固定不变的系统提示前缀只构建一次，并始终作为第一条消息发送，
+        # 使Ollama可以复用已计算的前缀
+        self.system_prefix = self._build_system_prefix()
+        self.generation = get_generation_config(role)
+        self.client: OllamaClient = ollama_client
     
     async def process_query(self, query: str, context: UserContext, 
-                          additional_context: str = "") -> Dict[str, Any]:
-        """处理用户查询"""
+                          additional_context: str = "",
+                          history: Optional[List[Dict[str, str]]] = None,
+                          session_id: Optional[str] = None) -> Dict[str, Any]:
+        """处理用户查询；history 为会话中已有的消息"""
         # 检查查询是否合规
         if not self._is_query_appropriate(query, context):
             return self._generate_guidance_response(query, context)
         
         # 生成响应
-        response = await self._generate_response(query, context, additional_context)
+        error = None
+        try:
+            response = await self._generate_response(
+                query, context, additional_context, history, session_id
+            )
+        except Exception as e:
+            error = str(e)
+            response = f"抱歉，我暂时无法处理你的请求。请稍后再试。错误信息: {error}"
         
         # 后处理响应
         processed_response = self._post_process_response(response, context)
         
-        return {
+        result = {
             "agent_role": self.role.value,
             "response": processed_response,
             "suggestions": self._generate_suggestions(query, processed_response),
             "learning_tips": self._generate_learning_tips(context),
             "timestamp": datetime.now().isoformat()
         }
+        if error:
+            result["error"] = error
+        return result
     
     def _is_query_appropriate(self, query: str, context: UserContext) -> bool:
         """检查查询是否适合当前智能体处理"""
@@ -120,32 +172,46 @@ class AIAgent:
         }
     
     async def _generate_response(self, query: str, context: UserContext, 
-                               additional_context: str) -> str:
+                               additional_context: str,
+                               history: Optional[List[Dict[str, str]]] = None,
+                               session_id: Optional[str] = None) -> str:
         """生成AI响应"""
-        full_prompt = self._build_prompt(query, context, additional_context)
-        
-        try:
-            response = self.client.chat(
-                model=settings.ollama_model,
-                messages=[
-                    {"role": "system", "content": full_prompt},
-                    {"role": "user", "content": query}
-                ],
-                options={
-                    "temperature": 0.7,
-                    "num_predict": 500
-                }
-            )
-            return response['message']['content']
-        except Exception as e:
-            return f"抱歉，我暂时无法处理你的请求。请稍后再试。错误信息: {str(e)}"
+        # 消息顺序：固定前缀 -> 用户上下文 -> 会话历史 -> 本次问题，越稳定的部分越靠前
+        messages = [
+            {"role": "system", "content": self.system_prefix},
+            {"role": "system", "content": self._build_context_prompt(context, additional_context)}
+        ]
+        messages.extend(history or [])
+        messages.append({"role": "user", "content": query})
+        
+        # 会话请求固定到同一后端，使多轮对话复用该节点上的KV缓存
+        response = await self.client.chat(
+            model=self.generation.model,
+            messages=messages,
+            options=self.generation.options,
+            keep_alive=settings.ollama_keep_alive,
+            affinity_key=session_id
+        )
+        return response['message']['content']
+    
+    def _build_system_prefix(self) -> str:
+        """构建智能体固定的系统提示（角色设定 + 重要提醒）"""
+        prompt_parts = [
+            self.system_prompt.strip(),
+            "\n重要提醒:",
+            "1. 不要直接提供作业答案或完整解决方案",
+            "2. 通过提问和引导来帮助学生思考",
+            "3. 提供学习方法和思路，而不是结果",
+            "4. 鼓励学生独立思考和探索",
+            "5. 如果学生要求直接答案，引导他们思考过程"
+        ]
+        return "\n".join(prompt_parts)
     
-    def _build_prompt(self, query: str, context: UserContext, 
-                     additional_context: str) -> str:
-        """构建完整的提示"""
+    def _build_context_prompt(self, context: UserContext, 
+                              additional_context: str) -> str:
+        """构建随用户变化的上下文提示"""
         prompt_parts = [
-            self.system_prompt,
-            f"\n用户上下文信息:",
+            "用户上下文信息:",
             f"- 学习水平: {context.learning_level}",
             f"- 课程ID: {context.course_id or '未指定'}",
             f"- 任务ID: {context.task_id or '未指定'}",
@@ -157,15 +223,6 @@ class AIAgent:
         if additional_context:
             prompt_parts.append(f"\n额外上下文: {additional_context}")
         
-        prompt_parts.extend([
-            "\n重要提醒:",
-            "1. 不要直接提供作业答案或完整解决方案",
-            "2. 通过提问和引导来帮助学生思考",
-            "3. 提供学习方法和思路，而不是结果",
-            "4. 鼓励学生独立思考和探索",
-            "5. 如果学生要求直接答案，引导他们思考过程"
-        ])
-        
         return "\n".join(prompt_parts)
     
     def _post_process_response(self, response: str, context: UserContext) -> str:
@@ -456,7 +513,8 @@ Important principles:
 class AgentManager:
     """智能体管理器"""
     
-    def __init__(self):
+    def __init__(self, client: Optional[OllamaClient] = None):
+        self.client = client or ollama_client
         self.agents = {
             AgentRole.LEARNING_MENTOR: LearningMentor(),
             AgentRole.CONCEPT_EXPLAINER: ConceptExplainer(),
@@ -465,16 +523,75 @@ class AgentManager:
             AgentRole.CODE_REVIEWER: CodeReviewer(),
             AgentRole.LEARNING_ANALYST: LearningAnalyst()
         }
+        
+        # 所有智能体复用同一个连接池
+        for agent in self.agents.values():
+            agent.client = self.client
     
     async def route_query(self, query: str, context: UserContext, 
-                         preferred_agent: Optional[AgentRole] = None) -> Dict[str, Any]:
+                         preferred_agent: Optional[AgentRole] = None,
+                         history: Optional[List[Dict[str, str]]] = None,
+                         session_id: Optional[str] = None) -> Dict[str, Any]:
         """路由查询到合适的智能体"""
         if preferred_agent and preferred_agent in self.agents:
             agent = self.agents[preferred_agent]
         else:
-            agent = self._select_best_agent(query, context)
+            agent = await self._select_agent(query, context)
+        
+        return await agent.process_query(
+            query, context, history=history, session_id=session_id
+        )
+    
+    async def _select_agent(self, query: str, context: UserContext) -> AIAgent:
+        """配置了路由模型时用小模型分类，失败则回退到关键词路由"""
+        if settings.ollama_router_model:
+            role = await self._classify_query(query)
+            if role:
+                return self.agents[role]
+        
+        return self._select_best_agent(query, context)
+    
+    async def _classify_query(self, query: str) -> Optional[AgentRole]:
+        """使用小型分类模型判断查询应由哪个智能体处理"""
+        role_lines = [
+            f"- {role.value}: {self._get_agent_description(role)}"
+            for role in AgentRole
+        ]
+        system_prompt = "\n".join([
+            "Classify the student's query into exactly one of these agent roles:",
+            *role_lines,
+            "Reply with the role name only."
+        ])
         
-        return await agent.process_query(query, context)
+        try:
+            response = await self.client.chat(
+                model=settings.ollama_router_model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": query}
+                ],
+                options={"temperature": 0, "num_predict": 10},
+                keep_alive=settings.ollama_keep_alive
+            )
+        except Exception:
+            return None
+        
+        answer = response['message']['content'].strip().lower()
+        for role in AgentRole:
+            if role.value in answer:
+                return role
+        return None
+    
+    async def warm_up(self):
+        """预加载所有配置的模型，并预先计算各智能体的系统提示前缀"""
+        primers = [
+            (agent.generation.model, [{"role": "system", "content": agent.system_prefix}])
+            for agent in self.agents.values()
+        ]
+        if settings.ollama_router_model:
+            primers.append((settings.ollama_router_model, []))
+        
+        await self.client.warm_up(primers, keep_alive=settings.ollama_keep_alive)
     
     def _select_best_agent(self, query: str, context: UserContext) -> AIAgent:
         """根据查询内容选择最合适的智能体"""
@@ -516,6 +633,7 @@ class AgentManager:
         
         return {
             "role": agent.role.value,
+            "model": agent.generation.model,
             "capabilities": agent.capabilities.__dict__,
             "limitations": agent.limitations.__dict__,
             "description": self._get_agent_description(role)
@@ -532,3 +650,7 @@ class AgentManager:
             AgentRole.LEARNING_ANALYST: "Learning analyst, analyzes your learning progress and provides recommendations"
         }
         return descriptions.get(role, "AI Learning Assistant")
+
+
+# 创建全局智能体管理器实例
+agent_manager = AgentManager()
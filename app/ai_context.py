@@ -0,0 +1,118 @@
+"""
+SUMA LMS AI用户上下文
+为智能体构建用户的学习上下文信息。每个用户的学习画像缓存在进程内，
+CRUD层提交任务、课程和选课事件时失效（事件总线的 on_commit 回调），请求路径上命中缓存时不访问数据库
+"""
+
+from typing import Dict, List, Optional
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.ai_agents import UserContext
+from app.config import settings
+from app.crud import get_user_courses, get_upcoming_course_names
+from app.events import event_bus
+from app.models import User
+
+
+@dataclass
+class LearningProfile:
+    """用户学习画像"""
+    user_id: int
+    learning_level: str
+    courses: Dict[int, str] = field(default_factory=dict)  # 已选课程 {course_id: name}
+    recent_topics: List[str] = field(default_factory=list)
+    loaded_at: datetime = field(default_factory=datetime.utcnow)
+
+    def subject_area(self, course_id: Optional[int] = None) -> Optional[str]:
+        """指定课程时使用该课程，否则由已选课程推断学科领域"""
+        if course_id in self.courses:
+            return self.courses[course_id]
+        if self.courses:
+            return ", ".join(list(self.courses.values())[:3])
+        return None
+
+
+class LearningProfileCache:
+    """进程内的用户学习画像缓存
+
+    任务写入使选了该课程（任务换课程时包括原课程）的用户失效，课程修改同样按课程失效，选课写入使该用户失效；
+    另有TTL兜底，使30天内即将到期任务的窗口随时间推移而更新。
+    """
+
+    def __init__(self):
+        self.profiles: Dict[int, LearningProfile] = {}
+
+    async def get(self, db: AsyncSession, user: User) -> LearningProfile:
+        """获取用户画像，未命中或已过期时从数据库加载"""
+        profile = self.profiles.get(user.id)
+        ttl = timedelta(minutes=settings.ai_context_ttl_minutes)
+        if profile is None or datetime.utcnow() - profile.loaded_at > ttl:
+            profile = await self._load(db, user)
+            self.profiles[user.id] = profile
+        return profile
+
+    def invalidate_user(self, user_id: int):
+        self.profiles.pop(user_id, None)
+
+    def invalidate_course(self, course_id: int):
+        """课程或其任务变化时，使所有选了该课程的用户画像失效"""
+        stale = [uid for uid, profile in self.profiles.items() if course_id in profile.courses]
+        for user_id in stale:
+            del self.profiles[user_id]
+
+    def handle_event(self, event_type: str, payload: Dict):
+        """事件总线的提交回调"""
+        if event_type.startswith("task."):
+            self.invalidate_course(payload["course_id"])
+            if payload.get("previous_course_id") is not None:
+                self.invalidate_course(payload["previous_course_id"])
+        elif event_type == "course.updated":
+            self.invalidate_course(payload["id"])
+        elif event_type == "enrollment.created":
+            self.invalidate_user(payload["user_id"])
+
+    async def _load(self, db: AsyncSession, user: User) -> LearningProfile:
+        courses = await get_user_courses(db, user.id)
+        recent_topics = list(dict.fromkeys(await get_upcoming_course_names(db, user.id, 30, 5)))
+        return LearningProfile(
+            user_id=user.id,
+            learning_level=get_learning_level(user),
+            courses={course.id: course.name for course in courses},
+            recent_topics=recent_topics
+        )
+
+
+def get_learning_level(user: User) -> str:
+    """根据用户角色确定学习水平"""
+    if user.role.value == "teacher":
+        return "advanced"
+    elif user.role.value == "admin":
+        return "expert"
+    return "beginner"
+
+
+async def build_user_context(user: User, course_id: Optional[int] = None, 
+                             task_id: Optional[int] = None, db: AsyncSession = None) -> UserContext:
+    """构建用户上下文信息"""
+    if db:
+        profile = await learning_profiles.get(db, user)
+    else:
+        profile = learning_profiles.profiles.get(user.id) or LearningProfile(
+            user_id=user.id, learning_level=get_learning_level(user)
+        )
+    
+    return UserContext(
+        user_id=user.id,
+        course_id=course_id,
+        task_id=task_id,
+        learning_level=profile.learning_level,
+        subject_area=profile.subject_area(course_id),
+        recent_topics=profile.recent_topics,
+        learning_goals=["提高学习效率", "掌握核心概念", "培养批判性思维"]
+    )
+
+
+# 创建全局学习画像缓存实例
+learning_profiles = LearningProfileCache()
+event_bus.on_commit(learning_profiles.handle_event)
@@ -0,0 +1,123 @@
+"""
+SUMA LMS AI学习摘要批处理
+离线为所有活跃学生预生成仪表板学习分析摘要，仪表板接口直接读取存储结果
+"""
+
+from typing import Any, Dict, Optional
+from datetime import datetime, timedelta
+import asyncio
+import logging
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.ai_agents import AgentRole, agent_manager
+from app.ai_context import build_user_context
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import AIDigest, User, UserRole
+from app.ollama_client import ollama_client
+
+logger = logging.getLogger(__name__)
+
+DIGEST_QUERY = "请分析我的学习情况并提供个性化建议"
+
+
+async def get_user_digest(db: AsyncSession, user_id: int) -> Optional[AIDigest]:
+    return await db.scalar(select(AIDigest).where(AIDigest.user_id == user_id))
+
+
+def is_digest_stale(digest: AIDigest) -> bool:
+    """摘要是否已超过有效期（ai_digest_max_age_minutes）"""
+    return datetime.utcnow() - digest.generated_at.replace(tzinfo=None) > timedelta(minutes=settings.ai_digest_max_age_minutes)
+
+
+async def _store_digest(db: AsyncSession, user_id: int, result: Dict[str, Any]) -> AIDigest:
+    """写入或更新用户摘要（不提交）"""
+    digest = await get_user_digest(db, user_id)
+    if digest is None:
+        digest = AIDigest(user_id=user_id)
+        db.add(digest)
+
+    digest.response = result["response"]
+    digest.suggestions = result.get("suggestions", [])
+    digest.learning_tips = result.get("learning_tips", [])
+    digest.agent_role = result["agent_role"]
+    digest.generated_at = datetime.utcnow()
+    return digest
+
+
+async def generate_user_digest(db: AsyncSession, user: User) -> Optional[AIDigest]:
+    """为单个用户生成并保存摘要，生成失败时返回None"""
+    result = await agent_manager.route_query(
+        query=DIGEST_QUERY,
+        context=await build_user_context(user, db=db),
+        preferred_agent=AgentRole.LEARNING_ANALYST
+    )
+    if result.get("error"):
+        return None
+
+    digest = await _store_digest(db, user.id, result)
+    await db.commit()
+    return digest
+
+
+async def generate_all_digests(db: AsyncSession, force: bool = False,
+                               concurrency: Optional[int] = None) -> Dict[str, int]:
+    """为所有活跃学生生成摘要，推理请求并发数受限
+
+    force 为 False 时跳过仍在有效期内的摘要。
+    """
+    students = (await db.scalars(
+        select(User).where(
+            User.role == UserRole.STUDENT,
+            User.is_active == True
+        )
+    )).all()
+
+    skipped = 0
+    if not force:
+        cutoff = datetime.utcnow() - timedelta(minutes=settings.ai_digest_max_age_minutes)
+        fresh_ids = set(await db.scalars(
+            select(AIDigest.user_id).where(AIDigest.generated_at >= cutoff)
+        ))
+        skipped = sum(1 for student in students if student.id in fresh_ids)
+        students = [student for student in students if student.id not in fresh_ids]
+
+    # 先在当前会话中完成所有数据库查询，再并发调用模型
+    contexts = {student.id: await build_user_context(student, db=db) for student in students}
+    semaphore = asyncio.Semaphore(concurrency or settings.ai_digest_concurrency)
+
+    async def run(user_id: int, context):
+        async with semaphore:
+            result = await agent_manager.route_query(
+                query=DIGEST_QUERY,
+                context=context,
+                preferred_agent=AgentRole.LEARNING_ANALYST
+            )
+            return user_id, result
+
+    results = await asyncio.gather(*(run(user_id, context) for user_id, context in contexts.items()))
+
+    generated = failed = 0
+    for user_id, result in results:
+        if result.get("error"):
+            failed += 1
+            continue
+        await _store_digest(db, user_id, result)
+        generated += 1
+    await db.commit()
+
+    return {"generated": generated, "failed": failed, "skipped": skipped}
+
+
+async def run_digest_scheduler():
+    """进程内定时任务：按配置间隔刷新摘要"""
+    interval = settings.ai_digest_interval_minutes * 60
+    while True:
+        if await ollama_client.is_healthy():
+            async with AsyncSessionLocal() as db:
+                try:
+                    stats = await generate_all_digests(db)
+                    logger.info("AI digests refreshed: %s", stats)
+                except Exception:
+                    logger.exception("AI digest generation failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,144 @@
+"""
+SUMA LMS AI对话会话
+在服务端保存多轮对话，按token预算组装历史消息
+"""
+
+from typing import Dict, List, Optional
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import uuid
+from app.ai_agents import AgentRole
+from app.config import settings
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中日韩字符约1个token，其余约4个字符1个token"""
+    cjk = sum(1 for ch in text if "\u2e80" <= ch <= "\u9fff" or "\uac00" <= ch <= "\ud7af")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+@dataclass
+class ConversationTurn:
+    """单条对话消息"""
+    role: str  # user, assistant
+    content: str
+    tokens: int
+
+
+@dataclass
+class ConversationSession:
+    """对话会话"""
+    session_id: str
+    user_id: int
+    agent_role: AgentRole
+    conversation_type: str
+    turns: List[ConversationTurn] = field(default_factory=list)
+    summary_lines: List[str] = field(default_factory=list)  # 被压缩的早期对话
+    created_at: datetime = field(default_factory=datetime.now)
+    last_active: datetime = field(default_factory=datetime.now)
+
+    @property
+    def history_tokens(self) -> int:
+        return sum(turn.tokens for turn in self.turns) + sum(
+            estimate_tokens(line) for line in self.summary_lines
+        )
+
+
+class ConversationStore:
+    """内存中的对话会话存储"""
+
+    SUMMARY_LINE_CHARS = 80  # 压缩后每条早期消息保留的字符数
+
+    def __init__(self):
+        self.sessions: Dict[str, ConversationSession] = {}
+
+    def get(self, user_id: int, session_id: str) -> Optional[ConversationSession]:
+        """获取用户自己的未过期会话"""
+        self._evict_expired()
+        session = self.sessions.get(session_id)
+        if session is None or session.user_id != user_id:
+            return None
+        return session
+
+    def get_or_create(self, user_id: int, session_id: Optional[str],
+                      agent_role: AgentRole, conversation_type: str) -> ConversationSession:
+        """获取已有会话，不存在或已过期时创建新会话"""
+        session = self.get(user_id, session_id) if session_id else None
+        if session:
+            return session
+
+        user_sessions = sorted(
+            (s for s in self.sessions.values() if s.user_id == user_id),
+            key=lambda s: s.last_active
+        )
+        # 超过每个用户的会话上限时丢弃最久未活跃的会话
+        for stale in user_sessions[:max(0, len(user_sessions) - settings.ai_session_max_per_user + 1)]:
+            del self.sessions[stale.session_id]
+
+        session = ConversationSession(
+            session_id=uuid.uuid4().hex,
+            user_id=user_id,
+            agent_role=agent_role,
+            conversation_type=conversation_type
+        )
+        self.sessions[session.session_id] = session
+        return session
+
+    def delete(self, user_id: int, session_id: str) -> bool:
+        """删除会话"""
+        if self.get(user_id, session_id) is None:
+            return False
+        del self.sessions[session_id]
+        return True
+
+    def build_history(self, session: ConversationSession) -> List[Dict[str, str]]:
+        """组装发送给模型的历史消息（早期对话摘要 + 最近的完整轮次）"""
+        messages = []
+        if session.summary_lines:
+            messages.append({
+                "role": "system",
+                "content": "之前的对话摘要:\n" + "\n".join(session.summary_lines)
+            })
+        messages.extend({"role": turn.role, "content": turn.content} for turn in session.turns)
+        return messages
+
+    def append_exchange(self, session: ConversationSession, query: str, response: str):
+        """记录一轮问答，超出预算时压缩最早的轮次"""
+        session.turns.append(ConversationTurn("user", query, estimate_tokens(query)))
+        session.turns.append(ConversationTurn("assistant", response, estimate_tokens(response)))
+        session.last_active = datetime.now()
+
+        if session.history_tokens > settings.ai_session_history_tokens:
+            self._compact(session)
+
+    def _compact(self, session: ConversationSession):
+        """把最早的轮次压缩为摘要，直到历史降到预算的一半。
+
+        一次腾出一半预算，使之后若干轮的消息前缀保持不变，模型端的KV缓存可以继续复用。
+        """
+        target = settings.ai_session_history_tokens // 2
+        labels = {"user": "学生", "assistant": "助手"}
+
+        # 至少保留最近一轮完整问答
+        while session.history_tokens > target and len(session.turns) > 2:
+            turn = session.turns.pop(0)
+            text = " ".join(turn.content.split())
+            if len(text) > self.SUMMARY_LINE_CHARS:
+                text = text[:self.SUMMARY_LINE_CHARS] + "…"
+            session.summary_lines.append(f"{labels.get(turn.role, turn.role)}: {text}")
+
+        # 摘要本身也有预算，超出时丢弃最早的摘要行
+        while (session.summary_lines and
+               sum(estimate_tokens(line) for line in session.summary_lines) > settings.ai_session_summary_tokens):
+            session.summary_lines.pop(0)
+
+    def _evict_expired(self):
+        """清理过期会话"""
+        cutoff = datetime.now() - timedelta(minutes=settings.ai_session_ttl_minutes)
+        expired = [sid for sid, s in self.sessions.items() if s.last_active < cutoff]
+        for session_id in expired:
+            del self.sessions[session_id]
+
+
+# 创建全局会话存储实例
+conversation_store = ConversationStore()
@@ -0,0 +1,191 @@
+"""
+SUMA LMS 响应压缩
+根据 Accept-Encoding 协商 brotli / gzip 压缩响应体，小于阈值的响应不压缩；
+流式响应逐块压缩并刷新，客户端可以边收边解压。
+可缓存的内容（如ICS导出）以预压缩形式保存，请求时直接返回对应编码的字节
+"""
+
+from typing import Dict, Optional, Tuple
+from dataclasses import dataclass, field
+import gzip
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # brotli 未安装时只使用 gzip
+    brotli = None
+
+# 已经压缩过或不适合压缩的内容类型
+EXCLUDED_CONTENT_TYPES = (
+    "application/gzip", "application/zip", "application/pdf", "application/octet-stream",
+    "image/", "audio/", "video/", "font/woff", "text/event-stream",
+)
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    """服务端支持的编码，按优先级排列"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """根据 Accept-Encoding 选择编码，客户端不接受任何支持的编码时返回 None"""
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in supported_encodings():
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class StreamCompressor:
+    """增量压缩器，flush 时输出已压缩的数据，finish 时结束压缩流"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=settings.compression_brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, finish: bool) -> bytes:
+        if self.encoding == "br":
+            output = self._compressor.process(data)
+            return output + (self._compressor.finish() if finish else self._compressor.flush())
+        output = self._compressor.compress(data)
+        return output + self._compressor.flush(zlib.Z_FINISH if finish else zlib.Z_SYNC_FLUSH)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """一次性压缩完整的数据"""
+    if encoding == "br":
+        return brotli.compress(data, quality=settings.compression_brotli_quality)
+    return gzip.compress(data, compresslevel=settings.compression_gzip_level)
+
+
+class CompressionMiddleware:
+    """协商压缩中间件
+
+    已设置 Content-Encoding 的响应（如预压缩内容）、部分内容响应和排除的内容类型原样返回；
+    完整响应体小于 minimum_size 时不压缩。
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _CompressionResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressionResponder:
+    """单个请求的压缩状态：缓存响应头，直到看到第一块响应体后再决定是否压缩"""
+
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Optional[Send] = None
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "").lower()
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] in (204, 206, 304)
+                or content_type.startswith(EXCLUDED_CONTENT_TYPES)
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start_message = message
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start_message, self.start_message = self.start_message, None
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(start_message)
+                await self.send(message)
+                return
+
+            self.compressor = StreamCompressor(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            if more_body:
+                # 流式响应：总长度未知
+                del headers["Content-Length"]
+                message["body"] = self.compressor.compress(body, finish=False)
+            else:
+                message["body"] = self.compressor.compress(body, finish=True)
+                headers["Content-Length"] = str(len(message["body"]))
+            await self.send(start_message)
+            await self.send(message)
+            return
+
+        message["body"] = self.compressor.compress(body, finish=not more_body)
+        await self.send(message)
+
+
+@dataclass
+class PrecompressedBody:
+    """预先压缩好的响应体，每种编码只压缩一次"""
+    content: bytes
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, content: bytes) -> "PrecompressedBody":
+        return cls(content=content, encoded={encoding: compress(content, encoding) for encoding in supported_encodings()})
+
+    def response(self, request: Request, media_type: str, headers: Optional[Dict[str, str]] = None) -> Response:
+        """按请求的 Accept-Encoding 返回对应编码的响应"""
+        response_headers = dict(headers or {})
+        response_headers["Vary"] = "Accept-Encoding"
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        if encoding in self.encoded:
+            response_headers["Content-Encoding"] = encoding
+            return Response(self.encoded[encoding], media_type=media_type, headers=response_headers)
+        return Response(self.content, media_type=media_type, headers=response_headers)
@@ -1,11 +1,31 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Any, Dict, List, Optional
 import os
 
 
 class Settings(BaseSettings):
     # 数据库配置
     database_url: str = "sqlite:///./suma.db"
+    # 请求处理使用的异步数据库URL，为空时由 database_url 推导（sqlite+aiosqlite / postgresql+asyncpg）
+    async_database_url: Optional[str] = None
+    # 只读副本URL列表，GET接口的查询轮询分发到副本（为空时全部使用主库）
+    database_replica_urls: List[str] = []
+    db_read_your_writes_seconds: float = 5.0  # 用户写入后该时间内的读请求仍走主库
+    
+    # 数据库连接池配置（同步和异步引擎各自使用一个连接池）
+    db_pool_size: int = 10
+    db_max_overflow: int = 20  # 超出 pool_size 后允许临时创建的连接数
+    db_pool_timeout: float = 30.0  # 等待空闲连接的最长秒数
+    db_pool_recycle: int = 1800  # 连接最长复用秒数，避免被服务端断开
+    db_pool_pre_ping: bool = True  # 借出前检测连接是否可用
+    db_pool_slow_checkout_ms: float = 100.0  # 借出等待超过该值计为慢借出
+    db_raise_on_lazy_load: bool = False  # 测试/CI中开启：关系懒加载查询直接报错，防止N+1回归
+    
+    # SQLite连接参数（通过PRAGMA在每个新连接上设置）
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000  # 写锁冲突时的等待毫秒数
+    sqlite_mmap_size: int = 268435456  # 256MB 内存映射读取
     
     # 安全配置
     secret_key: str = "your-secret-key-change-this-in-production"
@@ -15,6 +35,85 @@ class Settings(BaseSettings):
     # Ollama AI配置
     ollama_base_url: str = "http://localhost:11434"
     ollama_model: str = "llama3.1:8b"  # 默认模型，可以更改
+    # 按智能体角色覆盖模型和生成参数，例如 {"learning_analyst": "llama3.2:3b"}
+    ollama_agent_models: Dict[str, str] = {}
+    # 生成参数可以是任意Ollama选项，例如 {"learning_analyst": {"temperature": 0.2, "top_p": 0.9}}
+    ollama_agent_options: Dict[str, Dict[str, Any]] = {}
+    # 用于查询路由的小型分类模型（为空时使用关键词路由）
+    ollama_router_model: Optional[str] = None
+    
+    # Ollama连接池配置（所有智能体和健康检查共享一个客户端）
+    ollama_max_connections: int = 20
+    ollama_max_keepalive_connections: int = 10
+    ollama_keepalive_expiry: float = 60.0  # 空闲连接保持秒数
+    ollama_connect_timeout: float = 5.0
+    ollama_request_timeout: float = 120.0  # 推理请求超时（秒）
+    ollama_health_timeout: float = 5.0  # 健康检查超时（秒）
+    
+    # 多推理后端配置（为空时只使用 ollama_base_url）
+    ollama_base_urls: List[str] = []
+    ollama_max_attempts: int = 3  # 单次请求最多尝试的后端数
+    ollama_eject_after_failures: int = 2  # 连续失败多少次后摘除后端
+    ollama_eject_seconds: float = 30.0  # 摘除时长（秒）
+    ollama_health_cache_seconds: float = 10.0  # 近期有成功请求时跳过健康探测
+    ollama_keep_alive: str = "30m"  # 模型在Ollama中的常驻时长，"-1" 表示一直常驻
+    ollama_warmup_on_startup: bool = True  # 启动时预加载模型和智能体提示前缀
+    
+    # AI对话会话配置
+    ai_session_ttl_minutes: int = 60
+    ai_session_max_per_user: int = 5
+    ai_session_history_tokens: int = 1500  # 历史消息token预算
+    ai_session_summary_tokens: int = 300  # 早期对话摘要token预算
+    ai_context_ttl_minutes: int = 30  # 用户学习画像缓存有效期
+    
+    # AI学习摘要批处理配置
+    ai_digest_concurrency: int = 4  # 批处理时同时进行的推理请求数
+    ai_digest_max_age_minutes: int = 720  # 摘要有效期，过期后由批处理刷新
+    ai_digest_interval_minutes: int = 0  # 进程内定时刷新间隔，0 表示不启用（使用 generate_digests.py）
+    
+    # 逾期状态批处理配置
+    overdue_sweep_interval_minutes: int = 5  # 进程内定时执行间隔，0 表示不启用
+    overdue_sweep_batch_size: int = 1000  # 每批更新/插入的行数
+    
+    # 截止提醒调度配置
+    reminder_scheduler_enabled: bool = True  # 多进程部署时只在一个进程中启用
+    reminder_offsets_minutes: List[int] = [1440, 60]  # 在截止/开始前多少分钟提醒
+    reminder_horizon_hours: int = 24  # 内存中保存的提醒时间窗口
+    
+    # 实时推送配置：memory:// 为进程内广播，多进程部署使用 redis://host:6379/0
+    broadcast_url: str = "memory://"
+    ws_send_timeout_seconds: float = 5.0  # 推送超时的连接直接断开
+    
+    # 领域事件发件箱配置
+    outbox_dispatcher_enabled: bool = True  # 进程内分发器，多进程部署时各进程按租约领取不同批次
+    outbox_batch_size: int = 100  # 每次领取的事件数
+    outbox_poll_interval_seconds: float = 5  # 没有提交唤醒时检查其他进程写入和重试的间隔
+    outbox_lease_seconds: int = 60  # 领取后的租约时长，失败或进程崩溃的事件在租约过期后重试
+    outbox_max_attempts: int = 5  # 超过该次数仍失败的事件不再重试（保留 last_error）
+    outbox_retention_days: int = 7  # 已分发事件的保留天数
+    
+    # 列表接口分页配置（请求不带 limit 和 cursor 时返回完整列表）
+    default_page_size: int = 50  # 只带 cursor 时的每页条数
+    max_page_size: int = 200
+    
+    # 响应压缩配置（brotli 未安装时只使用 gzip）
+    compression_minimum_size: int = 1024  # 小于该字节数的响应不压缩
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 5
+    ics_export_cache_ttl_minutes: int = 10  # 预压缩ICS导出的缓存有效期
+    ics_export_cache_per_user: int = 4  # 每个用户缓存的导出时间范围数
+    
+    # 日历视图单次查询的最大天数
+    calendar_max_range_days: int = 366
+    calendar_expansion_cache_size: int = 4096  # 重复事件展开结果缓存条数（按系列和时间窗口）
+    
+    # 日历订阅链接包含的时间范围
+    calendar_feed_past_days: int = 30
+    calendar_feed_future_days: int = 365
+    
+    # 课程空闲/忙碌查询：最大天数，截止时间之前计为忙碌的分钟数
+    freebusy_max_range_days: int = 62
+    freebusy_deadline_buffer_minutes: int = 60
     
     # 文件上传配置
     upload_dir: str = "./uploads"
@@ -1,37 +1,129 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import and_, or_, func, literal, select, union_all, update
+from sqlalchemy.sql import Select
+from typing import List, Optional, Tuple
 from datetime import datetime, timedelta
+import secrets
 from app.models import (
-    User, Course, Task, TaskSubmission, CourseResource, 
+    User, Course, Task, TaskSubmission, TaskStatus, CourseResource,
     Attendance, CalendarEvent, Enrollment, TaskAttachment, SubmissionAttachment
 )
 from app.schemas import (
-    UserCreate, UserUpdate, CourseCreate, CourseUpdate, 
+    UserCreate, UserUpdate, CourseCreate, CourseUpdate,
     TaskCreate, TaskUpdate, TaskSubmissionCreate, TaskSubmissionUpdate,
     CourseResourceCreate, AttendanceCreate, CalendarEventCreate
 )
 from app.auth import get_password_hash
+from app.pagination import PageParams, keyset
+from app.recurrence import as_naive_utc, expand, merge, normalize_rrule, series_end
+from app.events import record_event
+
+
+# Loader strategies for the relationships serialized by the response schemas.
+# Many-to-one references are joined into the main query; collections use a
+# second SELECT ... IN per level so parent rows are not multiplied. Async
+# sessions cannot lazy load, so every query returning these objects uses them.
+COURSE_OPTIONS = (joinedload(Course.teacher),)
+TASK_OPTIONS = (
+    joinedload(Task.course).joinedload(Course.teacher),
+    selectinload(Task.attachments),
+)
+SUBMISSION_OPTIONS = (
+    joinedload(TaskSubmission.user),
+    selectinload(TaskSubmission.attachments),
+)
+ATTENDANCE_OPTIONS = (joinedload(Attendance.user),)
+EVENT_OPTIONS = (joinedload(CalendarEvent.course).joinedload(Course.teacher),)
+
+# Column projections for list views (summary=True). They return plain rows
+# matching the *Summary schemas, with no ORM objects or relationship loads.
+COURSE_SUMMARY_COLUMNS = (
+    Course.id, Course.name, Course.code, Course.icon, Course.color, Course.teacher_id,
+    User.full_name.label("teacher_name"),
+)
+TASK_SUMMARY_COLUMNS = (
+    Task.id, Task.title, Task.task_type, Task.due_date, Task.max_points, Task.course_id,
+    Course.name.label("course_name"), Course.icon.label("course_icon"), Course.color.label("course_color"),
+)
+SUBMISSION_SUMMARY_COLUMNS = (
+    TaskSubmission.id, TaskSubmission.task_id, TaskSubmission.status,
+    TaskSubmission.points_earned, TaskSubmission.submitted_at, TaskSubmission.graded_at,
+)
+EVENT_SUMMARY_COLUMNS = (
+    CalendarEvent.id, CalendarEvent.title, CalendarEvent.start_time, CalendarEvent.end_time,
+    CalendarEvent.event_type, CalendarEvent.is_all_day, CalendarEvent.color, CalendarEvent.course_id,
+    CalendarEvent.rrule, CalendarEvent.exdates,
+)
+# Everything the ICS writer needs, with the course name joined in.
+EVENT_FEED_COLUMNS = (
+    CalendarEvent.id, CalendarEvent.title, CalendarEvent.description, CalendarEvent.start_time,
+    CalendarEvent.end_time, CalendarEvent.is_all_day, CalendarEvent.created_at, CalendarEvent.updated_at,
+    CalendarEvent.rrule, CalendarEvent.exdates,
+    Course.name.label("course_name"), Course.code.label("course_code"),
+)
+
+
+def _course_select(summary: bool) -> Select:
+    if summary:
+        return select(*COURSE_SUMMARY_COLUMNS).join(User, Course.teacher_id == User.id)
+    return select(Course).options(*COURSE_OPTIONS)
+
+
+def _task_select(summary: bool) -> Select:
+    if summary:
+        return select(*TASK_SUMMARY_COLUMNS).select_from(Task).join(Course)
+    return select(Task).options(*TASK_OPTIONS).join(Course)
+
+
+async def _reload(db: AsyncSession, model, obj_id: int, options) -> object:
+    """Re-select an object after commit with its loader options.
+
+    Used instead of db.refresh(), which reloads already-loaded relationships
+    one lazy SELECT at a time.
+    """
+    return await db.scalar(
+        select(model).options(*options).where(model.id == obj_id)
+        .execution_options(populate_existing=True)
+    )
+
+
+async def _fetch_all(db: AsyncSession, stmt: Select, summary: bool) -> List:
+    if summary:
+        return (await db.execute(stmt)).all()
+    return (await db.scalars(stmt)).all()
 
 
 # User CRUD
-def get_user(db: Session, user_id: int) -> Optional[User]:
-    return db.query(User).filter(User.id == user_id).first()
+async def get_user(db: AsyncSession, user_id: int) -> Optional[User]:
+    return await db.scalar(select(User).where(User.id == user_id))
+
 
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    return await db.scalar(select(User).where(User.username == username))
 
-def get_user_by_username(db: Session, username: str) -> Optional[User]:
-    return db.query(User).filter(User.username == username).first()
 
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    return await db.scalar(select(User).where(User.email == email))
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
-    return db.query(User).filter(User.email == email).first()
 
+async def get_user_by_calendar_feed_token(db: AsyncSession, token: str) -> Optional[User]:
+    return await db.scalar(select(User).where(User.calendar_feed_token == token, User.is_active == True))
 
-def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
-    return db.query(User).offset(skip).limit(limit).all()
 
+async def rotate_calendar_feed_token(db: AsyncSession, user: User) -> str:
+    """Issue a new calendar subscription token; the previous feed URL stops working."""
+    user.calendar_feed_token = secrets.token_urlsafe(32)
+    await db.commit()
+    return user.calendar_feed_token
 
-def create_user(db: Session, user: UserCreate) -> User:
+
+async def get_users(db: AsyncSession, page: Optional[PageParams] = None) -> List[User]:
+    result = await db.scalars(keyset(select(User), User.id, User.id, page))
+    return result.all()
+
+
+async def create_user(db: AsyncSession, user: UserCreate) -> User:
     hashed_password = get_password_hash(user.password)
     db_user = User(
         email=user.email,
@@ -41,250 +133,591 @@ def create_user(db: Session, user: UserCreate) -> User:
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.flush()
+    record_event(db, "user.created", {"id": db_user.id, "username": db_user.username, "role": db_user.role})
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 
-def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[User]:
-    db_user = db.query(User).filter(User.id == user_id).first()
+async def update_user(db: AsyncSession, user_id: int, user_update: UserUpdate) -> Optional[User]:
+    db_user = await get_user(db, user_id)
     if db_user:
         update_data = user_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_user, field, value)
-        db.commit()
-        db.refresh(db_user)
+        record_event(db, "user.updated", {"id": user_id, "fields": sorted(update_data)})
+        await db.commit()
+        await db.refresh(db_user)
     return db_user
 
 
 # Course CRUD
-def get_course(db: Session, course_id: int) -> Optional[Course]:
-    return db.query(Course).filter(Course.id == course_id).first()
+async def get_course(db: AsyncSession, course_id: int) -> Optional[Course]:
+    return await db.scalar(
+        select(Course).options(*COURSE_OPTIONS).where(Course.id == course_id)
+    )
 
 
-def get_courses(db: Session, skip: int = 0, limit: int = 100) -> List[Course]:
-    return db.query(Course).filter(Course.is_active == True).offset(skip).limit(limit).all()
+async def get_courses(db: AsyncSession, page: Optional[PageParams] = None, summary: bool = False) -> List[Course]:
+    stmt = _course_select(summary).where(Course.is_active == True)
+    return await _fetch_all(db, keyset(stmt, Course.id, Course.id, page), summary)
 
 
-def get_user_courses(db: Session, user_id: int) -> List[Course]:
-    return db.query(Course).join(Enrollment).filter(
+async def get_user_courses(db: AsyncSession, user_id: int, page: Optional[PageParams] = None,
+                           summary: bool = False) -> List[Course]:
+    stmt = _course_select(summary).join(Enrollment, Enrollment.course_id == Course.id).where(
         Enrollment.user_id == user_id,
         Course.is_active == True
-    ).all()
+    )
+    return await _fetch_all(db, keyset(stmt, Course.id, Course.id, page), summary)
 
 
-def get_teacher_courses(db: Session, teacher_id: int) -> List[Course]:
-    return db.query(Course).filter(
+async def get_teacher_courses(db: AsyncSession, teacher_id: int, page: Optional[PageParams] = None,
+                              summary: bool = False) -> List[Course]:
+    stmt = _course_select(summary).where(
         Course.teacher_id == teacher_id,
         Course.is_active == True
-    ).all()
+    )
+    return await _fetch_all(db, keyset(stmt, Course.id, Course.id, page), summary)
 
 
-def create_course(db: Session, course: CourseCreate, teacher_id: int) -> Course:
+async def get_user_course_ids(db: AsyncSession, user_id: int) -> List[int]:
+    """Ids of active courses the user attends or teaches (push channel subscriptions)."""
+    enrolled = select(Course.id).join(Enrollment, Enrollment.course_id == Course.id).where(
+        Enrollment.user_id == user_id, Course.is_active == True
+    )
+    taught = select(Course.id).where(Course.teacher_id == user_id, Course.is_active == True)
+    return (await db.scalars(union_all(enrolled, taught))).all()
+
+
+def _task_event_data(task: Task) -> dict:
+    return {
+        "id": task.id, "title": task.title, "course_id": task.course_id,
+        "due_date": task.due_date, "is_published": task.is_published,
+    }
+
+
+async def create_course(db: AsyncSession, course: CourseCreate, teacher_id: int) -> Course:
     db_course = Course(**course.dict(), teacher_id=teacher_id)
     db.add(db_course)
-    db.commit()
-    db.refresh(db_course)
-    return db_course
+    await db.flush()
+    record_event(db, "course.created", {"id": db_course.id, "teacher_id": teacher_id})
+    await db.commit()
+    return await get_course(db, db_course.id)
 
 
-def update_course(db: Session, course_id: int, course_update: CourseUpdate) -> Optional[Course]:
-    db_course = db.query(Course).filter(Course.id == course_id).first()
+async def update_course(db: AsyncSession, course_id: int, course_update: CourseUpdate) -> Optional[Course]:
+    db_course = await get_course(db, course_id)
     if db_course:
         update_data = course_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_course, field, value)
-        db.commit()
-        db.refresh(db_course)
+        record_event(db, "course.updated", {"id": course_id, "fields": sorted(update_data)})
+        await db.commit()
+        db_course = await _reload(db, Course, course_id, COURSE_OPTIONS)
     return db_course
 
 
-def enroll_user_in_course(db: Session, user_id: int, course_id: int) -> bool:
+async def enroll_user_in_course(db: AsyncSession, user_id: int, course_id: int) -> bool:
     # Check if already enrolled
-    existing = db.query(Enrollment).filter(
-        Enrollment.user_id == user_id,
-        Enrollment.course_id == course_id
-    ).first()
-    
+    existing = await db.scalar(
+        select(Enrollment).where(
+            Enrollment.user_id == user_id,
+            Enrollment.course_id == course_id
+        )
+    )
+
     if existing:
         return False
-    
+
     enrollment = Enrollment(user_id=user_id, course_id=course_id)
     db.add(enrollment)
-    db.commit()
+    record_event(db, "enrollment.created", {"user_id": user_id, "course_id": course_id})
+    await db.commit()
     return True
 
 
 # Task CRUD
-def get_task(db: Session, task_id: int) -> Optional[Task]:
-    return db.query(Task).filter(Task.id == task_id).first()
+async def get_task(db: AsyncSession, task_id: int) -> Optional[Task]:
+    return await db.scalar(
+        select(Task).options(*TASK_OPTIONS).where(Task.id == task_id)
+    )
 
 
-def get_course_tasks(db: Session, course_id: int) -> List[Task]:
-    return db.query(Task).filter(
+async def get_course_tasks(db: AsyncSession, course_id: int, page: Optional[PageParams] = None,
+                           summary: bool = False) -> List[Task]:
+    stmt = _task_select(summary).where(
         Task.course_id == course_id,
         Task.is_published == True
-    ).order_by(Task.due_date).all()
+    )
+    return await _fetch_all(db, keyset(stmt, Task.due_date, Task.id, page), summary)
 
 
-def get_user_tasks(db: Session, user_id: int, days_ahead: int = 30) -> List[Task]:
+async def get_user_tasks(db: AsyncSession, user_id: int, days_ahead: int = 30,
+                         page: Optional[PageParams] = None, summary: bool = False) -> List[Task]:
     end_date = datetime.utcnow() + timedelta(days=days_ahead)
-    return db.query(Task).join(Course).join(Enrollment).filter(
+    stmt = _task_select(summary).join(Enrollment, Enrollment.course_id == Course.id).where(
         Enrollment.user_id == user_id,
         Task.due_date <= end_date,
         Task.is_published == True
-    ).order_by(Task.due_date).all()
+    )
+    return await _fetch_all(db, keyset(stmt, Task.due_date, Task.id, page), summary)
 
 
-def get_upcoming_tasks(db: Session, user_id: int, days_ahead: int = 7) -> List[Task]:
+async def get_upcoming_tasks(db: AsyncSession, user_id: int, days_ahead: int = 7,
+                             page: Optional[PageParams] = None) -> List[Task]:
     end_date = datetime.utcnow() + timedelta(days=days_ahead)
-    return db.query(Task).join(Course).join(Enrollment).filter(
+    stmt = select(Task).options(*TASK_OPTIONS).join(Course).join(Enrollment).where(
         Enrollment.user_id == user_id,
         Task.due_date <= end_date,
         Task.due_date >= datetime.utcnow(),
         Task.is_published == True
-    ).order_by(Task.due_date).all()
+    )
+    result = await db.scalars(keyset(stmt, Task.due_date, Task.id, page))
+    return result.all()
+
+
+async def get_upcoming_task_rows(db: AsyncSession, user_id: int, days_ahead: int = 7,
+                                 page: Optional[PageParams] = None) -> List:
+    """Upcoming task rows with the user's submission status joined in (one query, no per-task lookups)."""
+    now = datetime.utcnow()
+    stmt = select(
+        *TASK_SUMMARY_COLUMNS,
+        func.coalesce(TaskSubmission.status, literal(TaskStatus.NOT_STARTED, TaskSubmission.status.type)).label("status")
+    ).select_from(Task).join(Course).join(Enrollment, Enrollment.course_id == Course.id).outerjoin(
+        TaskSubmission,
+        and_(TaskSubmission.task_id == Task.id, TaskSubmission.user_id == user_id)
+    ).where(
+        Enrollment.user_id == user_id,
+        Task.due_date <= now + timedelta(days=days_ahead),
+        Task.due_date >= now,
+        Task.is_published == True
+    )
+    return (await db.execute(keyset(stmt, Task.due_date, Task.id, page))).all()
+
+
+async def get_upcoming_course_names(db: AsyncSession, user_id: int, days_ahead: int = 30, limit: int = 5) -> List[str]:
+    """Course names of the user's next upcoming tasks, without loading Task rows."""
+    now = datetime.utcnow()
+    result = await db.scalars(
+        select(Course.name).select_from(Task).join(Course).join(Enrollment).where(
+            Enrollment.user_id == user_id,
+            Task.due_date <= now + timedelta(days=days_ahead),
+            Task.due_date >= now,
+            Task.is_published == True
+        ).order_by(Task.due_date).limit(limit)
+    )
+    return result.all()
 
 
-def create_task(db: Session, task: TaskCreate) -> Task:
+async def create_task(db: AsyncSession, task: TaskCreate) -> Task:
     db_task = Task(**task.dict())
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
-    return db_task
+    await db.flush()
+    record_event(db, "task.published" if db_task.is_published else "task.created", _task_event_data(db_task))
+    await db.commit()
+    return await get_task(db, db_task.id)
 
 
-def update_task(db: Session, task_id: int, task_update: TaskUpdate) -> Optional[Task]:
-    db_task = db.query(Task).filter(Task.id == task_id).first()
+async def update_task(db: AsyncSession, task_id: int, task_update: TaskUpdate) -> Optional[Task]:
+    db_task = await get_task(db, task_id)
     if db_task:
+        was_published = db_task.is_published
+        previous_course_id = db_task.course_id
         update_data = task_update.dict(exclude_unset=True)
+        if update_data.get("due_date") is not None:
+            # Stored naive UTC, so the comparison below and the overdue sweeper see the same instant
+            update_data["due_date"] = as_naive_utc(update_data["due_date"])
         for field, value in update_data.items():
             setattr(db_task, field, value)
-        db.commit()
-        db.refresh(db_task)
+        if update_data.get("due_date") is not None and db_task.due_date > datetime.utcnow():
+            # Deadline extended: submissions the overdue sweeper closed are open again
+            await db.execute(
+                update(TaskSubmission).where(
+                    TaskSubmission.task_id == task_id,
+                    TaskSubmission.status == TaskStatus.OVERDUE,
+                    TaskSubmission.submitted_at.is_(None)
+                ).values(status=TaskStatus.NOT_STARTED).execution_options(synchronize_session=False)
+            )
+        event_data = _task_event_data(db_task)
+        if db_task.course_id != previous_course_id:
+            event_data["previous_course_id"] = previous_course_id
+        record_event(
+            db, "task.published" if db_task.is_published and not was_published else "task.updated", event_data
+        )
+        await db.commit()
+        db_task = await _reload(db, Task, task_id, TASK_OPTIONS)
     return db_task
 
 
 # Task Submission CRUD
-def get_task_submission(db: Session, task_id: int, user_id: int) -> Optional[TaskSubmission]:
-    return db.query(TaskSubmission).filter(
-        TaskSubmission.task_id == task_id,
-        TaskSubmission.user_id == user_id
-    ).first()
+async def get_task_submission(db: AsyncSession, task_id: int, user_id: int) -> Optional[TaskSubmission]:
+    return await db.scalar(
+        select(TaskSubmission).options(*SUBMISSION_OPTIONS).where(
+            TaskSubmission.task_id == task_id,
+            TaskSubmission.user_id == user_id
+        )
+    )
 
 
-def get_user_submissions(db: Session, user_id: int) -> List[TaskSubmission]:
-    return db.query(TaskSubmission).filter(TaskSubmission.user_id == user_id).all()
+async def get_user_submissions(db: AsyncSession, user_id: int, page: Optional[PageParams] = None,
+                               summary: bool = False, status: Optional[TaskStatus] = None) -> List[TaskSubmission]:
+    columns = SUBMISSION_SUMMARY_COLUMNS if summary else (TaskSubmission,)
+    stmt = select(*columns).where(TaskSubmission.user_id == user_id)
+    if status is not None:
+        # Served by ix_task_submissions_user_status; OVERDUE is kept current by app.overdue
+        stmt = stmt.where(TaskSubmission.status == status)
+    if not summary:
+        stmt = stmt.options(*SUBMISSION_OPTIONS)
+    return await _fetch_all(db, keyset(stmt, TaskSubmission.id, TaskSubmission.id, page), summary)
 
 
-def create_task_submission(db: Session, submission: TaskSubmissionCreate, user_id: int) -> TaskSubmission:
+async def create_task_submission(db: AsyncSession, submission: TaskSubmissionCreate, user_id: int) -> TaskSubmission:
     db_submission = TaskSubmission(**submission.dict(), user_id=user_id)
     db.add(db_submission)
-    db.commit()
-    db.refresh(db_submission)
-    return db_submission
+    await db.flush()
+    record_event(db, "submission.created", {"id": db_submission.id, "task_id": db_submission.task_id, "user_id": user_id})
+    await db.commit()
+    return await get_task_submission(db, db_submission.task_id, user_id)
 
 
-def update_task_submission(db: Session, submission_id: int, submission_update: TaskSubmissionUpdate) -> Optional[TaskSubmission]:
-    db_submission = db.query(TaskSubmission).filter(TaskSubmission.id == submission_id).first()
+async def update_task_submission(db: AsyncSession, submission_id: int, submission_update: TaskSubmissionUpdate) -> Optional[TaskSubmission]:
+    db_submission = await db.scalar(
+        select(TaskSubmission).options(*SUBMISSION_OPTIONS)
+        .where(TaskSubmission.id == submission_id)
+    )
     if db_submission:
+        was_graded = db_submission.status == TaskStatus.GRADED
         update_data = submission_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_submission, field, value)
-        
+
         # Update submitted_at if status changes to submitted
         if submission_update.status == "submitted" and not db_submission.submitted_at:
             db_submission.submitted_at = datetime.utcnow()
-        
-        db.commit()
-        db.refresh(db_submission)
+
+        if db_submission.status == TaskStatus.GRADED and not was_graded:
+            record_event(db, "submission.graded", {
+                "id": db_submission.id, "task_id": db_submission.task_id, "user_id": db_submission.user_id,
+                "points_earned": db_submission.points_earned, "feedback": db_submission.feedback,
+            })
+        await db.commit()
+        db_submission = await _reload(db, TaskSubmission, submission_id, SUBMISSION_OPTIONS)
     return db_submission
 
 
 # Course Resource CRUD
-def get_course_resources(db: Session, course_id: int) -> List[CourseResource]:
-    return db.query(CourseResource).filter(CourseResource.course_id == course_id).all()
+async def get_course_resources(db: AsyncSession, course_id: int,
+                               page: Optional[PageParams] = None) -> List[CourseResource]:
+    stmt = select(CourseResource).where(CourseResource.course_id == course_id)
+    result = await db.scalars(keyset(stmt, CourseResource.id, CourseResource.id, page))
+    return result.all()
 
 
-def create_course_resource(db: Session, resource: CourseResourceCreate) -> CourseResource:
+async def create_course_resource(db: AsyncSession, resource: CourseResourceCreate) -> CourseResource:
     db_resource = CourseResource(**resource.dict())
     db.add(db_resource)
-    db.commit()
-    db.refresh(db_resource)
+    await db.flush()
+    record_event(db, "resource.uploaded", {
+        "id": db_resource.id, "course_id": db_resource.course_id,
+        "title": db_resource.title, "resource_type": db_resource.resource_type,
+    })
+    await db.commit()
+    await db.refresh(db_resource)
     return db_resource
 
 
 # Attendance CRUD
-def get_course_attendance(db: Session, course_id: int, user_id: int) -> List[Attendance]:
-    return db.query(Attendance).filter(
+async def get_course_attendance(db: AsyncSession, course_id: int, user_id: int,
+                                page: Optional[PageParams] = None) -> List[Attendance]:
+    stmt = select(Attendance).options(*ATTENDANCE_OPTIONS).where(
         Attendance.course_id == course_id,
         Attendance.user_id == user_id
-    ).order_by(Attendance.date.desc()).all()
+    )
+    result = await db.scalars(keyset(stmt, Attendance.date, Attendance.id, page, descending=True))
+    return result.all()
 
 
-def create_attendance_record(db: Session, attendance: AttendanceCreate) -> Attendance:
+async def create_attendance_record(db: AsyncSession, attendance: AttendanceCreate) -> Attendance:
     db_attendance = Attendance(**attendance.dict())
     db.add(db_attendance)
-    db.commit()
-    db.refresh(db_attendance)
-    return db_attendance
+    await db.flush()
+    record_event(db, "attendance.recorded", {
+        "id": db_attendance.id, "course_id": db_attendance.course_id,
+        "user_id": db_attendance.user_id, "status": db_attendance.status,
+    })
+    await db.commit()
+    return await _reload(db, Attendance, db_attendance.id, ATTENDANCE_OPTIONS)
 
 
 # Calendar Event CRUD
-def get_user_calendar_events(db: Session, user_id: int, start_date: datetime, end_date: datetime) -> List[CalendarEvent]:
-    return db.query(CalendarEvent).filter(
-        or_(
-            CalendarEvent.user_id == user_id,
-            CalendarEvent.course_id.in_(
-                db.query(Enrollment.course_id).filter(Enrollment.user_id == user_id)
+def _event_window_conditions(start_date: datetime, end_date: datetime, recurring: Optional[bool] = None) -> List[tuple]:
+    """Overlap conditions for single events and for recurring series, one tuple per kind"""
+    kinds = []
+    if recurring is not True:
+        kinds.append((
+            CalendarEvent.rrule.is_(None),
+            CalendarEvent.start_time < end_date,
+            CalendarEvent.end_time > start_date,
+        ))
+    if recurring is not False:
+        kinds.append((
+            CalendarEvent.rrule.isnot(None),
+            CalendarEvent.start_time < end_date,
+            or_(CalendarEvent.recurrence_end.is_(None), CalendarEvent.recurrence_end > start_date),
+        ))
+    return kinds
+
+
+def _visible_event_ids(user_id: int, start_date: datetime, end_date: datetime, recurring: Optional[bool] = None):
+    """Ids of events overlapping [start_date, end_date) that the user can see.
+
+    Overlap (start < window end AND end > window start) keeps multi-day events
+    that cross the window edges. Personal events and events of enrolled courses
+    are separate branches joined with UNION ALL so each one is a range scan on
+    its (owner, end_time, start_time) index; a single OR over both makes
+    planners fall back to wide scans. Course events the user created are
+    already in the personal branch.
+
+    Recurring series span from their first start to recurrence_end (NULL when
+    unbounded) and are found through the partial series indexes. recurring
+    selects only single events (False), only series (True) or both (None).
+    """
+    branches = []
+    for conditions in _event_window_conditions(start_date, end_date, recurring):
+        branches.append(select(CalendarEvent.id).where(CalendarEvent.user_id == user_id, *conditions))
+        branches.append(
+            select(CalendarEvent.id).join(
+                Enrollment, Enrollment.course_id == CalendarEvent.course_id
+            ).where(
+                Enrollment.user_id == user_id,
+                or_(CalendarEvent.user_id.is_(None), CalendarEvent.user_id != user_id),
+                *conditions
             )
-        ),
-        CalendarEvent.start_time >= start_date,
-        CalendarEvent.end_time <= end_date
-    ).order_by(CalendarEvent.start_time).all()
+        )
+    return union_all(*branches)
+
+
+def _user_events_filter(user_id: int, start_date: datetime, end_date: datetime, recurring: Optional[bool] = None):
+    return CalendarEvent.id.in_(_visible_event_ids(user_id, start_date, end_date, recurring))
+
+
+def _event_select(summary: bool, user_id: int, start_date: datetime, end_date: datetime, recurring: bool) -> Select:
+    if summary:
+        stmt = select(*EVENT_SUMMARY_COLUMNS)
+    else:
+        stmt = select(CalendarEvent).options(*EVENT_OPTIONS)
+    return stmt.where(_user_events_filter(user_id, start_date, end_date, recurring))
+
+
+async def get_user_calendar_events(db: AsyncSession, user_id: int, start_date: datetime, end_date: datetime,
+                                   page: Optional[PageParams] = None, summary: bool = False) -> List[CalendarEvent]:
+    """Events in the window with recurring series expanded into their occurrences.
+
+    Single events are paged in SQL; series are fetched whole (there are few) and
+    their occurrences merged in by (start_time, id), so the cursor works across both.
+    """
+    singles = await _fetch_all(db, keyset(
+        _event_select(summary, user_id, start_date, end_date, False), CalendarEvent.start_time, CalendarEvent.id, page
+    ), summary)
+    series = await _fetch_all(db, keyset(
+        _event_select(summary, user_id, start_date, end_date, True), CalendarEvent.start_time, CalendarEvent.id, None
+    ), summary)
+    if not series:
+        return singles
+
+    occurrences = expand(series, start_date, end_date)
+    if page is None:
+        return merge(singles, occurrences)
+    if page.after is not None:
+        occurrences = [o for o in occurrences if (o.start_time, o.id) > page.after]
+    return merge(singles, occurrences)[:page.limit + 1]
+
+
+async def get_calendar_feed_rows(db: AsyncSession, user_id: int, start_date: datetime, end_date: datetime) -> List:
+    """Single events and unexpanded series; the ICS writer emits series as RRULE."""
+    stmt = (
+        select(*EVENT_FEED_COLUMNS)
+        .outerjoin(Course, CalendarEvent.course_id == Course.id)
+        .where(_user_events_filter(user_id, start_date, end_date))
+    )
+    return (await db.execute(keyset(stmt, CalendarEvent.start_time, CalendarEvent.id, None))).all()
+
+
+async def get_calendar_range(db: AsyncSession, user_id: int, start: datetime, end: datetime) -> Tuple[List, List]:
+    """Events overlapping and published tasks due in [start, end), both ordered by time.
+
+    Returns summary rows (EVENT_SUMMARY_COLUMNS, TASK_SUMMARY_COLUMNS) so a month
+    or term view stays a two-query, no-ORM-object operation. Recurring series
+    are expanded into their occurrences inside the range.
+    """
+    events_stmt = select(*EVENT_SUMMARY_COLUMNS).where(_user_events_filter(user_id, start, end))
+    tasks_stmt = _task_select(summary=True).join(Enrollment, Enrollment.course_id == Course.id).where(
+        Enrollment.user_id == user_id,
+        Task.is_published == True,
+        Task.due_date >= start,
+        Task.due_date < end
+    )
+    events = await _fetch_all(db, keyset(events_stmt, CalendarEvent.start_time, CalendarEvent.id, None), True)
+    tasks = await _fetch_all(db, keyset(tasks_stmt, Task.due_date, Task.id, None), True)
+    return expand(events, start, end), tasks
+
+
+async def get_course_busy_rows(db: AsyncSession, course_id: int, start: datetime, end: datetime) -> List:
+    """Everything that keeps students of a course busy in [start, end), in one query.
+
+    Personal events of the enrolled students, events of every course any of them
+    attends (series unexpanded) and deadlines of published tasks in those courses
+    come back as (id, start_time, end_time, rrule, exdates) rows; a deadline's
+    start and end are both its due_date. Students are not told apart: free/busy
+    only needs the union.
+    """
+    students = select(Enrollment.user_id).where(Enrollment.course_id == course_id)
+    courses = select(Enrollment.course_id).where(Enrollment.user_id.in_(students))
+    branches = []
+    for conditions in _event_window_conditions(start, end):
+        branches.append(select(CalendarEvent.id).where(CalendarEvent.user_id.in_(students), *conditions))
+        branches.append(select(CalendarEvent.id).where(CalendarEvent.course_id.in_(courses), *conditions))
+    events = select(
+        CalendarEvent.id, CalendarEvent.start_time, CalendarEvent.end_time, CalendarEvent.rrule, CalendarEvent.exdates
+    ).where(CalendarEvent.id.in_(union_all(*branches)))
+    deadlines = select(
+        Task.id, Task.due_date, Task.due_date, literal(None), literal(None)
+    ).where(
+        Task.course_id.in_(courses),
+        Task.is_published == True,
+        Task.due_date >= start,
+        Task.due_date < end
+    )
+    return (await db.execute(union_all(events, deadlines))).all()
+
+
+async def get_reminder_task_rows(db: AsyncSession, start: datetime, end: datetime) -> List:
+    """Published tasks due in [start, end) for the reminder scheduler (ix_tasks_published_due)."""
+    stmt = select(Task.id, Task.title, Task.due_date, Task.course_id).where(
+        Task.is_published == True,
+        Task.due_date >= start,
+        Task.due_date < end
+    )
+    return (await db.execute(stmt)).all()
+
+
+async def get_reminder_event_rows(db: AsyncSession, start: datetime, end: datetime) -> List:
+    """Single events starting in [start, end) and recurring series active then, for the reminder scheduler."""
+    columns = (
+        CalendarEvent.id, CalendarEvent.title, CalendarEvent.start_time, CalendarEvent.end_time,
+        CalendarEvent.rrule, CalendarEvent.exdates, CalendarEvent.course_id, CalendarEvent.user_id,
+    )
+    singles = select(*columns).where(
+        CalendarEvent.rrule.is_(None),
+        CalendarEvent.start_time >= start,
+        CalendarEvent.start_time < end
+    )
+    series = select(*columns).where(*_event_window_conditions(start, end, recurring=True)[0])
+    return (await db.execute(union_all(singles, series))).all()
+
+
+def _set_recurrence(db_event: CalendarEvent, rrule: Optional[str], exdates: List[datetime]):
+    """Validate and store a recurrence rule; raises ValueError for an invalid rule.
+
+    dateutil expands occurrences at whole seconds, so a series' start/end and its
+    exdates are truncated the same way or exceptions would never match.
+    """
+    if not rrule:
+        db_event.rrule = db_event.exdates = db_event.recurrence_end = None
+        return
+    db_event.start_time = as_naive_utc(db_event.start_time).replace(microsecond=0)
+    db_event.end_time = as_naive_utc(db_event.end_time).replace(microsecond=0)
+    exdates = [as_naive_utc(value).replace(microsecond=0) for value in exdates]
+    db_event.rrule = normalize_rrule(rrule, db_event.start_time)
+    db_event.exdates = sorted({value.isoformat() for value in exdates}) or None
+    db_event.recurrence_end = series_end(db_event.rrule, db_event.start_time, db_event.end_time, exdates)
 
 
-def create_calendar_event(db: Session, event: CalendarEventCreate, user_id: int) -> CalendarEvent:
-    db_event = CalendarEvent(**event.dict(), user_id=user_id)
+def _calendar_event_data(event: CalendarEvent) -> dict:
+    return {
+        "id": event.id, "title": event.title, "course_id": event.course_id, "user_id": event.user_id,
+        "start_time": event.start_time, "rrule": event.rrule,
+    }
+
+
+async def create_calendar_event(db: AsyncSession, event: CalendarEventCreate, user_id: int) -> CalendarEvent:
+    event_data = event.dict(exclude={"rrule", "exdates"})
+    db_event = CalendarEvent(**event_data, user_id=user_id)
+    _set_recurrence(db_event, event.rrule, event.exdates)
     db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
-    return db_event
+    await db.flush()
+    record_event(db, "calendar_event.created", _calendar_event_data(db_event))
+    await db.commit()
+    return await db.scalar(
+        select(CalendarEvent).options(*EVENT_OPTIONS).where(CalendarEvent.id == db_event.id)
+    )
+
+
+async def get_calendar_event(db: AsyncSession, event_id: int) -> Optional[CalendarEvent]:
+    return await db.scalar(select(CalendarEvent).options(*EVENT_OPTIONS).where(CalendarEvent.id == event_id))
+
+
+async def add_calendar_event_exception(db: AsyncSession, db_event: CalendarEvent, occurrence_start: datetime) -> CalendarEvent:
+    """Cancel one occurrence of a recurring series."""
+    exdates = [datetime.fromisoformat(value) for value in db_event.exdates or ()]
+    _set_recurrence(db_event, db_event.rrule, exdates + [occurrence_start])
+    record_event(db, "calendar_event.updated", _calendar_event_data(db_event))
+    await db.commit()
+    return await _reload(db, CalendarEvent, db_event.id, EVENT_OPTIONS)
 
 
 # Dashboard Stats
-def get_dashboard_stats(db: Session, user_id: int) -> dict:
+async def get_dashboard_stats(db: AsyncSession, user_id: int) -> dict:
     # Get user's enrolled courses
-    user_courses = get_user_courses(db, user_id)
+    user_courses = await get_user_courses(db, user_id)
     course_ids = [course.id for course in user_courses]
-    
+
     # Count active tasks
-    active_tasks = db.query(Task).filter(
-        Task.course_id.in_(course_ids),
-        Task.is_published == True,
-        Task.due_date >= datetime.utcnow()
-    ).count()
-    
+    active_tasks = await db.scalar(
+        select(func.count()).select_from(Task).where(
+            Task.course_id.in_(course_ids),
+            Task.is_published == True,
+            Task.due_date >= datetime.utcnow()
+        )
+    )
+
     # Count upcoming deadlines (next 7 days)
-    upcoming_deadlines = db.query(Task).filter(
-        Task.course_id.in_(course_ids),
-        Task.is_published == True,
-        Task.due_date >= datetime.utcnow(),
-        Task.due_date <= datetime.utcnow() + timedelta(days=7)
-    ).count()
-    
+    upcoming_deadlines = await db.scalar(
+        select(func.count()).select_from(Task).where(
+            Task.course_id.in_(course_ids),
+            Task.is_published == True,
+            Task.due_date >= datetime.utcnow(),
+            Task.due_date <= datetime.utcnow() + timedelta(days=7)
+        )
+    )
+
+    # Count overdue submissions (marked by the overdue sweeper)
+    overdue_tasks = await db.scalar(
+        select(func.count()).select_from(TaskSubmission).where(
+            TaskSubmission.user_id == user_id,
+            TaskSubmission.status == TaskStatus.OVERDUE
+        )
+    )
+
     # Calculate attendance rate
-    total_attendance = db.query(Attendance).filter(
-        Attendance.user_id == user_id,
-        Attendance.status.in_(["present", "late"])
-    ).count()
-    
-    total_records = db.query(Attendance).filter(Attendance.user_id == user_id).count()
+    total_attendance = await db.scalar(
+        select(func.count()).select_from(Attendance).where(
+            Attendance.user_id == user_id,
+            Attendance.status.in_(["present", "late"])
+        )
+    )
+
+    total_records = await db.scalar(
+        select(func.count()).select_from(Attendance).where(Attendance.user_id == user_id)
+    )
     attendance_rate = (total_attendance / total_records * 100) if total_records > 0 else 0
-    
+
     return {
         "total_courses": len(user_courses),
         "active_tasks": active_tasks,
         "upcoming_deadlines": upcoming_deadlines,
+        "overdue_tasks": overdue_tasks,
         "attendance_rate": round(attendance_rate, 1)
     }
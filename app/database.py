@@ -1,25 +1,356 @@
-from sqlalchemy import create_engine
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import hmac
+import itertools
+import logging
+import time
+from fastapi import Response
+from fastapi.requests import HTTPConnection
+from jose import JWTError, jwt
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.config import settings
 
-# 创建数据库引擎
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
-)
+logger = logging.getLogger(__name__)
+
+# 各数据库默认使用的异步驱动
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+ASYNC_DRIVER_NAMES = {"aiosqlite", "asyncpg", "psycopg"}
+
+
+def get_async_database_url(database_url: str) -> str:
+    """将同步数据库URL转换为对应的异步驱动URL"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    explicit_async = "+" in url.drivername and url.get_driver_name() in ASYNC_DRIVER_NAMES
+    if backend in ASYNC_DRIVERS and not explicit_async:
+        url = url.set(drivername=ASYNC_DRIVERS[backend])
+    return url.render_as_string(hide_password=False)
+
+
+class PoolMetrics:
+    """连接池借出等待时间与饱和度统计"""
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = capacity  # pool_size + max_overflow
+        self.checkouts = 0
+        self.timeouts = 0
+        self.slow_checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.peak_checked_out = 0
+
+    def record_checkout(self, wait: float, checked_out: int, timed_out: bool = False):
+        if timed_out:
+            self.timeouts += 1
+            logger.warning("Database pool %s checkout timed out after %.3fs", self.name, wait)
+            return
+
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.peak_checked_out = max(self.peak_checked_out, checked_out)
+        if wait * 1000 >= settings.db_pool_slow_checkout_ms:
+            self.slow_checkouts += 1
+
+    def to_dict(self, pool: QueuePool) -> Dict[str, Any]:
+        checked_out = pool.checkedout()
+        return {
+            "name": self.name,
+            "pool_size": pool.size(),
+            "capacity": self.capacity,
+            "checked_out": checked_out,
+            "overflow": max(0, pool.overflow()),
+            "saturation": round(checked_out / self.capacity, 3) if self.capacity else 0.0,
+            "peak_checked_out": self.peak_checked_out,
+            "checkouts": self.checkouts,
+            "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "slow_checkouts": self.slow_checkouts,
+            "timeouts": self.timeouts
+        }
+
+
+class MeteredPoolMixin:
+    """在借出连接时记录等待时间的连接池"""
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self.metrics:
+                self.metrics.record_checkout(time.perf_counter() - start, self.checkedout(), timed_out=True)
+            raise
+        if self.metrics:
+            self.metrics.record_checkout(time.perf_counter() - start, self.checkedout())
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class MeteredQueuePool(MeteredPoolMixin, QueuePool):
+    pass
+
+
+class MeteredAsyncAdaptedQueuePool(MeteredPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+# 已创建引擎的连接池统计 {名称: (引擎, 统计)}
+pool_metrics: Dict[str, Tuple[Engine, PoolMetrics]] = {}
+
+
+def _is_sqlite_memory(database_url: str) -> bool:
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """每个新连接上设置SQLite参数：WAL允许读写并发，busy_timeout让写冲突等待而不是立即报 database is locked"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.close()
+
+
+def _engine_options(database_url: str, pool_class) -> Dict[str, Any]:
+    """根据配置生成连接池参数；内存SQLite使用单连接池，不设置池大小"""
+    options: Dict[str, Any] = {}
+    if make_url(database_url).get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    if _is_sqlite_memory(database_url):
+        return options
+
+    options.update(
+        poolclass=pool_class,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping
+    )
+    return options
+
+
+def _instrument(sync_engine: Engine, name: str):
+    """注册SQLite连接参数和连接池统计"""
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+    if isinstance(sync_engine.pool, MeteredPoolMixin):
+        metrics = PoolMetrics(name, settings.db_pool_size + settings.db_max_overflow)
+        sync_engine.pool.metrics = metrics
+        pool_metrics[name] = (sync_engine, metrics)
+
+
+def create_db_engine(database_url: str, name: str) -> Engine:
+    """按统一的连接池配置创建同步引擎"""
+    db_engine = create_engine(database_url, **_engine_options(database_url, MeteredQueuePool))
+    _instrument(db_engine, name)
+    return db_engine
+
+
+def create_async_db_engine(database_url: str, name: str) -> AsyncEngine:
+    """按统一的连接池配置创建异步引擎"""
+    db_engine = create_async_engine(
+        database_url, **_engine_options(database_url, MeteredAsyncAdaptedQueuePool)
+    )
+    _instrument(db_engine.sync_engine, name)
+    return db_engine
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有引擎连接池的当前状态和累计统计"""
+    return {
+        name: metrics.to_dict(db_engine.pool)
+        for name, (db_engine, metrics) in pool_metrics.items()
+    }
+
+
+# 创建同步数据库引擎（建表、迁移和初始化脚本使用）
+engine = create_db_engine(settings.database_url, "primary_sync")
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 创建异步数据库引擎（请求处理使用，不阻塞事件循环）
+async_engine = create_async_db_engine(
+    settings.async_database_url or get_async_database_url(settings.database_url),
+    "primary"
+)
+
+# 创建异步会话工厂；提交后不过期对象，避免响应序列化时再次查询
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+# 只读副本引擎和会话工厂（未配置副本时读请求也使用主库）
+replica_engines: List[AsyncEngine] = [
+    create_async_db_engine(get_async_database_url(url), f"replica_{index}")
+    for index, url in enumerate(settings.database_replica_urls)
+]
+ReplicaSessionLocals = [
+    async_sessionmaker(
+        bind=replica_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False
+    )
+    for replica_engine in replica_engines
+]
+
 # 创建模型基类
 Base = declarative_base()
 
 
-def get_db():
-    """获取数据库会话的依赖项"""
-    db = SessionLocal()
+# 写请求的响应头：读写窗口的截止时间（Unix秒）及其签名，格式为 "<截止时间>.<签名>"。
+# 客户端在后续请求中原样带回，任何工作进程收到未过期的值时读请求都走主库
+# （多进程部署时进程内的记录只覆盖本进程）
+READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes-Until"
+# 允许各工作进程之间的时钟误差（秒）
+READ_YOUR_WRITES_CLOCK_SKEW = 1.0
+
+
+class ReadYourWritesTracker:
+    """记录每个用户最近一次写入时间，窗口内的读请求走主库以免读到副本延迟前的旧数据
+
+    只在本进程内有效；跨进程由 READ_YOUR_WRITES_HEADER 请求头携带窗口。
+    """
+
+    def __init__(self):
+        self.last_writes: Dict[str, float] = {}
+
+    def mark_write(self, key: str):
+        now = time.monotonic()
+        self.last_writes[key] = now
+        # 顺带清理已过窗口的记录
+        if len(self.last_writes) > 1000:
+            cutoff = now - settings.db_read_your_writes_seconds
+            self.last_writes = {k: t for k, t in self.last_writes.items() if t >= cutoff}
+
+    def wrote_recently(self, key: Optional[str]) -> bool:
+        if key is None:
+            return False
+        last_write = self.last_writes.get(key)
+        return last_write is not None and time.monotonic() - last_write < settings.db_read_your_writes_seconds
+
+
+read_your_writes = ReadYourWritesTracker()
+_replica_rotation = itertools.count()
+
+
+def _window_signature(identity: Optional[str], until: str) -> str:
+    message = f"{identity or ''}:{until}".encode()
+    return hmac.new(settings.secret_key.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+
+def sign_read_your_writes_window(identity: Optional[str], until: float) -> str:
+    """生成读写窗口响应头的值，签名绑定用户，客户端无法自行构造或延长窗口"""
+    value = f"{until:.3f}"
+    return f"{value}.{_window_signature(identity, value)}"
+
+
+def _header_window_open(connection: HTTPConnection, identity: Optional[str]) -> bool:
+    """请求头中带回的读写窗口是否由服务端签发且尚未过期
+
+    截止时间超过 db_read_your_writes_seconds 的值一律不接受，即使签名正确也不会把读请求长期固定在主库。
+    """
+    value, _, signature = connection.headers.get(READ_YOUR_WRITES_HEADER, "").rpartition(".")
+    if not value or not hmac.compare_digest(signature, _window_signature(identity, value)):
+        return False
     try:
+        until = float(value)
+    except ValueError:
+        return False
+    now = time.time()
+    return now < until <= now + settings.db_read_your_writes_seconds + READ_YOUR_WRITES_CLOCK_SKEW
+
+
+def _request_identity(connection: HTTPConnection) -> Optional[str]:
+    """从Bearer令牌中取出用户名，仅用于读写路由（认证仍由 get_current_user 完成）"""
+    authorization = connection.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.get_unverified_claims(token).get("sub")
+    except JWTError:
+        return None
+
+
+class LazyLoadError(exc.InvalidRequestError):
+    """测试模式下关系属性触发了懒加载查询（N+1）"""
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _guard_lazy_load(orm_execute_state):
+    """开启 db_raise_on_lazy_load 时，任何懒加载查询都直接报错，
+    使遗漏了加载策略的N+1查询在测试中失败，而不是悄悄进入生产环境。
+    lazy_loaded_from 只对SELECT有效，批量 update()/delete() 读取它会报错，先按语句类型过滤"""
+    if not (settings.db_raise_on_lazy_load and orm_execute_state.is_select and orm_execute_state.is_relationship_load):
+        return
+    state = orm_execute_state.lazy_loaded_from
+    if state is not None:
+        raise LazyLoadError(
+            f"Lazy load on {state.class_.__name__} (id={state.identity}); "
+            "add a selectinload/joinedload option to the query"
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _track_commit(session):
+    if not session.info.pop("has_writes", False):
+        return
+    if session.info.get("identity"):
+        read_your_writes.mark_write(session.info["identity"])
+    response = session.info.get("response")
+    if response is not None:
+        response.headers[READ_YOUR_WRITES_HEADER] = sign_read_your_writes_window(
+            session.info.get("identity"), time.time() + settings.db_read_your_writes_seconds
+        )
+
+
+async def get_db(connection: HTTPConnection, response: Response):
+    """获取主库异步会话的依赖项（写操作和需要强一致读取的操作使用）；提交了写入时在响应头中返回读写窗口"""
+    async with AsyncSessionLocal() as db:
+        db.info["identity"] = _request_identity(connection)
+        db.info["response"] = response
+        yield db
+
+
+async def get_read_db(connection: HTTPConnection):
+    """获取只读会话的依赖项：轮询分发到副本，用户刚写入过（本进程记录或请求头中的窗口）时回到主库"""
+    identity = _request_identity(connection)
+    if not ReplicaSessionLocals or _header_window_open(connection, identity) or read_your_writes.wrote_recently(identity):
+        session_factory = AsyncSessionLocal
+    else:
+        session_factory = ReplicaSessionLocals[next(_replica_rotation) % len(ReplicaSessionLocals)]
+
+    async with session_factory() as db:
+        db.info["identity"] = identity
         yield db
-    finally:
-        db.close()
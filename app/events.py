@@ -0,0 +1,168 @@
+"""
+SUMA LMS 领域事件总线（事务性发件箱）
+CRUD写操作用 record_event 把领域事件写入 outbox_events 表，与业务数据在同一事务中提交：
+业务写入成功则事件一定存在，进程崩溃后由任意进程继续分发。
+提交后唤醒后台分发器，按批领取未分发的事件交给订阅者，副作用（推送通知、搜索索引等）不在请求路径上执行。
+
+投递语义为至少一次：订阅者失败时整条事件在租约过期后重试，订阅者需要能处理重复事件。
+分发器每条事件只在一个进程中执行，进程内存中的缓存（学习画像等）用 on_commit 注册同步回调，
+在写入事件的进程中随提交立即失效
+"""
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import uuid
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+CommitHandler = Callable[[str, Dict[str, Any]], None]
+
+# 会话在 Session.info 中记录本事务写入的事件，提交后执行同步回调并唤醒分发器
+_PENDING_KEY = "outbox_pending"
+
+
+def record_event(db: AsyncSession, event_type: str, payload: Dict[str, Any]):
+    """在当前事务中记录一条领域事件（不提交，随调用方的 commit 一起写入）"""
+    payload = jsonable_encoder(payload)
+    db.add(OutboxEvent(event_type=event_type, payload=payload))
+    db.sync_session.info.setdefault(_PENDING_KEY, []).append((event_type, payload))
+
+
+class EventBus:
+    """发件箱分发器和订阅表"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, List[EventHandler]] = {}
+        self.commit_handlers: List[CommitHandler] = []
+        self._wakeup = asyncio.Event()
+        self._purged_at: Optional[datetime] = None
+
+    def subscribe(self, event_type: str, handler: EventHandler):
+        """订阅一种事件，event_type 为 "*" 时接收全部事件"""
+        handlers = self.subscribers.setdefault(event_type, [])
+        if handler not in handlers:
+            handlers.append(handler)
+
+    def on_commit(self, handler: CommitHandler):
+        """注册同步回调：本进程提交事件后立即调用（不经过发件箱，失败不重试）"""
+        if handler not in self.commit_handlers:
+            self.commit_handlers.append(handler)
+
+    def committed(self, events: List[Tuple[str, Dict[str, Any]]]):
+        """事务提交后调用同步回调并唤醒分发器"""
+        for event_type, payload in events:
+            for handler in self.commit_handlers:
+                try:
+                    handler(event_type, payload)
+                except Exception:
+                    logger.exception("Commit handler failed for %s", event_type)
+        self._wakeup.set()
+
+    async def _claim(self, db: AsyncSession, now: datetime) -> List[OutboxEvent]:
+        """领取一批未分发、且没有被其他进程持有租约的事件"""
+        available = (
+            OutboxEvent.dispatched_at.is_(None),
+            (OutboxEvent.claimed_until.is_(None)) | (OutboxEvent.claimed_until < now),
+        )
+        ids = (await db.scalars(
+            select(OutboxEvent.id).where(*available).order_by(OutboxEvent.id).limit(settings.outbox_batch_size)
+        )).all()
+        if not ids:
+            return []
+        token = uuid.uuid4().hex
+        await db.execute(
+            update(OutboxEvent).where(OutboxEvent.id.in_(ids), *available).values(
+                claimed_by=token,
+                claimed_until=now + timedelta(seconds=settings.outbox_lease_seconds),
+                attempts=OutboxEvent.attempts + 1
+            ).execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        # populate_existing：会话中已加载的事件对象用领取后的值覆盖（attempts、claimed_by）
+        return (await db.scalars(
+            select(OutboxEvent).where(OutboxEvent.claimed_by == token).order_by(OutboxEvent.id)
+            .execution_options(populate_existing=True)
+        )).all()
+
+    async def _handle(self, outbox_event: OutboxEvent) -> Optional[str]:
+        """调用订阅者，返回第一个错误（全部成功时为None）"""
+        handlers = self.subscribers.get(outbox_event.event_type, []) + self.subscribers.get("*", [])
+        for handler in handlers:
+            try:
+                await handler(outbox_event.event_type, outbox_event.payload)
+            except Exception as exc:
+                logger.exception("Event handler failed for %s #%s", outbox_event.event_type, outbox_event.id)
+                return f"{type(exc).__name__}: {exc}"
+        return None
+
+    async def dispatch_pending(self, db: AsyncSession) -> int:
+        """分发一批事件，返回处理的条数；失败的事件租约过期后重试，超过最大次数后放弃"""
+        now = datetime.utcnow()
+        claimed = await self._claim(db, now)
+        for outbox_event in claimed:
+            error = await self._handle(outbox_event)
+            outbox_event.last_error = error
+            if error is None or outbox_event.attempts >= settings.outbox_max_attempts:
+                outbox_event.dispatched_at = datetime.utcnow()
+            outbox_event.claimed_by = None
+            if error is None:
+                outbox_event.claimed_until = None
+        if claimed:
+            await db.commit()
+        return len(claimed)
+
+    async def purge_dispatched(self, db: AsyncSession) -> int:
+        """删除超过保留期的已分发事件（每次最多一批，每小时最多一次）"""
+        now = datetime.utcnow()
+        if self._purged_at is not None and now - self._purged_at < timedelta(hours=1):
+            return 0
+        self._purged_at = now
+        cutoff = datetime.utcnow() - timedelta(days=settings.outbox_retention_days)
+        batch = select(OutboxEvent.id).where(OutboxEvent.dispatched_at < cutoff).limit(settings.outbox_batch_size)
+        result = await db.execute(
+            delete(OutboxEvent).where(OutboxEvent.id.in_(batch)).execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount
+
+    async def run(self):
+        """后台分发任务：提交后被唤醒，否则按间隔检查其他进程写入或重试到期的事件"""
+        while True:
+            self._wakeup.clear()
+            async with AsyncSessionLocal() as db:
+                try:
+                    while await self.dispatch_pending(db) >= settings.outbox_batch_size:
+                        pass
+                    await self.purge_dispatched(db)
+                except Exception:
+                    logger.exception("Outbox dispatch failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.outbox_poll_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+
+# 创建全局事件总线实例
+event_bus = EventBus()
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_after_commit(session: Session):
+    events = session.info.pop(_PENDING_KEY, None)
+    if events:
+        event_bus.committed(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_after_rollback(session: Session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,185 @@
+"""
+SUMA LMS 日历ICS导出与订阅
+ICS由轻量的流式写入器逐个事件生成，不构建完整的日历对象。
+生成的内容以预压缩形式按用户缓存在进程内，并带有ETag：日历应用轮询订阅链接时，
+内容未变化直接返回304，缓存命中时不再查询日历数据。日历事件、选课和课程信息写入时失效，另有TTL兜底
+"""
+
+from typing import AsyncIterator, Dict, Hashable, Iterable, Iterator, Optional
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+import hashlib
+import re
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from app.compression import PrecompressedBody
+from app.config import settings
+
+ICS_MEDIA_TYPE = "text/calendar"
+FEED_KEY = "feed"  # 订阅链接在缓存中的键，导出使用 (开始时间, 结束时间)
+# DTSTART 以UTC输出，RRULE 中的 UNTIL 也必须是UTC（RFC 5545 3.3.10）
+_UNTIL_WITHOUT_ZONE = re.compile(r"(UNTIL=\d{8}T\d{6})(?!Z)")
+
+
+def _escape(text: str) -> str:
+    """转义TEXT类型属性值（RFC 5545 3.3.11）"""
+    return (
+        text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    """按75字节折行，不拆分UTF-8多字节字符（RFC 5545 3.1）"""
+    if len(line.encode("utf-8")) <= 75:
+        return line + "\r\n"
+    parts, current, size = [], [], 0
+    for char in line:
+        char_size = len(char.encode("utf-8"))
+        # 续行以一个空格开头，占用1字节
+        if size + char_size > (75 if not parts else 74):
+            parts.append("".join(current))
+            current, size = [], 0
+        current.append(char)
+        size += char_size
+    parts.append("".join(current))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _format_datetime(value: datetime) -> str:
+    """数据库中的无时区时间按UTC处理"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def _event_lines(row) -> Iterator[str]:
+    yield "BEGIN:VEVENT"
+    yield f"UID:event-{row.id}@suma-lms"
+    yield f"DTSTAMP:{_format_datetime(row.updated_at or row.created_at or row.start_time)}"
+    if row.is_all_day:
+        end_date = max(row.end_time.date(), row.start_time.date() + timedelta(days=1))
+        yield f"DTSTART;VALUE=DATE:{row.start_time.strftime('%Y%m%d')}"
+        yield f"DTEND;VALUE=DATE:{end_date.strftime('%Y%m%d')}"
+    else:
+        yield f"DTSTART:{_format_datetime(row.start_time)}"
+        yield f"DTEND:{_format_datetime(row.end_time)}"
+    if row.rrule:
+        # 重复事件原样输出规则，由日历应用展开
+        yield "RRULE:" + _UNTIL_WITHOUT_ZONE.sub(r"\1Z", row.rrule)
+        for exdate in row.exdates or ():
+            exdate = datetime.fromisoformat(exdate)
+            if row.is_all_day:
+                yield f"EXDATE;VALUE=DATE:{exdate.strftime('%Y%m%d')}"
+            else:
+                yield f"EXDATE:{_format_datetime(exdate)}"
+    yield f"SUMMARY:{_escape(row.title)}"
+    description = row.description or ""
+    if row.course_name:
+        description += f"\n\nCourse: {row.course_name} ({row.course_code})"
+    if description:
+        yield f"DESCRIPTION:{_escape(description)}"
+    yield "END:VEVENT"
+
+
+def iter_ics(rows: Iterable) -> Iterator[bytes]:
+    """逐个事件生成ICS内容，rows 为 crud.get_calendar_feed_rows 的结果"""
+    yield (
+        "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//SUMA LMS//Calendar//EN\r\n"
+        "CALSCALE:GREGORIAN\r\nX-WR-CALNAME:SUMA LMS\r\n"
+    ).encode()
+    for row in rows:
+        yield "".join(_fold(line) for line in _event_lines(row)).encode("utf-8")
+    yield b"END:VCALENDAR\r\n"
+
+
+def rows_etag(rows: Iterable) -> str:
+    """ICS内容完全由查询结果决定，用结果的摘要作为ETag，无需先生成内容"""
+    digest = hashlib.sha1()
+    for row in rows:
+        digest.update(repr(tuple(row)).encode("utf-8"))
+    # 不同编码的响应体不同，使用弱ETag
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match", "")
+    return etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*"
+
+
+def _not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+
+
+@dataclass
+class CachedCalendar:
+    body: PrecompressedBody
+    etag: str
+    created_at: datetime = field(default_factory=datetime.utcnow)
+
+    def response(self, request: Request, headers: Dict[str, str]) -> Response:
+        if _not_modified(request, self.etag):
+            return _not_modified_response(self.etag)
+        return self.body.response(request, ICS_MEDIA_TYPE, {**headers, "ETag": self.etag})
+
+
+class ICSCache:
+    """进程内的ICS缓存，按用户保存订阅内容和最近几个导出时间范围的预压缩内容
+
+    个人事件和选课写入使该用户失效；课程事件和课程信息写入影响所有选课用户，
+    缓存中没有选课关系，直接清空。订阅令牌每次都查数据库（有唯一索引），
+    令牌轮换和停用用户在所有进程中立即生效，缓存只按查到的用户保存内容。
+    """
+
+    def __init__(self):
+        self.calendars: Dict[int, Dict[Hashable, CachedCalendar]] = {}
+        # 每次失效递增，生成过程中发生失效时不保存过时的内容
+        self.generation = 0
+
+    def get(self, user_id: int, key: Hashable) -> Optional[CachedCalendar]:
+        entry = self.calendars.get(user_id, {}).get(key)
+        ttl = timedelta(minutes=settings.ics_export_cache_ttl_minutes)
+        if entry is None or datetime.utcnow() - entry.created_at > ttl:
+            return None
+        return entry
+
+    def put(self, user_id: int, key: Hashable, content: bytes, etag: str, generation: int):
+        """压缩并保存内容，每个用户只保留最近的几个导出时间范围"""
+        if generation != self.generation:
+            return
+        user_calendars = self.calendars.setdefault(user_id, {})
+        user_calendars.pop(key, None)
+        user_calendars[key] = CachedCalendar(body=PrecompressedBody.build(content), etag=etag)
+        exports = [k for k in user_calendars if k != FEED_KEY]
+        for stale in exports[:max(len(exports) - settings.ics_export_cache_per_user, 0)]:
+            del user_calendars[stale]
+
+    def respond(self, request: Request, user_id: int, key: Hashable, rows: list,
+                headers: Dict[str, str]) -> Response:
+        """缓存未命中时：ETag匹配返回304，否则流式返回ICS，生成完毕后写入缓存"""
+        etag = rows_etag(rows)
+        generation = self.generation
+        if _not_modified(request, etag):
+            self.put(user_id, key, b"".join(iter_ics(rows)), etag, generation)
+            return _not_modified_response(etag)
+
+        async def stream() -> AsyncIterator[bytes]:
+            chunks = []
+            for chunk in iter_ics(rows):
+                chunks.append(chunk)
+                yield chunk
+            self.put(user_id, key, b"".join(chunks), etag, generation)
+
+        return StreamingResponse(stream(), media_type=ICS_MEDIA_TYPE, headers={**headers, "ETag": etag})
+
+    def invalidate_user(self, user_id: int):
+        self.generation += 1
+        self.calendars.pop(user_id, None)
+
+    def invalidate_course(self, course_id: int):
+        self.generation += 1
+        self.calendars.clear()
+
+
+# 创建全局ICS缓存实例
+ics_cache = ICSCache()
@@ -1,14 +1,57 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from app.config import settings
-from app.database import engine, Base
-from app.routers import auth, courses, tasks, calendar, files
-from app.routers.ai import router as ai_router
+from app.auth import require_role
+from app.database import engine, Base, get_pool_stats, READ_YOUR_WRITES_HEADER
+from app.routers import auth, courses, tasks, calendar, files, realtime
+from app.routers.ai import router as ai_router, agent_manager
+from app.ollama_client import ollama_client
+from app.ai_digest import run_digest_scheduler
+from app.overdue import run_overdue_sweeper
+from app.reminders import reminder_scheduler
+from app.realtime import COURSE_EVENTS, USER_EVENTS, push_hub
+from app.events import event_bus
+from app.pagination import NEXT_CURSOR_HEADER
+from app.responses import default_response_class
+from app.compression import CompressionMiddleware
 
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动后台任务（模型预热、摘要刷新、逾期标记、截止提醒、事件分发）和推送广播监听，
+    关闭时释放共享的Ollama连接池和广播连接"""
+    await push_hub.start()
+    background_tasks = []
+    if settings.ollama_warmup_on_startup:
+        background_tasks.append(asyncio.create_task(agent_manager.warm_up()))
+    if settings.ai_digest_interval_minutes > 0:
+        background_tasks.append(asyncio.create_task(run_digest_scheduler()))
+    if settings.overdue_sweep_interval_minutes > 0:
+        background_tasks.append(asyncio.create_task(run_overdue_sweeper()))
+    if settings.reminder_scheduler_enabled:
+        reminder_scheduler.subscribe(push_hub.push_reminder)
+        background_tasks.append(asyncio.create_task(reminder_scheduler.run()))
+    if settings.outbox_dispatcher_enabled:
+        for event_type in COURSE_EVENTS + USER_EVENTS:
+            event_bus.subscribe(event_type, push_hub.push_domain_event)
+        background_tasks.append(asyncio.create_task(event_bus.run()))
+    
+    yield
+    
+    for task in background_tasks:
+        if not task.done():
+            task.cancel()
+    await push_hub.stop()
+    await ollama_client.aclose()
+
+
 # 创建FastAPI应用
 app = FastAPI(
     title="SUMA LMS API",
@@ -16,7 +59,9 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
-    openapi_url="/api/openapi.json"
+    openapi_url="/api/openapi.json",
+    default_response_class=default_response_class,
+    lifespan=lifespan
 )
 
 # 添加CORS中间件
@@ -26,8 +71,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, READ_YOUR_WRITES_HEADER],
 )
 
+# 添加响应压缩中间件（gzip/brotli）
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_minimum_size)
+
 # 添加受信任主机中间件
 app.add_middleware(
     TrustedHostMiddleware,
@@ -41,6 +90,7 @@ app.include_router(tasks.router, prefix="/api/v1")
 app.include_router(calendar.router, prefix="/api/v1")
 app.include_router(ai_router, prefix="/api/v1")  # 使用新的多智能体AI路由
 app.include_router(files.router, prefix="/api/v1")
+app.include_router(realtime.router)  # WebSocket推送：/ws
 
 
 @app.get("/")
@@ -67,15 +117,25 @@ async def api_health_check():
     return {"status": "healthy", "message": "SUMA LMS API is running"}
 
 
+@app.get("/api/health/db", dependencies=[Depends(require_role("admin"))])
+async def database_health_check():
+    """数据库连接池状态（借出等待时间、饱和度），包含连接池内部信息，仅管理员可访问"""
+    return {"status": "healthy", "pools": get_pool_stats()}
+
+
 # 全局异常处理器
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
-    return {"detail": "资源未找到"}
+    # 路由不存在时使用通用提示，接口抛出的404保留具体原因
+    detail = getattr(exc, "detail", None)
+    if not detail or detail == "Not Found":
+        detail = "资源未找到"
+    return JSONResponse(status_code=404, content={"detail": detail})
 
 
 @app.exception_handler(500)
 async def internal_error_handler(request, exc):
-    return {"detail": "内部服务器错误"}
+    return JSONResponse(status_code=500, content={"detail": "内部服务器错误"})
 
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Float, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Float, Enum, JSON, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -46,6 +46,7 @@ class User(Base):
     avatar_url = Column(String, nullable=True)
     theme_preference = Column(String, default="light")
     is_active = Column(Boolean, default=True)
+    calendar_feed_token = Column(String, unique=True, index=True, nullable=True)  # 日历订阅链接令牌
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -58,6 +59,9 @@ class User(Base):
 
 class Course(Base):
     __tablename__ = "courses"
+    __table_args__ = (
+        Index("ix_courses_teacher_id", "teacher_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -80,6 +84,11 @@ class Course(Base):
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
+    __table_args__ = (
+        # 每个用户在每门课程只能注册一次
+        Index("ix_enrollments_user_course", "user_id", "course_id", unique=True),
+        Index("ix_enrollments_course_id", "course_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -93,6 +102,11 @@ class Enrollment(Base):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_course_published_due", "course_id", "is_published", "due_date"),
+        # 提醒调度和逾期标记按截止时间范围查询所有课程的任务
+        Index("ix_tasks_published_due", "is_published", "due_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
@@ -113,6 +127,9 @@ class Task(Base):
 
 class TaskAttachment(Base):
     __tablename__ = "task_attachments"
+    __table_args__ = (
+        Index("ix_task_attachments_task_id", "task_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False)
@@ -128,6 +145,11 @@ class TaskAttachment(Base):
 
 class TaskSubmission(Base):
     __tablename__ = "task_submissions"
+    __table_args__ = (
+        # 每个用户对每个任务只有一份提交
+        Index("ix_task_submissions_task_user", "task_id", "user_id", unique=True),
+        Index("ix_task_submissions_user_status", "user_id", "status"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False)
@@ -149,6 +171,9 @@ class TaskSubmission(Base):
 
 class SubmissionAttachment(Base):
     __tablename__ = "submission_attachments"
+    __table_args__ = (
+        Index("ix_submission_attachments_submission_id", "submission_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     submission_id = Column(Integer, ForeignKey("task_submissions.id"), nullable=False)
@@ -164,6 +189,9 @@ class SubmissionAttachment(Base):
 
 class CourseResource(Base):
     __tablename__ = "course_resources"
+    __table_args__ = (
+        Index("ix_course_resources_course_id", "course_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
@@ -181,6 +209,10 @@ class CourseResource(Base):
 
 class Attendance(Base):
     __tablename__ = "attendance"
+    __table_args__ = (
+        Index("ix_attendance_user_status", "user_id", "status"),
+        Index("ix_attendance_user_course_date", "user_id", "course_id", "date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -197,6 +229,21 @@ class Attendance(Base):
 
 class CalendarEvent(Base):
     __tablename__ = "calendar_events"
+    __table_args__ = (
+        # 区间重叠查询按 end_time 做范围扫描：历史事件不断增加，而结束时间晚于窗口开始的事件很少
+        Index("ix_calendar_events_user_end_start", "user_id", "end_time", "start_time"),
+        Index("ix_calendar_events_course_end_start", "course_id", "end_time", "start_time"),
+        # 提醒调度按开始时间范围查询所有用户的事件，单次事件和系列分开，系列查询只扫描系列
+        Index("ix_calendar_events_single_start", "start_time",
+              sqlite_where=text("rrule IS NULL"), postgresql_where=text("rrule IS NULL")),
+        Index("ix_calendar_events_series_start", "start_time",
+              sqlite_where=text("rrule IS NOT NULL"), postgresql_where=text("rrule IS NOT NULL")),
+        # 重复事件系列很少，单独的部分索引使系列查询不扫描单次事件
+        Index("ix_calendar_events_user_series", "user_id", "recurrence_end",
+              sqlite_where=text("rrule IS NOT NULL"), postgresql_where=text("rrule IS NOT NULL")),
+        Index("ix_calendar_events_course_series", "course_id", "recurrence_end",
+              sqlite_where=text("rrule IS NOT NULL"), postgresql_where=text("rrule IS NOT NULL")),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
@@ -208,9 +255,50 @@ class CalendarEvent(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     is_all_day = Column(Boolean, default=False)
     color = Column(String, default="#3B82F6")
+    # 重复事件：start_time/end_time 为第一次发生，rrule 为RFC 5545重复规则（不含 RRULE: 前缀）
+    rrule = Column(String, nullable=True)
+    exdates = Column(JSON, nullable=True)  # 取消的单次发生的开始时间（ISO格式）
+    recurrence_end = Column(DateTime(timezone=True), nullable=True)  # 最后一次发生的结束时间，无限重复时为空
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
     course = relationship("Course")
     user = relationship("User")
+
+
+class AIDigest(Base):
+    __tablename__ = "ai_digests"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True, nullable=False)
+    response = Column(Text, nullable=False)
+    suggestions = Column(JSON, default=list)
+    learning_tips = Column(JSON, default=list)
+    agent_role = Column(String, nullable=False)
+    generated_at = Column(DateTime(timezone=True), nullable=False)
+    
+    # Relationships
+    user = relationship("User")
+
+
+class OutboxEvent(Base):
+    """领域事件发件箱：与业务写入在同一事务中保存，提交后由 app.events 异步分发"""
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # 分发器只扫描未分发的事件
+        Index("ix_outbox_events_pending", "id",
+              sqlite_where=text("dispatched_at IS NULL"), postgresql_where=text("dispatched_at IS NULL")),
+        Index("ix_outbox_events_dispatched_at", "dispatched_at"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    event_type = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # 分发进程领取一批事件后持有租约，租约过期未完成的事件由其他进程重新领取
+    claimed_by = Column(String, nullable=True)
+    claimed_until = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    dispatched_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)  # 超过最大重试次数时连同 dispatched_at 一起设置
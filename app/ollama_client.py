@@ -0,0 +1,236 @@
+"""
+SUMA LMS Ollama客户端
+所有Ollama流量（推理、健康检查、模型列表）共享同一个带连接池的异步HTTP客户端，
+并在多个推理后端之间做最少在途请求负载均衡、故障摘除和换节点重试
+"""
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+from dataclasses import dataclass
+import asyncio
+import itertools
+import time
+import zlib
+import httpx
+from app.config import settings
+
+
+class OllamaUnavailableError(Exception):
+    """没有可用的Ollama后端"""
+
+
+@dataclass
+class OllamaBackend:
+    """单个推理后端及其运行状态"""
+    base_url: str
+    outstanding: int = 0  # 在途请求数
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0  # 摘除截止时间（time.monotonic）
+    last_success: float = 0.0
+    total_requests: int = 0
+    total_failures: int = 0
+
+    @property
+    def is_ejected(self) -> bool:
+        return time.monotonic() < self.ejected_until
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.base_url,
+            "healthy": not self.is_ejected,
+            "outstanding": self.outstanding,
+            "consecutive_failures": self.consecutive_failures,
+            "total_requests": self.total_requests,
+            "total_failures": self.total_failures
+        }
+
+
+class OllamaClient:
+    """共享的Ollama异步客户端（keep-alive连接池 + 多后端负载均衡）"""
+
+    def __init__(self, base_urls: Optional[List[str]] = None):
+        urls = base_urls or settings.ollama_base_urls or [settings.ollama_base_url]
+        self.backends = [OllamaBackend(base_url=url.rstrip("/")) for url in urls]
+        self._rotation = itertools.count()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """获取HTTP客户端，首次使用或关闭后重新创建"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(
+                    settings.ollama_request_timeout,
+                    connect=settings.ollama_connect_timeout
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.ollama_max_connections,
+                    max_keepalive_connections=settings.ollama_max_keepalive_connections,
+                    keepalive_expiry=settings.ollama_keepalive_expiry
+                )
+            )
+        return self._client
+
+    def _pick_backend(self, exclude: Set[str],
+                      affinity_key: Optional[str] = None) -> Optional[OllamaBackend]:
+        """选择在途请求最少的后端；全部被摘除时选择最早恢复的后端。
+
+        指定 affinity_key（如会话ID）时优先固定到同一后端，以复用该节点上的KV缓存。
+        """
+        candidates = [b for b in self.backends if b.base_url not in exclude]
+        if not candidates:
+            return None
+
+        if affinity_key is not None:
+            preferred = self.backends[zlib.crc32(affinity_key.encode()) % len(self.backends)]
+            if preferred in candidates and not preferred.is_ejected:
+                return preferred
+
+        # 轮转起点，使在途请求数相同的后端被均匀选中
+        offset = next(self._rotation) % len(candidates)
+        candidates = candidates[offset:] + candidates[:offset]
+
+        available = [b for b in candidates if not b.is_ejected]
+        if available:
+            return min(available, key=lambda b: b.outstanding)
+        return min(candidates, key=lambda b: b.ejected_until)
+
+    def _mark_success(self, backend: OllamaBackend):
+        backend.consecutive_failures = 0
+        backend.ejected_until = 0.0
+        backend.last_success = time.monotonic()
+
+    def _mark_failure(self, backend: OllamaBackend):
+        backend.total_failures += 1
+        backend.consecutive_failures += 1
+        if backend.consecutive_failures >= settings.ollama_eject_after_failures:
+            backend.ejected_until = time.monotonic() + settings.ollama_eject_seconds
+
+    async def _request(self, method: str, path: str,
+                       affinity_key: Optional[str] = None, **kwargs) -> httpx.Response:
+        """发送请求；连接错误或5xx时摘除计数并换一个后端重试"""
+        tried: Set[str] = set()
+        last_error: Optional[Exception] = None
+        attempts = min(len(self.backends), settings.ollama_max_attempts)
+
+        for _ in range(attempts):
+            backend = self._pick_backend(tried, affinity_key)
+            if backend is None:
+                break
+            tried.add(backend.base_url)
+
+            backend.outstanding += 1
+            backend.total_requests += 1
+            try:
+                response = await self.client.request(method, backend.base_url + path, **kwargs)
+                if response.status_code >= 500:
+                    response.raise_for_status()
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                self._mark_failure(backend)
+                last_error = e
+                continue
+            finally:
+                backend.outstanding -= 1
+
+            self._mark_success(backend)
+            response.raise_for_status()
+            return response
+
+        raise OllamaUnavailableError(f"所有Ollama后端均不可用: {last_error}")
+
+    async def chat(self, model: str, messages: List[Dict[str, str]],
+                   options: Optional[Dict[str, Any]] = None,
+                   keep_alive: Optional[str] = None,
+                   affinity_key: Optional[str] = None) -> Dict[str, Any]:
+        """调用 /api/chat（非流式）"""
+        payload: Dict[str, Any] = {
+            "model": model,
+            "messages": messages,
+            "stream": False
+        }
+        if options:
+            payload["options"] = options
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+
+        response = await self._request("POST", "/api/chat", affinity_key=affinity_key, json=payload)
+        return response.json()
+
+    async def list_models(self) -> List[str]:
+        """获取已下载的模型名称列表"""
+        response = await self._request("GET", "/api/tags", timeout=settings.ollama_health_timeout)
+        return [
+            model.get("name") or model.get("model")
+            for model in response.json().get("models", [])
+        ]
+
+    async def _probe(self, backend: OllamaBackend) -> bool:
+        """探测单个后端并更新其摘除状态"""
+        try:
+            response = await self.client.get(
+                backend.base_url + "/api/tags",
+                timeout=settings.ollama_health_timeout
+            )
+            healthy = response.status_code == 200
+        except httpx.HTTPError:
+            healthy = False
+
+        if healthy:
+            self._mark_success(backend)
+        else:
+            self._mark_failure(backend)
+        return healthy
+
+    async def is_healthy(self) -> bool:
+        """是否至少有一个后端可用；近期有成功请求时不再重复探测"""
+        now = time.monotonic()
+        if any(
+            not b.is_ejected and now - b.last_success < settings.ollama_health_cache_seconds
+            for b in self.backends
+        ):
+            return True
+
+        results = await asyncio.gather(*(self._probe(b) for b in self.backends))
+        return any(results)
+
+    async def _warm_up_backend(self, backend: OllamaBackend, model: str,
+                               messages: List[Dict[str, str]], keep_alive: str) -> bool:
+        """在指定后端加载模型；带消息时只生成1个token以缓存该前缀"""
+        payload: Dict[str, Any] = {
+            "model": model,
+            "messages": messages,
+            "stream": False,
+            "keep_alive": keep_alive
+        }
+        if messages:
+            payload["options"] = {"num_predict": 1}
+
+        try:
+            response = await self.client.post(backend.base_url + "/api/chat", json=payload)
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    async def warm_up(self, primers: List[Tuple[str, List[Dict[str, str]]]],
+                      keep_alive: str) -> int:
+        """在每个后端上预热 (模型, 前缀消息) 列表，返回成功数量"""
+        tasks = [
+            self._warm_up_backend(backend, model, messages, keep_alive)
+            for backend in self.backends if not backend.is_ejected
+            for model, messages in primers
+        ]
+        results = await asyncio.gather(*tasks)
+        return sum(results)
+
+    def get_backend_stats(self) -> List[Dict[str, Any]]:
+        """获取各后端状态"""
+        return [backend.to_dict() for backend in self.backends]
+
+    async def aclose(self):
+        """关闭连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# 创建全局共享客户端实例
+ollama_client = OllamaClient()
@@ -0,0 +1,99 @@
+"""
+SUMA LMS 逾期状态批处理
+进程内定时任务把已过截止时间、仍未提交的任务提交标记为 OVERDUE，
+没有提交记录的选课学生插入一条占位提交。读取时直接按 (user_id, status) 索引过滤，
+不需要再逐行比较 due_date。更新和插入都是按批次执行的集合语句，每批单独提交，不长时间持有写锁
+"""
+
+from typing import Dict, Optional
+from datetime import datetime
+import asyncio
+import logging
+from sqlalchemy import exists, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import Enrollment, Task, TaskStatus, TaskSubmission
+
+logger = logging.getLogger(__name__)
+
+# 截止后仍处于这些状态的提交视为逾期
+OPEN_STATUSES = (TaskStatus.NOT_STARTED, TaskStatus.IN_PROGRESS)
+
+# 同一批连续冲突的最大重试次数，超过后放弃本轮剩余批次，等下一轮再处理
+MAX_CONFLICT_RETRIES = 3
+
+
+def _overdue_tasks(now: datetime):
+    return (Task.is_published == True, Task.due_date < now)
+
+
+async def _mark_batch(db: AsyncSession, now: datetime, batch_size: int) -> int:
+    """把一批未提交的逾期提交改为 OVERDUE"""
+    batch = select(TaskSubmission.id).join(Task, Task.id == TaskSubmission.task_id).where(
+        TaskSubmission.status.in_(OPEN_STATUSES),
+        *_overdue_tasks(now)
+    ).limit(batch_size)
+    result = await db.execute(
+        update(TaskSubmission)
+        .where(TaskSubmission.id.in_(batch))
+        .values(status=TaskStatus.OVERDUE, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+async def _insert_batch(db: AsyncSession, now: datetime, batch_size: int) -> int:
+    """为一批没有提交记录的选课学生插入 OVERDUE 占位提交"""
+    missing = select(
+        Task.id, Enrollment.user_id, literal(TaskStatus.OVERDUE, TaskSubmission.status.type), literal(now)
+    ).join(Enrollment, Enrollment.course_id == Task.course_id).where(
+        *_overdue_tasks(now),
+        ~exists().where(TaskSubmission.task_id == Task.id, TaskSubmission.user_id == Enrollment.user_id)
+    ).limit(batch_size)
+    result = await db.execute(
+        insert(TaskSubmission).from_select(["task_id", "user_id", "status", "created_at"], missing)
+    )
+    return result.rowcount
+
+
+async def sweep_overdue(db: AsyncSession, now: Optional[datetime] = None,
+                        batch_size: Optional[int] = None) -> Dict[str, int]:
+    """执行一次逾期标记，返回更新和插入的行数"""
+    now = now or datetime.utcnow()
+    batch_size = batch_size or settings.overdue_sweep_batch_size
+    stats = {"marked": 0, "created": 0}
+    for key, run_batch in (("marked", _mark_batch), ("created", _insert_batch)):
+        conflicts = 0
+        while True:
+            try:
+                count = await run_batch(db, now, batch_size)
+                await db.commit()
+            except IntegrityError:
+                # 多个进程同时执行时，另一进程可能已插入同一提交，重新查询下一批即可
+                await db.rollback()
+                conflicts += 1
+                if conflicts > MAX_CONFLICT_RETRIES:
+                    logger.warning("Overdue sweep: %s batch kept conflicting, skipped until next run", key)
+                    break
+                continue
+            conflicts = 0
+            stats[key] += count
+            if count < batch_size:
+                break
+    return stats
+
+
+async def run_overdue_sweeper():
+    """进程内定时任务：按配置间隔标记逾期提交"""
+    interval = settings.overdue_sweep_interval_minutes * 60
+    while True:
+        async with AsyncSessionLocal() as db:
+            try:
+                stats = await sweep_overdue(db)
+                if stats["marked"] or stats["created"]:
+                    logger.info("Overdue submissions updated: %s", stats)
+            except Exception:
+                logger.exception("Overdue sweep failed")
+        await asyncio.sleep(interval)
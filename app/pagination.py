@@ -0,0 +1,118 @@
+"""
+SUMA LMS 游标分页
+列表接口按 (排序键, id) 做keyset分页：下一页从上一页最后一行之后开始查询，
+不使用OFFSET，翻到多深都只扫描一页的数据。游标对客户端是不透明的字符串
+"""
+
+from typing import Any, List, Optional, Sequence, Tuple, Type
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+import base64
+import json
+from fastapi import HTTPException, Query, Response
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import and_, or_
+from sqlalchemy.sql import Select
+from app.config import settings
+
+# 下一页游标通过响应头返回，响应体仍是列表，兼容现有客户端
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+@dataclass
+class PageParams:
+    """分页参数：after 为上一页最后一行的 (排序键, id)"""
+    limit: int
+    after: Optional[Tuple[Any, int]] = None
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    """把 (排序键, id) 编码为不透明游标"""
+    if isinstance(sort_value, datetime):
+        payload = {"k": sort_value.isoformat(), "t": "dt", "id": row_id}
+    else:
+        payload = {"k": sort_value, "id": row_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """解析游标，格式不正确时返回400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        sort_value = payload["k"]
+        if payload.get("t") == "dt":
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+def page_params(
+    limit: int = Query(None, ge=1, description="每页条数"),
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Next-Cursor 中的游标")
+) -> Optional[PageParams]:
+    """列表接口的分页参数依赖项
+
+    limit 和 cursor 都没有时返回 None，接口返回完整列表，兼容尚未按游标翻页的客户端；
+    只带 cursor 时每页 default_page_size 条。
+    """
+    if limit is None and cursor is None:
+        return None
+    limit = min(limit or settings.default_page_size, settings.max_page_size)
+    return PageParams(limit=limit, after=decode_cursor(cursor) if cursor else None)
+
+
+def keyset(stmt: Select, sort_column, id_column, page: Optional[PageParams],
+           descending: bool = False) -> Select:
+    """为查询加上 (排序键, id) 排序、游标条件和 limit+1（多取一行用于判断是否有下一页）
+
+    page 为 None 时只加排序，返回完整结果（内部调用使用）。
+    """
+    same_key = sort_column is id_column
+    if descending:
+        order = [sort_column.desc()] if same_key else [sort_column.desc(), id_column.desc()]
+    else:
+        order = [sort_column] if same_key else [sort_column, id_column]
+    stmt = stmt.order_by(*order)
+    if page is None:
+        return stmt
+
+    if page.after is not None:
+        sort_value, row_id = page.after
+        if same_key:
+            stmt = stmt.where(id_column < row_id if descending else id_column > row_id)
+        elif descending:
+            stmt = stmt.where(or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < row_id)))
+        else:
+            stmt = stmt.where(or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > row_id)))
+    return stmt.limit(page.limit + 1)
+
+
+def paginate(rows: Sequence, page: Optional[PageParams], response: Response, sort_attr: str = "id") -> List:
+    """截取一页结果，有下一页时在响应头中写入游标；page 为 None 时原样返回完整结果"""
+    rows = list(rows)
+    if page is not None and len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(last, sort_attr), last.id)
+    return rows
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def list_response(rows: Sequence, model: Type[BaseModel], response: Response) -> Response:
+    """按所选视图的模型序列化列表并直接返回JSON响应
+
+    完整视图和摘要视图的 response_model 是两者的 Union，交给FastAPI校验时会先按完整模型尝试每一行；
+    这里由接口按 view 选定模型，只校验一次。依赖注入的 response 上已写入的响应头（下一页游标）一并返回。
+    """
+    adapter = _list_adapter(model)
+    body = adapter.dump_json(adapter.validate_python(list(rows), from_attributes=True))
+    headers = {k: v for k, v in response.headers.items() if k not in ("content-length", "content-type")}
+    return Response(content=body, media_type="application/json", headers=headers)
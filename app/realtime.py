@@ -0,0 +1,178 @@
+"""
+SUMA LMS 实时推送
+/ws 连接订阅本人频道 user:{id} 和所在课程的频道 course:{id}，领域事件（任务发布、作业评分、资源上传）
+由事件总线分发到这里，连同截止提醒推送到对应频道，前端不再轮询仪表板和待办接口。
+发布经过广播后端转发给所有工作进程，由各进程推送给本地连接：
+memory:// 为进程内实现（单进程部署、开发和测试），redis://... 使用Redis发布订阅（需安装 redis）
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+from datetime import datetime
+import asyncio
+import logging
+import orjson
+from starlette.websockets import WebSocket
+from app.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # 未安装 redis 时只能使用 memory://
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+MessageCallback = Callable[[str, bytes], Awaitable[None]]
+
+# 推送给客户端的领域事件及其频道
+COURSE_EVENTS = ("task.published", "task.updated", "resource.uploaded")
+USER_EVENTS = ("submission.graded",)
+
+
+def user_channel(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def course_channel(course_id: int) -> str:
+    return f"course:{course_id}"
+
+
+class MemoryBroadcast:
+    """进程内广播：发布直接交给本进程的订阅者"""
+
+    def __init__(self):
+        self._callback: Optional[MessageCallback] = None
+
+    async def publish(self, channel: str, message: bytes):
+        if self._callback is not None:
+            await self._callback(channel, message)
+
+    async def listen(self, callback: MessageCallback):
+        self._callback = callback
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self._callback = None
+
+    async def close(self):
+        pass
+
+
+class RedisBroadcast:
+    """Redis发布订阅广播：每个工作进程订阅全部推送频道，再按本地连接分发"""
+
+    prefix = "suma:push:"
+
+    def __init__(self, url: str):
+        if aioredis is None:
+            raise RuntimeError("BROADCAST_URL uses redis but the redis package is not installed")
+        self._client = aioredis.from_url(url)
+
+    async def publish(self, channel: str, message: bytes):
+        await self._client.publish(self.prefix + channel, message)
+
+    async def listen(self, callback: MessageCallback):
+        pubsub = self._client.pubsub()
+        await pubsub.psubscribe(self.prefix + "*")
+        try:
+            async for item in pubsub.listen():
+                if item["type"] == "pmessage":
+                    await callback(item["channel"].decode()[len(self.prefix):], item["data"])
+        finally:
+            await pubsub.aclose()
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def create_broadcast(url: str):
+    if url.startswith("memory://"):
+        return MemoryBroadcast()
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBroadcast(url)
+    raise ValueError(f"Unsupported BROADCAST_URL: {url}")
+
+
+class PushHub:
+    """本进程的WebSocket连接表和频道分发
+
+    发布失败只记录日志，不影响已经提交的写操作；推送超时或断开的连接直接移除。
+    """
+
+    def __init__(self, broadcast=None):
+        self.broadcast = broadcast or create_broadcast(settings.broadcast_url)
+        self.channels: Dict[str, Set[WebSocket]] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    def connect(self, websocket: WebSocket, channels: Iterable[str]):
+        for channel in channels:
+            self.channels.setdefault(channel, set()).add(websocket)
+
+    def disconnect(self, websocket: WebSocket, channels: Iterable[str]):
+        for channel in channels:
+            sockets = self.channels.get(channel)
+            if sockets is not None:
+                sockets.discard(websocket)
+                if not sockets:
+                    del self.channels[channel]
+
+    async def start(self):
+        if self._listener is None:
+            self._listener = asyncio.create_task(self.broadcast.listen(self._deliver))
+            await asyncio.sleep(0)  # 让监听先注册，启动后立即发布的事件不会丢失
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        await self.broadcast.close()
+
+    async def _deliver(self, channel: str, message: bytes):
+        sockets = list(self.channels.get(channel, ()))
+        if not sockets:
+            return
+        text = message.decode()
+
+        async def send(websocket: WebSocket):
+            try:
+                await asyncio.wait_for(websocket.send_text(text), timeout=settings.ws_send_timeout_seconds)
+            except Exception:
+                self.disconnect(websocket, [channel])
+
+        await asyncio.gather(*(send(websocket) for websocket in sockets))
+
+    async def publish(self, channel: str, event: str, data: Dict[str, Any]):
+        message = orjson.dumps({"channel": channel, "event": event, "data": data, "sent_at": datetime.utcnow()})
+        try:
+            await self.broadcast.publish(channel, message)
+        except Exception:
+            logger.exception("Publishing %s to %s failed", event, channel)
+
+    async def notify_user(self, user_id: int, event: str, data: Dict[str, Any]):
+        await self.publish(user_channel(user_id), event, data)
+
+    async def notify_course(self, course_id: int, event: str, data: Dict[str, Any]):
+        await self.publish(course_channel(course_id), event, data)
+
+    async def push_domain_event(self, event_type: str, payload: Dict[str, Any]):
+        """事件总线的订阅者：按事件类型推送到课程或用户频道"""
+        if event_type in COURSE_EVENTS:
+            if payload.get("is_published") is False:
+                return  # 未发布任务的修改不推送给学生
+            await self.notify_course(payload["course_id"], event_type, payload)
+        elif event_type in USER_EVENTS:
+            await self.notify_user(payload["user_id"], event_type, payload)
+
+    async def push_reminder(self, reminder):
+        """提醒调度器的处理函数：个人事件推送给所有者，其余推送给课程"""
+        data = {
+            "kind": reminder.kind, "id": reminder.item_id, "title": reminder.title,
+            "at": reminder.at, "offset_minutes": reminder.offset_minutes,
+        }
+        if reminder.user_id is not None and reminder.course_id is None:
+            await self.notify_user(reminder.user_id, "reminder", data)
+        elif reminder.course_id is not None:
+            await self.notify_course(reminder.course_id, "reminder", data)
+
+
+# 创建全局推送实例
+push_hub = PushHub()
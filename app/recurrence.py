@@ -0,0 +1,112 @@
+"""
+SUMA LMS 重复日历事件
+重复事件以一行"系列"保存：start_time/end_time 为第一次发生的时间，rrule 为 RFC 5545 重复规则，
+exdates 为取消的单次发生，recurrence_end 为最后一次发生的结束时间（无限重复时为空）。
+查询时只在请求的时间窗口内惰性展开，展开结果按 (规则, 窗口) 缓存
+"""
+
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+import heapq
+from dateutil.rrule import rrule, rrulestr
+from app.config import settings
+
+
+def parse_rrule(rule: str, dtstart: datetime) -> rrule:
+    """解析重复规则，格式不正确时抛出 ValueError"""
+    rule = rule.strip()
+    if rule.upper().startswith("RRULE:"):
+        rule = rule[6:]
+    if not rule or "\n" in rule:
+        raise ValueError("Recurrence rule must be a single RRULE value")
+    # 数据库中的无时区时间按UTC处理，规则中的 UNTIL=...Z 同样视为无时区
+    parsed = rrulestr(rule, dtstart=dtstart, ignoretz=dtstart.tzinfo is None)
+    if not isinstance(parsed, rrule):
+        raise ValueError("Recurrence rule must be a single RRULE value")
+    return parsed
+
+
+def normalize_rrule(rule: str, dtstart: datetime) -> str:
+    """校验并返回不带 RRULE: 前缀的规范形式"""
+    parsed = parse_rrule(rule, dtstart)
+    return next(line for line in str(parsed).splitlines() if line.startswith("RRULE:"))[6:]
+
+
+def series_end(rule: str, start_time: datetime, end_time: datetime, exdates: Sequence[datetime] = ()) -> Optional[datetime]:
+    """最后一次发生的结束时间；规则没有 COUNT/UNTIL 时为 None"""
+    if "COUNT=" not in rule.upper() and "UNTIL=" not in rule.upper():
+        return None
+    parsed = parse_rrule(rule, start_time)
+    excluded = set(exdates)
+    last = None
+    for occurrence in parsed:
+        if occurrence not in excluded:
+            last = occurrence
+    if last is None:
+        return start_time
+    return last + (end_time - start_time)
+
+
+@lru_cache(maxsize=settings.calendar_expansion_cache_size)
+def _occurrence_starts(rule: str, dtstart: datetime, duration: timedelta, exdates: Tuple[str, ...],
+                       window_start: datetime, window_end: datetime) -> Tuple[datetime, ...]:
+    """与窗口重叠的各次发生的开始时间（start < window_end 且 start + duration > window_start）"""
+    excluded = {datetime.fromisoformat(value) for value in exdates}
+    starts = parse_rrule(rule, dtstart).between(window_start - duration, window_end, inc=False)
+    return tuple(start for start in starts if start not in excluded)
+
+
+def expansion_cache_info():
+    return _occurrence_starts.cache_info()
+
+
+class Occurrence:
+    """重复事件的一次发生：开始/结束时间为本次发生的时间，其余属性来自系列"""
+
+    def __init__(self, series: Any, start_time: datetime):
+        self._series = series
+        self.start_time = start_time
+        self.end_time = start_time + (series.end_time - series.start_time)
+        self.recurrence_id = start_time
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._series, name)
+
+
+def as_naive_utc(value: datetime) -> datetime:
+    """数据库中保存无时区的UTC时间，带时区的值转换为同样的形式"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def occurrences(series: Any, window_start: datetime, window_end: datetime) -> List[Occurrence]:
+    """展开一个系列在窗口内的发生"""
+    if series.start_time.tzinfo is None:
+        # 查询参数可能带时区，与数据库中的无时区时间比较前统一为UTC
+        window_start, window_end = as_naive_utc(window_start), as_naive_utc(window_end)
+    starts = _occurrence_starts(
+        series.rrule, series.start_time, series.end_time - series.start_time,
+        tuple(series.exdates or ()), window_start, window_end
+    )
+    return [Occurrence(series, start) for start in starts]
+
+
+def merge(*event_lists: Iterable[Any]) -> List[Any]:
+    """合并多个已按 (start_time, id) 排序的列表"""
+    return list(heapq.merge(*event_lists, key=lambda event: (event.start_time, event.id)))
+
+
+def expand(events: Iterable[Any], window_start: datetime, window_end: datetime) -> List[Any]:
+    """把系列替换为窗口内的各次发生，结果按 (start_time, id) 排序
+
+    events 已按 (start_time, id) 排序，单次事件原样保留。
+    """
+    singles, expanded = [], []
+    for event in events:
+        if event.rrule:
+            expanded.append(occurrences(event, window_start, window_end))
+        else:
+            singles.append(event)
+    return merge(singles, *expanded)
@@ -0,0 +1,206 @@
+"""
+SUMA LMS 截止提醒调度
+任务截止时间和日历事件开始时间按配置的提前量生成提醒，放入进程内的最小堆，后台任务只等待堆顶的下一次提醒。
+创建、修改任务和事件时增量更新堆，每次操作 O(log n)；被替换的提醒只标记为过期，出堆时丢弃。
+堆中只保存未来一段时间窗口内的提醒，窗口向前推进时按索引查询新进入窗口的截止时间，不轮询整张表。
+每个进程各自调度，多进程部署时只在一个进程中启用（REMINDER_SCHEDULER_ENABLED）
+"""
+
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import asyncio
+import heapq
+import itertools
+import logging
+from app.config import settings
+from app.crud import get_reminder_event_rows, get_reminder_task_rows
+from app.database import AsyncSessionLocal
+from app.recurrence import as_naive_utc, occurrences
+
+logger = logging.getLogger(__name__)
+
+ItemKey = Tuple[str, int]  # ("task" | "event", id)
+
+
+@dataclass(frozen=True)
+class Reminder:
+    kind: str  # "task" 截止提醒，"event" 事件开始提醒
+    item_id: int
+    title: str
+    at: datetime  # 截止时间或（本次发生的）开始时间
+    offset_minutes: int
+    course_id: Optional[int] = None
+    user_id: Optional[int] = None  # 个人事件的所有者
+
+    @property
+    def fire_at(self) -> datetime:
+        return self.at - timedelta(minutes=self.offset_minutes)
+
+
+ReminderHandler = Callable[[Reminder], Awaitable[None]]
+
+
+async def log_reminder(reminder: Reminder):
+    logger.info("Reminder: %s %s '%s' at %s", reminder.kind, reminder.item_id, reminder.title, reminder.at)
+
+
+class ReminderScheduler:
+    """最小堆提醒调度器
+
+    堆元素为 (触发时间, 序号, 版本, 提醒)。每个任务/事件当前的提醒共用一个版本号，
+    重新调度或取消时换掉版本号，旧元素留在堆中，出堆时发现版本不符直接丢弃；
+    过期元素超过一半时重建堆，使堆的大小与待发送的提醒数同阶。
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int, int, Reminder]] = []
+        self._counter = itertools.count()
+        self._versions: Dict[ItemKey, int] = {}
+        self._live: Dict[ItemKey, int] = {}  # 每个任务/事件在堆中的有效提醒数
+        self._stale = 0
+        self._wakeup = asyncio.Event()
+        # 截止/开始时间早于 loaded_until 的提醒都已在堆中，之后的由窗口推进时加载
+        self.loaded_until: Optional[datetime] = None
+        # 加载过程中被重新调度的任务/事件以调度结果为准，加载时跳过
+        self._loading_until: Optional[datetime] = None
+        self._touched: Set[ItemKey] = set()
+        self.handlers: List[ReminderHandler] = [log_reminder]
+
+    def __len__(self) -> int:
+        return len(self._heap) - self._stale
+
+    def subscribe(self, handler: ReminderHandler):
+        if handler not in self.handlers:
+            self.handlers.append(handler)
+
+    @staticmethod
+    def _span() -> timedelta:
+        """窗口长度：覆盖未来 horizon 内会触发的所有提醒"""
+        return timedelta(hours=settings.reminder_horizon_hours, minutes=max(settings.reminder_offsets_minutes, default=0))
+
+    def _add(self, key: ItemKey, title: str, starts: Iterable[datetime], window_start: datetime,
+             window_end: datetime, now: datetime, course_id: Optional[int] = None, user_id: Optional[int] = None):
+        """为 [window_start, window_end) 内的每个时间点按各提前量入堆，已经过去的提醒跳过"""
+        version = self._versions.setdefault(key, next(self._counter))
+        pushed = 0
+        for at in starts:
+            at = as_naive_utc(at)
+            if not window_start <= at < window_end:
+                continue
+            for offset in settings.reminder_offsets_minutes:
+                reminder = Reminder(key[0], key[1], title, at, offset, course_id, user_id)
+                if reminder.fire_at > now:
+                    heapq.heappush(self._heap, (reminder.fire_at, next(self._counter), version, reminder))
+                    pushed += 1
+        if pushed:
+            self._live[key] = self._live.get(key, 0) + pushed
+            self._wakeup.set()
+        elif key not in self._live:
+            del self._versions[key]
+
+    def cancel(self, key: ItemKey):
+        """作废一个任务/事件的全部提醒，O(1)"""
+        self._versions.pop(key, None)
+        self._stale += self._live.pop(key, 0)
+        if self._stale > 64 and self._stale * 2 > len(self._heap):
+            self._heap = [entry for entry in self._heap if self._versions.get((entry[3].kind, entry[3].item_id)) == entry[2]]
+            heapq.heapify(self._heap)
+            self._stale = 0
+
+    def _reschedule(self, key: ItemKey, title: str, starts: Iterable[datetime], **owner):
+        self.cancel(key)
+        window_end = self._loading_until or self.loaded_until
+        if window_end is None:
+            return  # 尚未启动，首次加载时会包含
+        if self._loading_until is not None:
+            self._touched.add(key)
+        now = datetime.utcnow()
+        self._add(key, title, starts, now, window_end, now, **owner)
+
+    def schedule_task(self, task):
+        """任务创建或修改后调用；未发布的任务没有提醒"""
+        starts = [task.due_date] if task.is_published else []
+        self._reschedule(("task", task.id), task.title, starts, course_id=task.course_id)
+
+    def schedule_event(self, event):
+        """日历事件创建或修改后调用；重复事件按窗口内的各次发生提醒"""
+        if event.rrule:
+            now = datetime.utcnow()
+            starts = [o.start_time for o in occurrences(event, now, self._loading_until or self.loaded_until or now)]
+        else:
+            starts = [event.start_time]
+        self._reschedule(("event", event.id), event.title, starts, course_id=event.course_id, user_id=event.user_id)
+
+    async def load(self, until: datetime):
+        """把截止/开始时间在 [loaded_until, until) 内的任务和事件加入堆"""
+        now = datetime.utcnow()
+        start = self.loaded_until or now
+        self._loading_until, self._touched = until, set()
+        try:
+            async with AsyncSessionLocal() as db:
+                tasks = await get_reminder_task_rows(db, start, until)
+                events = await get_reminder_event_rows(db, start, until)
+        finally:
+            self._loading_until = None
+        for task in tasks:
+            if ("task", task.id) in self._touched:
+                continue
+            self._add(("task", task.id), task.title, [task.due_date], start, until, now, course_id=task.course_id)
+        for event in events:
+            if ("event", event.id) in self._touched:
+                continue
+            starts = [o.start_time for o in occurrences(event, start, until)] if event.rrule else [event.start_time]
+            self._add(("event", event.id), event.title, starts, start, until, now,
+                      course_id=event.course_id, user_id=event.user_id)
+        self.loaded_until = until
+
+    def pop_due(self, now: datetime) -> List[Reminder]:
+        """取出所有已到触发时间的有效提醒"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, version, reminder = heapq.heappop(self._heap)
+            key = (reminder.kind, reminder.item_id)
+            if self._versions.get(key) != version:
+                self._stale -= 1
+                continue
+            self._live[key] -= 1
+            if not self._live[key]:
+                del self._live[key], self._versions[key]
+            due.append(reminder)
+        return due
+
+    async def _dispatch(self, reminder: Reminder):
+        for handler in self.handlers:
+            try:
+                await handler(reminder)
+            except Exception:
+                logger.exception("Reminder handler failed for %s %s", reminder.kind, reminder.item_id)
+
+    async def run(self):
+        """后台任务：睡眠到堆顶提醒的触发时间或窗口需要推进时；新提醒更早时被唤醒"""
+        while True:
+            now = datetime.utcnow()
+            span = self._span()
+            if self.loaded_until is None or self.loaded_until - now < span / 2:
+                try:
+                    await self.load(now + span)
+                except Exception:
+                    logger.exception("Loading reminders failed")
+                    await asyncio.sleep(60)  # 数据库不可用时不要立即重试
+                    continue
+            for reminder in self.pop_due(now):
+                await self._dispatch(reminder)
+
+            wake_at = (self.loaded_until or now) - span / 2
+            if self._heap:
+                wake_at = min(wake_at, self._heap[0][0])
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max((wake_at - now).total_seconds(), 0.01))
+            except asyncio.TimeoutError:
+                pass
+
+
+# 创建全局提醒调度器实例
+reminder_scheduler = ReminderScheduler()
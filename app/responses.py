@@ -0,0 +1,32 @@
+"""
+SUMA LMS 响应类
+使用 orjson 编码JSON响应，Pydantic模型直接导出后交给 orjson，不再经过标准库 json
+"""
+
+from typing import Any
+import inspect
+import orjson
+from fastapi import routing
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def _orjson_default(obj: Any) -> Any:
+    """orjson 无法直接处理的类型"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class ORJSONResponse(JSONResponse):
+    """使用 orjson 编码的JSON响应"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+# 较新的 FastAPI 对声明了 response_model 的接口直接用 Pydantic 序列化为JSON字节，比 orjson 更快，
+# 但只在没有设置自定义响应类时生效；此时保留默认响应类，否则使用 orjson
+PYDANTIC_JSON_FAST_PATH = "dump_json" in inspect.signature(routing.serialize_response).parameters
+
+default_response_class = JSONResponse if PYDANTIC_JSON_FAST_PATH else ORJSONResponse
@@ -5,63 +5,28 @@ SUMA LMS AI路由 - 多智能体系统
 
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.auth import get_current_active_user
 from app.schemas import AIQuery, AIResponse, User
 from app.crud import get_upcoming_tasks, get_user_courses, get_dashboard_stats
 from app.models import User
 from app.config import settings
-from app.ai_agents import AgentManager, AgentRole, UserContext
+from app.ai_agents import AgentRole, agent_manager
+from app.ai_context import build_user_context
+from app.ai_digest import get_user_digest, generate_user_digest, is_digest_stale
 from app.ai_guardrails import guardrail_system
-import ollama
-import requests
+from app.ai_sessions import conversation_store
+from app.ollama_client import ollama_client
 import json
 from datetime import datetime
 
 router = APIRouter(prefix="/ai", tags=["AI助手"])
 
-# 初始化智能体管理器
-agent_manager = AgentManager()
 
-
-def test_ollama_connection() -> bool:
-    """测试Ollama是否正在运行且可访问"""
-    try:
-        response = requests.get(f"{settings.ollama_base_url}/api/tags", timeout=5)
-        return response.status_code == 200
-    except:
-        return False
-
-
-def build_user_context(user: User, course_id: Optional[int] = None, 
-                      task_id: Optional[int] = None, db: Session = None) -> UserContext:
-    """构建用户上下文信息"""
-    # 获取用户最近的学习主题
-    recent_topics = []
-    if db:
-        try:
-            upcoming_tasks = get_upcoming_tasks(db, user.id, 30)
-            recent_topics = list(set([task.course.name for task in upcoming_tasks[:5]]))
-        except:
-            pass
-    
-    # 根据用户角色确定学习水平
-    learning_level = "beginner"
-    if user.role.value == "teacher":
-        learning_level = "advanced"
-    elif user.role.value == "admin":
-        learning_level = "expert"
-    
-    return UserContext(
-        user_id=user.id,
-        course_id=course_id,
-        task_id=task_id,
-        learning_level=learning_level,
-        subject_area=None,  # 可以根据课程信息推断
-        recent_topics=recent_topics,
-        learning_goals=["提高学习效率", "掌握核心概念", "培养批判性思维"]
-    )
+async def test_ollama_connection() -> bool:
+    """测试Ollama是否正在运行且可访问（复用共享连接池）"""
+    return await ollama_client.is_healthy()
 
 
 @router.post("/query", response_model=AIResponse)
@@ -70,13 +35,13 @@ async def query_ai_assistant(
     agent_type: Optional[str] = Query(None, description="指定AI智能体类型"),
     course_id: Optional[int] = Query(None, description="课程ID"),
     task_id: Optional[int] = Query(None, description="任务ID"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """查询AI助手 - 多智能体系统"""
     
     # 检查Ollama连接
-    if not test_ollama_connection():
+    if not await test_ollama_connection():
         return AIResponse(
             response="AI Assistant is temporarily unavailable. Please ensure Ollama service is running.\n\nSetup steps:\n1. Install Ollama: https://ollama.ai\n2. Start service: ollama serve\n3. Pull model: ollama pull llama3.1:8b",
             suggestions=["Check Ollama service status", "Restart Ollama", "Check network connection"]
@@ -111,7 +76,7 @@ async def query_ai_assistant(
                 )
         
         # 构建用户上下文
-        context = build_user_context(current_user, course_id, task_id, db)
+        context = await build_user_context(current_user, course_id, task_id, db)
         
         # 选择智能体
         preferred_agent = None
@@ -172,53 +137,67 @@ async def get_agent_details(agent_type: str):
 
 @router.get("/dashboard-summary", response_model=AIResponse)
 async def get_dashboard_summary(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """获取AI生成的仪表板摘要"""
+    """获取AI生成的仪表板摘要（优先读取批处理预生成的结果）"""
     
-    if not test_ollama_connection():
-        return AIResponse(
-            response="AI Assistant is temporarily unavailable, cannot generate dashboard summary.",
-            suggestions=["Check Ollama service status", "Restart Ollama"]
-        )
+    digest = await get_user_digest(db, current_user.id)
     
-    try:
-        # 获取用户数据
-        context = build_user_context(current_user, db=db)
-        
-        # 使用学习分析员智能体
-        result = await agent_manager.route_query(
-            query="请分析我的学习情况并提供个性化建议",
-            context=context,
-            preferred_agent=AgentRole.LEARNING_ANALYST
-        )
+    # 没有预生成结果或结果已过期时实时生成一次，并保存供后续读取；
+    # 过期摘要无法重新生成时仍然返回，并标记为 stale
+    if digest is None or is_digest_stale(digest):
+        if not await test_ollama_connection():
+            if digest is not None:
+                return _digest_response(digest, stale=True)
+            return AIResponse(
+                response="AI Assistant is temporarily unavailable, cannot generate dashboard summary.",
+                suggestions=["Check Ollama service status", "Restart Ollama"]
+            )
         
-        return AIResponse(
-            response=result["response"],
-            suggestions=result["suggestions"],
-            learning_tips=result.get("learning_tips", []),
-            agent_role=result["agent_role"],
-            timestamp=result["timestamp"]
-        )
+        try:
+            fresh_digest = await generate_user_digest(db, current_user)
+        except Exception as e:
+            if digest is not None:
+                return _digest_response(digest, stale=True)
+            return AIResponse(
+                response=f"Error generating dashboard summary: {str(e)}",
+                suggestions=["Try again later", "Check data integrity"]
+            )
         
-    except Exception as e:
-        return AIResponse(
-            response=f"Error generating dashboard summary: {str(e)}",
-            suggestions=["Try again later", "Check data integrity"]
-        )
+        if fresh_digest is None:
+            if digest is not None:
+                return _digest_response(digest, stale=True)
+            return AIResponse(
+                response="AI Assistant is temporarily unavailable, cannot generate dashboard summary.",
+                suggestions=["Try again later", "Check Ollama service status"]
+            )
+        digest = fresh_digest
+    
+    return _digest_response(digest)
+
+
+def _digest_response(digest, stale: bool = False) -> AIResponse:
+    return AIResponse(
+        response=digest.response,
+        suggestions=digest.suggestions or [],
+        learning_tips=digest.learning_tips or [],
+        agent_role=digest.agent_role,
+        timestamp=digest.generated_at.isoformat(),
+        stale=stale
+    )
 
 
 @router.post("/task-analysis", response_model=AIResponse)
 async def analyze_task_file(
     task_id: int,
     query_data: AIQuery,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """分析任务文件并提供AI洞察"""
     
-    if not test_ollama_connection():
+    if not await test_ollama_connection():
         return AIResponse(
             response="AI Assistant is temporarily unavailable, cannot analyze task files.",
             suggestions=["Check Ollama service status", "Restart Ollama"]
@@ -226,7 +205,7 @@ async def analyze_task_file(
     
     try:
         # 构建用户上下文
-        context = build_user_context(current_user, task_id=task_id, db=db)
+        context = await build_user_context(current_user, task_id=task_id, db=db)
         
         # 根据任务类型选择智能体
         # 这里可以根据任务类型（编程、写作、数学等）选择不同的智能体
@@ -257,12 +236,12 @@ async def analyze_task_file(
 async def get_study_tips(
     course_id: Optional[int] = Query(None, description="课程ID"),
     subject: Optional[str] = Query(None, description="学科领域"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取个性化学习建议"""
     
-    if not test_ollama_connection():
+    if not await test_ollama_connection():
         return AIResponse(
             response="AI Assistant is temporarily unavailable, cannot provide study tips.",
             suggestions=["Check Ollama service status", "Restart Ollama"]
@@ -270,7 +249,7 @@ async def get_study_tips(
     
     try:
         # 构建用户上下文
-        context = build_user_context(current_user, course_id=course_id, db=db)
+        context = await build_user_context(current_user, course_id=course_id, db=db)
         if subject:
             context.subject_area = subject
         
@@ -302,7 +281,7 @@ async def get_ai_status():
     
     try:
         # 检查Ollama连接
-        is_connected = test_ollama_connection()
+        is_connected = await test_ollama_connection()
         
         if not is_connected:
             return {
@@ -316,9 +295,7 @@ async def get_ai_status():
         
         # 获取可用模型
         try:
-            client = ollama.Client(host=settings.ollama_base_url)
-            models = client.list()
-            available_models = [model.model for model in models.models]
+            available_models = await ollama_client.list_models()
         except:
             available_models = []
         
@@ -329,7 +306,13 @@ async def get_ai_status():
             "available_agents": [role.value for role in AgentRole],
             "available_models": available_models,
             "current_model": settings.ollama_model,
+            "agent_models": {
+                role.value: agent.generation.model
+                for role, agent in agent_manager.agents.items()
+            },
+            "router_model": settings.ollama_router_model,
             "ollama_url": settings.ollama_base_url,
+            "ollama_backends": ollama_client.get_backend_stats(),
             "features": [
                 "Multi-agent collaboration",
                 "Responsible AI interaction",
@@ -355,12 +338,13 @@ async def start_conversation(
     query_data: AIQuery,
     conversation_type: str = Query("general", description="对话类型: general, learning, problem_solving, writing, coding"),
     course_id: Optional[int] = Query(None, description="课程ID"),
-    db: Session = Depends(get_db),
+    session_id: Optional[str] = Query(None, description="会话ID，为空或已过期时创建新会话"),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """开始与AI的对话式交互"""
+    """开始或继续与AI的对话式交互"""
     
-    if not test_ollama_connection():
+    if not await test_ollama_connection():
         return AIResponse(
             response="AI助手暂时不可用，无法开始对话。",
             suggestions=["检查Ollama服务状态", "重新启动Ollama"]
@@ -378,15 +362,24 @@ async def start_conversation(
         
         preferred_agent = agent_mapping.get(conversation_type, AgentRole.LEARNING_MENTOR)
         
+        # 获取或创建会话，已有会话沿用其智能体
+        session = conversation_store.get_or_create(
+            current_user.id, session_id, preferred_agent, conversation_type
+        )
+        
         # 构建用户上下文
-        context = build_user_context(current_user, course_id=course_id, db=db)
+        context = await build_user_context(current_user, course_id=course_id, db=db)
         
-        # 开始对话
+        # 携带按token预算组装的历史继续对话
         result = await agent_manager.route_query(
             query=query_data.query,
             context=context,
-            preferred_agent=preferred_agent
+            preferred_agent=session.agent_role,
+            history=conversation_store.build_history(session),
+            session_id=session.session_id
         )
+        if not result.get("error"):
+            conversation_store.append_exchange(session, query_data.query, result["response"])
         
         return AIResponse(
             response=result["response"],
@@ -394,7 +387,8 @@ async def start_conversation(
             learning_tips=result.get("learning_tips", []),
             agent_role=result["agent_role"],
             timestamp=result["timestamp"],
-            conversation_type=conversation_type
+            conversation_type=session.conversation_type,
+            session_id=session.session_id
         )
         
     except Exception as e:
@@ -404,9 +398,20 @@ async def start_conversation(
         )
 
 
+@router.delete("/conversation/{session_id}")
+async def end_conversation(
+    session_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """结束对话并释放会话"""
+    if not conversation_store.delete(current_user.id, session_id):
+        raise HTTPException(status_code=404, detail="会话不存在或已过期")
+    return {"message": "会话已结束"}
+
+
 @router.get("/guardrails/user-report")
 async def get_user_guardrail_report(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取用户护栏系统报告"""
@@ -453,7 +458,7 @@ async def get_guardrail_system_stats(
 @router.post("/guardrails/test-query")
 async def test_query_guardrails(
     query: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """测试查询护栏系统（用于调试）"""
@@ -1,114 +1,177 @@
-from typing import List
+from typing import Dict, List, Literal, Optional, Union
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import Response
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, get_read_db
 from app.auth import get_current_active_user
-from app.schemas import CalendarEvent, CalendarEventCreate, DashboardData, DashboardStats
+from app.schemas import (
+    CalendarDay, CalendarEvent, CalendarEventCreate, CalendarEventException, CalendarEventSummary, CalendarFeed, CalendarRange,
+    DashboardData, DashboardStats, FreeBusy, TaskSummary, TimeInterval, WeeklyCalendar
+)
 from app.crud import (
     get_user_calendar_events, create_calendar_event, get_dashboard_stats,
-    get_upcoming_tasks
+    get_upcoming_task_rows, get_calendar_feed_rows, get_user_by_calendar_feed_token,
+    rotate_calendar_feed_token, get_calendar_range, get_calendar_event, add_calendar_event_exception,
+    get_course, get_course_busy_rows
 )
 from app.models import User
-from ics import Calendar, Event as ICSEvent
+from app.pagination import PageParams, list_response, page_params, paginate
+from app.ics_export import FEED_KEY, ics_cache
+from app.freebusy import busy_intervals, free_slots, merge_intervals
+from app.recurrence import as_naive_utc
+from app.reminders import reminder_scheduler
+from app.config import settings
 
 router = APIRouter(prefix="/calendar", tags=["日历"])
 
 
-@router.get("/events", response_model=List[CalendarEvent])
+@router.get("/events", response_model=Union[List[CalendarEvent], List[CalendarEventSummary]])
 async def read_calendar_events(
+    response: Response,
     start_date: datetime = Query(..., description="Start date for events"),
     end_date: datetime = Query(..., description="End date for events"),
-    db: Session = Depends(get_db),
+    view: Literal["full", "summary"] = "full",
+    page: Optional[PageParams] = Depends(page_params),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get calendar events for current user within date range"""
-    return get_user_calendar_events(db, current_user.id, start_date, end_date)
+    events = await get_user_calendar_events(
+        db, current_user.id, start_date, end_date, page, summary=view == "summary"
+    )
+    model = CalendarEventSummary if view == "summary" else CalendarEvent
+    return list_response(paginate(events, page, response, "start_time"), model, response)
 
 
 @router.post("/events", response_model=CalendarEvent)
 async def create_new_event(
     event: CalendarEventCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Create a new calendar event; set rrule (e.g. FREQ=WEEKLY;COUNT=12) for a recurring series"""
+    try:
+        db_event = await create_calendar_event(db=db, event=event, user_id=current_user.id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid recurrence rule: {exc}")
+    _invalidate_event_cache(db_event)
+    reminder_scheduler.schedule_event(db_event)
+    return db_event
+
+
+@router.post("/events/{event_id}/exceptions", response_model=CalendarEvent)
+async def cancel_event_occurrence(
+    event_id: int,
+    exception: CalendarEventException,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Create a new calendar event"""
-    return create_calendar_event(db=db, event=event, user_id=current_user.id)
+    """Cancel a single occurrence of a recurring event"""
+    db_event = await get_calendar_event(db, event_id)
+    if db_event is None or db_event.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if not db_event.rrule:
+        raise HTTPException(status_code=400, detail="Event is not recurring")
+    db_event = await add_calendar_event_exception(db, db_event, exception.occurrence_start)
+    _invalidate_event_cache(db_event)
+    reminder_scheduler.schedule_event(db_event)
+    return db_event
+
+
+def _invalidate_event_cache(db_event):
+    if db_event.course_id is not None:
+        ics_cache.invalidate_course(db_event.course_id)
+    else:
+        ics_cache.invalidate_user(db_event.user_id)
 
 
 @router.get("/export/ics")
 async def export_calendar_ics(
+    request: Request,
     start_date: datetime = Query(..., description="Start date for export"),
     end_date: datetime = Query(..., description="End date for export"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Export calendar events as .ics file"""
-    events = get_user_calendar_events(db, current_user.id, start_date, end_date)
-    
-    # Create ICS calendar
-    calendar = Calendar()
+    headers = {"Content-Disposition": f"attachment; filename=suma_calendar_{current_user.username}.ics"}
+    key = (start_date, end_date)
+    cached = ics_cache.get(current_user.id, key)
+    if cached is not None:
+        return cached.response(request, headers)
     
-    for event in events:
-        ics_event = ICSEvent()
-        ics_event.name = event.title
-        ics_event.description = event.description or ""
-        ics_event.begin = event.start_time
-        ics_event.end = event.end_time
-        ics_event.all_day = event.is_all_day
-        
-        # Add course information if available
-        if event.course:
-            ics_event.description += f"\n\nCourse: {event.course.name} ({event.course.code})"
-        
-        calendar.events.add(ics_event)
+    rows = await get_calendar_feed_rows(db, current_user.id, start_date, end_date)
+    return ics_cache.respond(request, current_user.id, key, rows, headers)
+
+
+@router.post("/feed/token", response_model=CalendarFeed)
+async def create_calendar_feed(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Issue a calendar subscription URL; any previous URL stops working"""
+    token = await rotate_calendar_feed_token(db, current_user)
+    url = str(request.url_for("read_calendar_feed", token=token))
+    return CalendarFeed(url=url, webcal_url="webcal://" + url.split("://", 1)[1])
+
+
+@router.get("/feed/{token}.ics")
+async def read_calendar_feed(
+    token: str,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Calendar subscription feed, authenticated by the token in the URL"""
+    # The token is looked up every time so rotated tokens and deactivated users stop working on all workers
+    user = await get_user_by_calendar_feed_token(db, token)
+    if user is None:
+        raise HTTPException(status_code=404, detail="Calendar feed not found")
+    user_id = user.id
     
-    # Generate ICS content
-    ics_content = str(calendar)
+    cached = ics_cache.get(user_id, FEED_KEY)
+    if cached is not None:
+        return cached.response(request, {})
     
-    return Response(
-        content=ics_content,
-        media_type="text/calendar",
-        headers={
-            "Content-Disposition": f"attachment; filename=suma_calendar_{current_user.username}.ics"
-        }
+    now = datetime.utcnow()
+    rows = await get_calendar_feed_rows(
+        db, user_id,
+        now - timedelta(days=settings.calendar_feed_past_days),
+        now + timedelta(days=settings.calendar_feed_future_days)
     )
+    return ics_cache.respond(request, user_id, FEED_KEY, rows, {})
 
 
 @router.get("/dashboard", response_model=DashboardData)
 async def get_dashboard_data(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get dashboard data including stats and upcoming tasks"""
     # Get dashboard stats
-    stats = get_dashboard_stats(db, current_user.id)
+    stats = await get_dashboard_stats(db, current_user.id)
     
     # Get upcoming tasks
-    upcoming_tasks = get_upcoming_tasks(db, current_user.id, 7)
+    upcoming_tasks = await get_upcoming_task_rows(db, current_user.id, 7)
     
     # Convert to UpcomingTask format
     from app.schemas import UpcomingTask
-    from app.crud import get_task_submission
     
     upcoming_task_list = []
     for task in upcoming_tasks:
         days_until_due = (task.due_date - datetime.utcnow()).days
         
-        # Get user's submission for this task
-        submission = get_task_submission(db, task.id, current_user.id)
-        status = submission.status if submission else "not_started"
-        
+        # Submission status is joined into each row by the query
         upcoming_task = UpcomingTask(
             id=task.id,
             title=task.title,
-            course_name=task.course.name,
-            course_icon=task.course.icon,
-            course_color=task.course.color,
+            course_name=task.course_name,
+            course_icon=task.course_icon,
+            course_color=task.course_color,
             due_date=task.due_date,
             task_type=task.task_type,
-            status=status,
+            status=task.status,
             days_until_due=days_until_due
         )
         upcoming_task_list.append(upcoming_task)
@@ -127,55 +190,109 @@ async def get_dashboard_data(
     )
 
 
-@router.get("/weekly")
+def _bucket_by_day(start: datetime, end: datetime, events: List, tasks: List) -> Dict[str, CalendarDay]:
+    """Group events and tasks into days in one pass
+
+    Tasks go to the day they are due; events go to every day they cover inside
+    the range, so a multi-day event shows up on each of its days.
+    """
+    days: Dict[str, CalendarDay] = {}
+    day = start
+    while day < end:
+        days[day.strftime("%Y-%m-%d")] = CalendarDay(date=day)
+        day += timedelta(days=1)
+    
+    def bucket(date) -> CalendarDay:
+        # A range starting mid-day can end on a date not created above
+        key = date.isoformat()
+        if key not in days:
+            days[key] = CalendarDay(date=datetime.combine(date, start.time()))
+        return days[key]
+    
+    for event in events:
+        item = CalendarEventSummary.model_validate(event)
+        first = max(event.start_time, start).date()
+        # end_time is exclusive: an event ending at midnight does not cover the next day
+        last = max((min(event.end_time, end) - timedelta(microseconds=1)).date(), first)
+        date = first
+        while date <= last:
+            bucket(date).events.append(item)
+            date += timedelta(days=1)
+    for task in tasks:
+        bucket(task.due_date.date()).tasks.append(TaskSummary.model_validate(task))
+    return days
+
+
+async def _calendar_days(db: AsyncSession, user_id: int, start: datetime, end: datetime) -> Dict[str, CalendarDay]:
+    events, tasks = await get_calendar_range(db, user_id, start, end)
+    return _bucket_by_day(start, end, events, tasks)
+
+
+@router.get("/weekly", response_model=WeeklyCalendar)
 async def get_weekly_calendar(
     week_start: datetime = Query(..., description="Start of the week"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get weekly calendar view with tasks and events"""
-    # Calculate week end
+    week_start = as_naive_utc(week_start)
     week_end = week_start + timedelta(days=7)
+    days = await _calendar_days(db, current_user.id, week_start, week_end)
+    return WeeklyCalendar(week_start=week_start, week_end=week_end, days=days)
+
+
+@router.get("/range", response_model=CalendarRange)
+async def get_calendar_range_view(
+    start: datetime = Query(..., description="Start of the range (inclusive)"),
+    end: datetime = Query(..., description="End of the range (exclusive)"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get tasks and events for an arbitrary range (month, term) grouped by day"""
+    start, end = as_naive_utc(start), as_naive_utc(end)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if end - start > timedelta(days=settings.calendar_max_range_days):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range cannot exceed {settings.calendar_max_range_days} days"
+        )
+    days = await _calendar_days(db, current_user.id, start, end)
+    return CalendarRange(start=start, end=end, days=days)
+
+
+@router.get("/freebusy", response_model=FreeBusy)
+async def get_course_freebusy(
+    course_id: int = Query(..., description="Course whose enrolled students are checked"),
+    start: datetime = Query(..., description="Range start (inclusive)"),
+    end: datetime = Query(..., description="Range end (exclusive)"),
+    duration_minutes: int = Query(60, ge=1, description="Minimum length of a free slot"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Merged busy intervals of all students enrolled in a course, and the free slots between them"""
+    start, end = as_naive_utc(start), as_naive_utc(end)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if end - start > timedelta(days=settings.freebusy_max_range_days):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range cannot exceed {settings.freebusy_max_range_days} days"
+        )
+    course = await get_course(db, course_id)
+    if course is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    if course.teacher_id != current_user.id and current_user.role.value != "admin":
+        raise HTTPException(status_code=403, detail="Only the course teacher can view free/busy")
     
-    # Get events for the week
-    events = get_user_calendar_events(db, current_user.id, week_start, week_end)
-    
-    # Get tasks due in the week
-    from app.crud import get_user_tasks
-    tasks = get_user_tasks(db, current_user.id, 7)
-    
-    # Filter tasks for this week
-    week_tasks = [
-        task for task in tasks 
-        if week_start <= task.due_date <= week_end
-    ]
-    
-    # Organize by day
-    weekly_data = {}
-    for i in range(7):
-        day = week_start + timedelta(days=i)
-        day_key = day.strftime("%Y-%m-%d")
-        
-        # Get events for this day
-        day_events = [
-            event for event in events
-            if event.start_time.date() == day.date()
-        ]
-        
-        # Get tasks due this day
-        day_tasks = [
-            task for task in week_tasks
-            if task.due_date.date() == day.date()
-        ]
-        
-        weekly_data[day_key] = {
-            "date": day.isoformat(),
-            "events": day_events,
-            "tasks": day_tasks
-        }
-    
-    return {
-        "week_start": week_start.isoformat(),
-        "week_end": week_end.isoformat(),
-        "days": weekly_data
-    }
+    rows = await get_course_busy_rows(db, course_id, start, end)
+    deadline_buffer = timedelta(minutes=settings.freebusy_deadline_buffer_minutes)
+    busy = merge_intervals(busy_intervals(rows, start, end, deadline_buffer), start, end)
+    free = free_slots(busy, start, end, timedelta(minutes=duration_minutes))
+    return FreeBusy(
+        course_id=course_id,
+        start=start,
+        end=end,
+        busy=[TimeInterval(start=s, end=e) for s, e in busy],
+        free=[TimeInterval(start=s, end=e) for s, e in free]
+    )
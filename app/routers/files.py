@@ -3,11 +3,13 @@ import uuid
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from app.database import get_db
 from app.auth import get_current_active_user, require_teacher_or_admin
 from app.schemas import FileUploadResponse, CourseResource, CourseResourceCreate
-from app.models import User, TaskAttachment, SubmissionAttachment, CourseResource as CourseResourceModel
+from app.models import User, Task, TaskAttachment, SubmissionAttachment, CourseResource as CourseResourceModel
 from app.config import settings
 from app.crud import get_task, get_task_submission, create_course_resource
 import aiofiles
@@ -121,12 +123,12 @@ async def download_file(
 async def upload_task_attachment(
     task_id: int,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_teacher_or_admin)
 ):
     """Upload attachment for a task (teacher/admin only)"""
     # Check if task exists and user has permission
-    task = get_task(db, task_id)
+    task = await get_task(db, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
@@ -162,8 +164,8 @@ async def upload_task_attachment(
     )
     
     db.add(attachment)
-    db.commit()
-    db.refresh(attachment)
+    await db.commit()
+    await db.refresh(attachment)
     
     return FileUploadResponse(
         filename=file_info["filename"],
@@ -177,14 +179,14 @@ async def upload_task_attachment(
 async def upload_submission_attachment(
     submission_id: int,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Upload attachment for a submission"""
     # Check if submission exists and belongs to user
-    submission = db.query(SubmissionAttachment).filter(
-        SubmissionAttachment.id == submission_id
-    ).first()
+    submission = await db.scalar(
+        select(SubmissionAttachment).where(SubmissionAttachment.id == submission_id)
+    )
     
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found")
@@ -215,8 +217,8 @@ async def upload_submission_attachment(
     )
     
     db.add(attachment)
-    db.commit()
-    db.refresh(attachment)
+    await db.commit()
+    await db.refresh(attachment)
     
     return FileUploadResponse(
         filename=file_info["filename"],
@@ -235,14 +237,14 @@ async def upload_course_resource(
     url: str = Form(None),
     resource_type: str = Form(...),
     is_public: bool = Form(True),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_teacher_or_admin)
 ):
     """Upload course resource (teacher/admin only)"""
     from app.crud import get_course
     
     # Check if course exists and user has permission
-    course = get_course(db, course_id)
+    course = await get_course(db, course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
@@ -281,13 +283,13 @@ async def upload_course_resource(
         is_public=is_public
     )
     
-    resource = create_course_resource(db, resource_data)
+    resource = await create_course_resource(db, resource_data)
     
     # Update file path if file was uploaded
     if file_path:
         resource.file_path = file_path
-        db.commit()
-        db.refresh(resource)
+        await db.commit()
+        await db.refresh(resource)
     
     return resource
 
@@ -332,12 +334,16 @@ async def preview_file(
 @router.delete("/attachment/{attachment_id}")
 async def delete_attachment(
     attachment_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Delete an attachment"""
     # Try to find in task attachments
-    attachment = db.query(TaskAttachment).filter(TaskAttachment.id == attachment_id).first()
+    attachment = await db.scalar(
+        select(TaskAttachment)
+        .options(joinedload(TaskAttachment.task).joinedload(Task.course))
+        .where(TaskAttachment.id == attachment_id)
+    )
     
     if attachment:
         # Check permissions
@@ -352,13 +358,17 @@ async def delete_attachment(
             os.remove(attachment.file_path)
         
         # Delete database record
-        db.delete(attachment)
-        db.commit()
+        await db.delete(attachment)
+        await db.commit()
         
         return {"message": "Attachment deleted successfully"}
     
     # Try to find in submission attachments
-    attachment = db.query(SubmissionAttachment).filter(SubmissionAttachment.id == attachment_id).first()
+    attachment = await db.scalar(
+        select(SubmissionAttachment)
+        .options(joinedload(SubmissionAttachment.submission))
+        .where(SubmissionAttachment.id == attachment_id)
+    )
     
     if attachment:
         # Check permissions (user can only delete their own submission attachments)
@@ -373,8 +383,8 @@ async def delete_attachment(
             os.remove(attachment.file_path)
         
         # Delete database record
-        db.delete(attachment)
-        db.commit()
+        await db.delete(attachment)
+        await db.commit()
         
         return {"message": "Attachment deleted successfully"}
     
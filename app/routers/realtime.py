@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect, status
+from app.auth import get_user_from_token
+from app.crud import get_user_course_ids
+from app.database import AsyncSessionLocal
+from app.realtime import course_channel, push_hub, user_channel
+
+router = APIRouter(tags=["实时推送"])
+
+
+@router.websocket("/ws")
+async def push_updates(websocket: WebSocket, token: str = Query(..., description="JWT access token")):
+    """Push channel: events for the current user and every course they attend or teach
+
+    Browsers cannot set headers on WebSocket requests, so the access token is
+    passed as a query parameter. Course subscriptions are fixed at connect
+    time; reconnect after enrolling in a new course. Send "ping" to get "pong".
+    """
+    async with AsyncSessionLocal() as db:
+        user = await get_user_from_token(db, token)
+        if user is None or not user.is_active:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        course_ids = await get_user_course_ids(db, user.id)
+    
+    channels = [user_channel(user.id)] + [course_channel(course_id) for course_id in course_ids]
+    await websocket.accept()
+    push_hub.connect(websocket, channels)
+    try:
+        while True:
+            if await websocket.receive_text() == "ping":
+                await websocket.send_text("pong")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        push_hub.disconnect(websocket, channels)
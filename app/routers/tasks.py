@@ -1,60 +1,66 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+from typing import List, Literal, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, get_read_db
 from app.auth import get_current_active_user, require_teacher_or_admin
 from app.schemas import (
-    Task, TaskCreate, TaskUpdate, TaskWithSubmission,
-    TaskSubmission, TaskSubmissionCreate, TaskSubmissionUpdate,
+    Task, TaskCreate, TaskUpdate, TaskWithSubmission, TaskSummary,
+    TaskSubmission, TaskSubmissionCreate, TaskSubmissionUpdate, TaskSubmissionSummary,
     UpcomingTask
 )
 from app.crud import (
-    get_task, get_course_tasks, get_user_tasks, get_upcoming_tasks,
+    get_task, get_course_tasks, get_user_tasks, get_upcoming_task_rows,
     create_task, update_task, get_task_submission, create_task_submission,
     update_task_submission, get_user_submissions
 )
-from app.models import User
+from app.models import TaskStatus, User
+from app.reminders import reminder_scheduler
+from app.pagination import PageParams, list_response, page_params, paginate
 
 router = APIRouter(prefix="/tasks", tags=["任务"])
 
 
-@router.get("/", response_model=List[Task])
+@router.get("/", response_model=Union[List[Task], List[TaskSummary]])
 async def read_user_tasks(
+    response: Response,
     days_ahead: int = 30,
-    db: Session = Depends(get_db),
+    view: Literal["full", "summary"] = "full",
+    page: Optional[PageParams] = Depends(page_params),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """获取当前用户的任务"""
-    return get_user_tasks(db, current_user.id, days_ahead)
+    """获取当前用户的任务；view=summary 时只返回列表视图需要的字段"""
+    tasks = await get_user_tasks(db, current_user.id, days_ahead, page, summary=view == "summary")
+    model = TaskSummary if view == "summary" else Task
+    return list_response(paginate(tasks, page, response, "due_date"), model, response)
 
 
 @router.get("/upcoming", response_model=List[UpcomingTask])
 async def read_upcoming_tasks(
+    response: Response,
     days_ahead: int = 7,
-    db: Session = Depends(get_db),
+    page: Optional[PageParams] = Depends(page_params),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取当前用户即将到期的任务"""
-    tasks = get_upcoming_tasks(db, current_user.id, days_ahead)
+    tasks = paginate(await get_upcoming_task_rows(db, current_user.id, days_ahead, page), page, response, "due_date")
     upcoming_tasks = []
     
     from datetime import datetime
     for task in tasks:
         days_until_due = (task.due_date - datetime.utcnow()).days
         
-        # Get user's submission for this task
-        submission = get_task_submission(db, task.id, current_user.id)
-        status = submission.status if submission else "not_started"
-        
+        # Submission status is joined into each row by the query
         upcoming_task = UpcomingTask(
             id=task.id,
             title=task.title,
-            course_name=task.course.name,
-            course_icon=task.course.icon,
-            course_color=task.course.color,
+            course_name=task.course_name,
+            course_icon=task.course_icon,
+            course_color=task.course_color,
             due_date=task.due_date,
             task_type=task.task_type,
-            status=status,
+            status=task.status,
             days_until_due=days_until_due
         )
         upcoming_tasks.append(upcoming_task)
@@ -62,29 +68,34 @@ async def read_upcoming_tasks(
     return upcoming_tasks
 
 
-@router.get("/course/{course_id}", response_model=List[Task])
+@router.get("/course/{course_id}", response_model=Union[List[Task], List[TaskSummary]])
 async def read_course_tasks(
     course_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    view: Literal["full", "summary"] = "full",
+    page: Optional[PageParams] = Depends(page_params),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取特定课程的任务"""
-    return get_course_tasks(db, course_id)
+    tasks = await get_course_tasks(db, course_id, page, summary=view == "summary")
+    model = TaskSummary if view == "summary" else Task
+    return list_response(paginate(tasks, page, response, "due_date"), model, response)
 
 
 @router.get("/{task_id}", response_model=TaskWithSubmission)
 async def read_task(
     task_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取特定任务及用户提交内容"""
-    task = get_task(db, task_id=task_id)
+    task = await get_task(db, task_id=task_id)
     if task is None:
         raise HTTPException(status_code=404, detail="任务未找到")
     
     # 获取用户对此任务的提交
-    submission = get_task_submission(db, task_id, current_user.id)
+    submission = await get_task_submission(db, task_id, current_user.id)
     
     task_dict = task.__dict__.copy()
     task_dict["submission"] = submission
@@ -95,13 +106,13 @@ async def read_task(
 @router.post("/", response_model=Task)
 async def create_new_task(
     task: TaskCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_teacher_or_admin)
 ):
     """创建新任务（仅教师/管理员）"""
     # 验证用户是否为该课程的教师
     from app.crud import get_course
-    course = get_course(db, task.course_id)
+    course = await get_course(db, task.course_id)
     if not course:
         raise HTTPException(status_code=404, detail="课程未找到")
     
@@ -111,18 +122,20 @@ async def create_new_task(
             detail="没有权限为此课程创建任务"
         )
     
-    return create_task(db=db, task=task)
+    db_task = await create_task(db=db, task=task)
+    reminder_scheduler.schedule_task(db_task)
+    return db_task
 
 
 @router.put("/{task_id}", response_model=Task)
 async def update_task_info(
     task_id: int,
     task_update: TaskUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_teacher_or_admin)
 ):
     """Update task information (teacher/admin only)"""
-    task = get_task(db, task_id=task_id)
+    task = await get_task(db, task_id=task_id)
     if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
@@ -133,18 +146,20 @@ async def update_task_info(
             detail="Not enough permissions to update this task"
         )
     
-    return update_task(db=db, task_id=task_id, task_update=task_update)
+    db_task = await update_task(db=db, task_id=task_id, task_update=task_update)
+    reminder_scheduler.schedule_task(db_task)
+    return db_task
 
 
 # Task Submission endpoints
 @router.get("/{task_id}/submission", response_model=TaskSubmission)
 async def get_my_submission(
     task_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get current user's submission for a task"""
-    submission = get_task_submission(db, task_id, current_user.id)
+    submission = await get_task_submission(db, task_id, current_user.id)
     if submission is None:
         raise HTTPException(status_code=404, detail="No submission found")
     return submission
@@ -154,17 +169,24 @@ async def get_my_submission(
 async def create_my_submission(
     task_id: int,
     submission: TaskSubmissionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Create or update submission for a task"""
     # Check if task exists
-    task = get_task(db, task_id=task_id)
+    task = await get_task(db, task_id=task_id)
     if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
     # Check if submission already exists
-    existing_submission = get_task_submission(db, task_id, current_user.id)
+    existing_submission = await get_task_submission(db, task_id, current_user.id)
+    if existing_submission and existing_submission.status == TaskStatus.OVERDUE and existing_submission.content is None:
+        # Placeholder created by the overdue sweeper: a late submission fills it in
+        return await update_task_submission(
+            db=db,
+            submission_id=existing_submission.id,
+            submission_update=TaskSubmissionUpdate(content=submission.content)
+        )
     if existing_submission:
         raise HTTPException(
             status_code=400,
@@ -174,7 +196,7 @@ async def create_my_submission(
     submission_data = submission.dict()
     submission_data["task_id"] = task_id
     
-    return create_task_submission(
+    return await create_task_submission(
         db=db,
         submission=TaskSubmissionCreate(**submission_data),
         user_id=current_user.id
@@ -185,25 +207,33 @@ async def create_my_submission(
 async def update_my_submission(
     task_id: int,
     submission_update: TaskSubmissionUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Update current user's submission for a task"""
-    submission = get_task_submission(db, task_id, current_user.id)
+    submission = await get_task_submission(db, task_id, current_user.id)
     if submission is None:
         raise HTTPException(status_code=404, detail="No submission found")
     
-    return update_task_submission(
+    return await update_task_submission(
         db=db,
         submission_id=submission.id,
         submission_update=submission_update
     )
 
 
-@router.get("/submissions/my", response_model=List[TaskSubmission])
+@router.get("/submissions/my", response_model=Union[List[TaskSubmission], List[TaskSubmissionSummary]])
 async def read_my_submissions(
-    db: Session = Depends(get_db),
+    response: Response,
+    view: Literal["full", "summary"] = "full",
+    status_filter: Optional[TaskStatus] = Query(None, alias="status", description="Only submissions in this status"),
+    page: Optional[PageParams] = Depends(page_params),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all submissions by current user"""
-    return get_user_submissions(db, current_user.id)
+    submissions = await get_user_submissions(
+        db, current_user.id, page, summary=view == "summary", status=status_filter
+    )
+    model = TaskSubmissionSummary if view == "summary" else TaskSubmission
+    return list_response(paginate(submissions, page, response), model, response)
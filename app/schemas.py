@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 from app.models import UserRole, TaskType, TaskStatus, AttendanceStatus
 
@@ -69,6 +69,19 @@ class Course(CourseBase):
         from_attributes = True
 
 
+class CourseSummary(BaseModel):
+    id: int
+    name: str
+    code: str
+    icon: Optional[str] = None
+    color: str = "#3B82F6"
+    teacher_id: int
+    teacher_name: str
+    
+    class Config:
+        from_attributes = True
+
+
 class CourseWithProgress(Course):
     enrollment_count: int = 0
     task_count: int = 0
@@ -121,6 +134,21 @@ class Task(TaskBase):
         from_attributes = True
 
 
+class TaskSummary(BaseModel):
+    id: int
+    title: str
+    task_type: TaskType
+    due_date: datetime
+    max_points: float = 100.0
+    course_id: int
+    course_name: str
+    course_icon: Optional[str] = None
+    course_color: str = "#3B82F6"
+    
+    class Config:
+        from_attributes = True
+
+
 class TaskWithSubmission(Task):
     submission: Optional['TaskSubmission'] = None
 
@@ -168,6 +196,18 @@ class TaskSubmission(TaskSubmissionBase):
         from_attributes = True
 
 
+class TaskSubmissionSummary(BaseModel):
+    id: int
+    task_id: int
+    status: TaskStatus = TaskStatus.NOT_STARTED
+    points_earned: Optional[float] = None
+    submitted_at: Optional[datetime] = None
+    graded_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
 # Course Resource Schemas
 class CourseResourceBase(BaseModel):
     title: str
@@ -227,12 +267,21 @@ class CalendarEventBase(BaseModel):
 
 class CalendarEventCreate(CalendarEventBase):
     course_id: Optional[int] = None
+    rrule: Optional[str] = None
+    exdates: List[datetime] = []
+
+
+class CalendarEventException(BaseModel):
+    occurrence_start: datetime
 
 
 class CalendarEvent(CalendarEventBase):
     id: int
     course_id: Optional[int] = None
     user_id: Optional[int] = None
+    rrule: Optional[str] = None
+    exdates: Optional[List[datetime]] = None
+    recurrence_id: Optional[datetime] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     course: Optional[Course] = None
@@ -241,6 +290,57 @@ class CalendarEvent(CalendarEventBase):
         from_attributes = True
 
 
+class CalendarEventSummary(BaseModel):
+    id: int
+    title: str
+    start_time: datetime
+    end_time: datetime
+    event_type: str
+    is_all_day: bool = False
+    color: str = "#3B82F6"
+    course_id: Optional[int] = None
+    recurrence_id: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class CalendarDay(BaseModel):
+    date: datetime
+    events: List[CalendarEventSummary] = []
+    tasks: List[TaskSummary] = []
+
+
+class CalendarRange(BaseModel):
+    start: datetime
+    end: datetime
+    days: Dict[str, CalendarDay]
+
+
+class WeeklyCalendar(BaseModel):
+    week_start: datetime
+    week_end: datetime
+    days: Dict[str, CalendarDay]
+
+
+class CalendarFeed(BaseModel):
+    url: str
+    webcal_url: str
+
+
+class TimeInterval(BaseModel):
+    start: datetime
+    end: datetime
+
+
+class FreeBusy(BaseModel):
+    course_id: int
+    start: datetime
+    end: datetime
+    busy: List[TimeInterval]
+    free: List[TimeInterval]
+
+
 # Authentication Schemas
 class Token(BaseModel):
     access_token: str
@@ -261,6 +361,7 @@ class DashboardStats(BaseModel):
     total_courses: int
     active_tasks: int
     upcoming_deadlines: int
+    overdue_tasks: int = 0
     attendance_rate: float
 
 
@@ -295,6 +396,8 @@ class AIResponse(BaseModel):
     agent_role: Optional[str] = None
     timestamp: Optional[str] = None
     conversation_type: Optional[str] = None
+    session_id: Optional[str] = None
+    stale: bool = False  # 仪表板摘要已过有效期且暂时无法重新生成
 
 
 # File Upload Schemas
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+SUMA LMS 日历查询基准测试
+在临时SQLite数据库中生成100万个日历事件（3年历史 + 半年未来，少量跨多天的事件），
+对比旧的包含查询（IN子查询 + (owner, start_time) 索引）、在旧索引上的区间重叠查询，
+以及区间重叠查询（选课JOIN + (owner, end_time, start_time) 索引）
+
+用法: python benchmarks/bench_calendar.py [--events 1000000] [--repeat 30]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 将应用目录添加到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from app.database import Base
+from app import crud
+from app.models import CalendarEvent, Enrollment
+
+N_USERS = 20000
+N_COURSES = 2000
+N_ENROLLMENTS = 100000
+
+OLD_INDEXES = {
+    "ix_calendar_events_user_start": "calendar_events (user_id, start_time)",
+    "ix_calendar_events_course_start": "calendar_events (course_id, start_time)",
+}
+NEW_INDEXES = [index for index in CalendarEvent.__table__.indexes if "end_time" in index.columns]
+
+
+def seed(db_path: str, n_events: int, now: datetime):
+    """批量写入测试数据：60%为课程事件，40%为个人事件，3%跨1-14天"""
+    rng = random.Random(42)
+    connection = sqlite3.connect(db_path)
+    cursor = connection.cursor()
+    cursor.executemany(
+        "INSERT INTO users (id, email, username, hashed_password, full_name, role, is_active) VALUES (?, ?, ?, 'x', ?, 'STUDENT', 1)",
+        [(i, f"u{i}@example.com", f"user{i}", f"User {i}") for i in range(1, N_USERS + 1)]
+    )
+    cursor.executemany(
+        "INSERT INTO courses (id, name, code, teacher_id, is_active) VALUES (?, ?, ?, ?, 1)",
+        [(i, f"Course {i}", f"C{i}", rng.randint(1, N_USERS)) for i in range(1, N_COURSES + 1)]
+    )
+    pairs = set()
+    while len(pairs) < N_ENROLLMENTS:
+        pairs.add((rng.randint(1, N_USERS), rng.randint(1, N_COURSES)))
+    cursor.executemany("INSERT INTO enrollments (user_id, course_id) VALUES (?, ?)", list(pairs))
+
+    def events():
+        for _ in range(n_events):
+            start = now + timedelta(minutes=rng.randint(-3 * 365 * 1440, 180 * 1440))
+            duration = timedelta(hours=1) if rng.random() < 0.97 else timedelta(days=rng.randint(1, 14))
+            course_id, user_id = (rng.randint(1, N_COURSES), None) if rng.random() < 0.6 else (None, rng.randint(1, N_USERS))
+            yield (start, start + duration, course_id, user_id)
+
+    cursor.executemany(
+        "INSERT INTO calendar_events (title, start_time, end_time, event_type, course_id, user_id, is_all_day, color) "
+        "VALUES ('e', ?, ?, 'class', ?, ?, 0, '#3B82F6')",
+        events()
+    )
+    connection.commit()
+    connection.close()
+
+
+def contained_query(user_id: int, start: datetime, end: datetime):
+    """旧查询：只返回完全落在窗口内的事件，选课条件为 IN 子查询"""
+    return select(CalendarEvent.id).where(
+        or_(
+            CalendarEvent.user_id == user_id,
+            CalendarEvent.course_id.in_(select(Enrollment.course_id).where(Enrollment.user_id == user_id))
+        ),
+        CalendarEvent.start_time >= start,
+        CalendarEvent.end_time <= end
+    ).order_by(CalendarEvent.start_time, CalendarEvent.id)
+
+
+async def time_queries(session_factory, user_ids, windows, overlap: bool):
+    """返回各窗口的中位耗时（毫秒）和返回的总行数"""
+    results = {}
+    for name, (start, end) in windows.items():
+        timings, rows = [], 0
+        for user_id in user_ids:
+            async with session_factory() as db:
+                begin = time.perf_counter()
+                if overlap:
+                    found = await crud.get_user_calendar_events(db, user_id, start, end, summary=True)
+                else:
+                    found = (await db.execute(contained_query(user_id, start, end))).all()
+                timings.append((time.perf_counter() - begin) * 1000)
+                rows += len(found)
+        results[name] = (statistics.median(timings), rows)
+    return results
+
+
+async def run(n_events: int, repeat: int):
+    now = datetime(2026, 10, 19, 12, 0)
+    windows = {
+        "day": (now.replace(hour=0), now.replace(hour=0) + timedelta(days=1)),
+        "week": (now - timedelta(days=now.weekday()), now - timedelta(days=now.weekday()) + timedelta(days=7)),
+        "month": (now.replace(day=1), now.replace(day=1, month=now.month + 1)),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        sync_engine = create_engine(f"sqlite:///{db_path}")
+        Base.metadata.create_all(bind=sync_engine)
+        for index in NEW_INDEXES:
+            index.drop(bind=sync_engine)
+
+        print(f"正在生成 {n_events} 个日历事件...")
+        seed(db_path, n_events, now)
+
+        rng = random.Random(7)
+        user_ids = [rng.randint(1, N_USERS) for _ in range(repeat)]
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+        with sync_engine.begin() as connection:
+            for name, columns in OLD_INDEXES.items():
+                connection.execute(text(f"CREATE INDEX {name} ON {columns}"))
+            connection.execute(text("ANALYZE"))
+        contained = await time_queries(session_factory, user_ids, windows, overlap=False)
+        overlap_old_indexes = await time_queries(session_factory, user_ids, windows, overlap=True)
+
+        with sync_engine.begin() as connection:
+            for name in OLD_INDEXES:
+                connection.execute(text(f"DROP INDEX {name}"))
+        for index in NEW_INDEXES:
+            index.create(bind=sync_engine)
+        with sync_engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+        await async_engine.dispose()
+        overlap_new_indexes = await time_queries(session_factory, user_ids, windows, overlap=True)
+
+        await async_engine.dispose()
+        sync_engine.dispose()
+
+    columns = [
+        ("包含查询+旧索引", contained),
+        ("重叠查询+旧索引", overlap_old_indexes),
+        ("重叠查询+新索引", overlap_new_indexes),
+    ]
+    print(f"\n{'窗口':<8}" + "".join(f"{label:>20}" for label, _ in columns))
+    for name in windows:
+        cells = "".join(f"{results[name][0]:>11.2f}ms {results[name][1]:>6}行" for _, results in columns)
+        print(f"{name:<8}{cells}")
+    print("\n重叠查询多出的行是跨越窗口边界的事件，包含查询会漏掉它们；"
+          "重叠查询在旧索引上只能按 start_time < 窗口结束 扫描全部历史事件")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比日历包含查询与区间重叠查询的耗时")
+    parser.add_argument("--events", type=int, default=1000000, help="日历事件数量")
+    parser.add_argument("--repeat", type=int, default=30, help="每个窗口查询的用户数")
+    args = parser.parse_args()
+    asyncio.run(run(args.events, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
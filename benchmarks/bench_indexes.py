@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+SUMA LMS 索引基准测试
+在临时SQLite数据库中生成10万级数据，分别在没有和有复合索引时执行 crud 中的热点查询，对比耗时
+
+用法: python benchmarks/bench_indexes.py [--scale 1.0] [--repeat 20]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 将应用目录添加到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from app.database import Base
+from app import crud, models  # noqa: F401
+
+# 在 __table_args__ 中声明的索引（基准测试先删除它们得到"优化前"的状态）
+NEW_INDEXES = [
+    index
+    for table in Base.metadata.sorted_tables
+    for index in table.indexes
+    if not any(column.index for column in index.columns)
+]
+
+
+def seed(db_path: str, scale: float):
+    """批量写入测试数据"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    n_users = int(5000 * scale)
+    n_courses = int(500 * scale)
+    n_tasks = int(100000 * scale)
+    n_enrollments = int(50000 * scale)
+    n_submissions = int(200000 * scale)
+    n_attendance = int(150000 * scale)
+    n_events = int(150000 * scale)
+
+    connection = sqlite3.connect(db_path)
+    cursor = connection.cursor()
+    cursor.executemany(
+        "INSERT INTO users (id, email, username, hashed_password, full_name, role, is_active) VALUES (?, ?, ?, 'x', ?, ?, 1)",
+        [(i, f"u{i}@example.com", f"user{i}", f"User {i}", "TEACHER" if i <= n_courses // 5 else "STUDENT")
+         for i in range(1, n_users + 1)]
+    )
+    cursor.executemany(
+        "INSERT INTO courses (id, name, code, teacher_id, is_active) VALUES (?, ?, ?, ?, 1)",
+        [(i, f"Course {i}", f"C{i}", rng.randint(1, n_courses // 5)) for i in range(1, n_courses + 1)]
+    )
+    pairs = set()
+    while len(pairs) < n_enrollments:
+        pairs.add((rng.randint(1, n_users), rng.randint(1, n_courses)))
+    cursor.executemany("INSERT INTO enrollments (user_id, course_id) VALUES (?, ?)", list(pairs))
+    cursor.executemany(
+        "INSERT INTO tasks (id, title, task_type, course_id, due_date, is_published) VALUES (?, ?, 'ASSIGNMENT', ?, ?, ?)",
+        [(i, f"Task {i}", rng.randint(1, n_courses), now + timedelta(hours=rng.randint(-2000, 2000)),
+          1 if rng.random() < 0.9 else 0) for i in range(1, n_tasks + 1)]
+    )
+    submissions = set()
+    while len(submissions) < n_submissions:
+        submissions.add((rng.randint(1, n_tasks), rng.randint(1, n_users)))
+    statuses = ["NOT_STARTED", "IN_PROGRESS", "SUBMITTED", "GRADED"]
+    cursor.executemany(
+        "INSERT INTO task_submissions (task_id, user_id, status) VALUES (?, ?, ?)",
+        [(task_id, user_id, rng.choice(statuses)) for task_id, user_id in submissions]
+    )
+    cursor.executemany(
+        "INSERT INTO attendance (user_id, course_id, date, status) VALUES (?, ?, ?, ?)",
+        [(rng.randint(1, n_users), rng.randint(1, n_courses), now - timedelta(days=rng.randint(0, 365)),
+          rng.choice(["PRESENT", "ABSENT", "LATE", "EXCUSED"])) for _ in range(n_attendance)]
+    )
+    cursor.executemany(
+        "INSERT INTO calendar_events (title, start_time, end_time, event_type, course_id, user_id) VALUES ('e', ?, ?, 'class', ?, ?)",
+        [(start, start + timedelta(hours=1), *((rng.randint(1, n_courses), None) if rng.random() < 0.5 else (None, rng.randint(1, n_users))))
+         for start in (now + timedelta(hours=rng.randint(-5000, 5000)) for _ in range(n_events))]
+    )
+    connection.commit()
+    connection.close()
+    return n_users
+
+
+async def time_queries(session_factory, user_ids, repeat: int):
+    """执行热点查询，返回各查询的中位耗时（毫秒）"""
+    now = datetime.utcnow()
+    queries = {
+        "get_task_submission": lambda db, u: crud.get_task_submission(db, u * 7 % 1000 + 1, u),
+        "get_user_courses": lambda db, u: crud.get_user_courses(db, u),
+        "get_upcoming_tasks": lambda db, u: crud.get_upcoming_tasks(db, u, 7),
+        "get_course_tasks": lambda db, u: crud.get_course_tasks(db, u % 400 + 1),
+        "get_user_submissions": lambda db, u: crud.get_user_submissions(db, u),
+        "get_course_attendance": lambda db, u: crud.get_course_attendance(db, u % 400 + 1, u),
+        "get_user_calendar_events": lambda db, u: crud.get_user_calendar_events(
+            db, u, now - timedelta(days=7), now + timedelta(days=7)),
+        "get_dashboard_stats": lambda db, u: crud.get_dashboard_stats(db, u),
+    }
+    results = {}
+    for name, query in queries.items():
+        timings = []
+        for i in range(repeat):
+            async with session_factory() as db:
+                start = time.perf_counter()
+                await query(db, user_ids[i % len(user_ids)])
+                timings.append((time.perf_counter() - start) * 1000)
+        results[name] = statistics.median(timings)
+    return results
+
+
+async def run(scale: float, repeat: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        sync_engine = create_engine(f"sqlite:///{db_path}")
+        Base.metadata.create_all(bind=sync_engine)
+        for index in NEW_INDEXES:
+            index.drop(bind=sync_engine)
+
+        print(f"正在生成测试数据 (scale={scale})...")
+        n_users = seed(db_path, scale)
+        with sync_engine.begin() as connection:
+            for table in ("tasks", "task_submissions", "attendance", "calendar_events", "enrollments"):
+                count = connection.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+                print(f"  {table}: {count} 行")
+
+        rng = random.Random(7)
+        user_ids = [rng.randint(1, n_users) for _ in range(repeat)]
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+        with sync_engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+        before = await time_queries(session_factory, user_ids, repeat)
+
+        for index in NEW_INDEXES:
+            index.create(bind=sync_engine)
+        with sync_engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+        await async_engine.dispose()
+        after = await time_queries(session_factory, user_ids, repeat)
+
+        await async_engine.dispose()
+        sync_engine.dispose()
+
+    print(f"\n{'查询':<28}{'无索引(ms)':>12}{'有索引(ms)':>12}{'加速':>8}")
+    for name in before:
+        print(f"{name:<28}{before[name]:>12.2f}{after[name]:>12.2f}{before[name] / after[name]:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比复合索引前后的热点查询耗时")
+    parser.add_argument("--scale", type=float, default=1.0, help="数据规模系数（1.0 约为10万任务、20万提交）")
+    parser.add_argument("--repeat", type=int, default=20, help="每个查询的执行次数")
+    args = parser.parse_args()
+    asyncio.run(run(args.scale, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
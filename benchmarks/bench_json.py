@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+SUMA LMS JSON编码基准测试
+用典型的列表响应（任务、课程、日历事件、仪表板）对比几种响应编码方式的耗时
+
+用法: python benchmarks/bench_json.py [--size 200] [--repeat 50]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+# 将应用目录添加到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from app import schemas
+from app.models import TaskStatus, TaskType, UserRole
+from app.responses import PYDANTIC_JSON_FAST_PATH, ORJSONResponse, default_response_class
+
+
+def build_payloads(size: int):
+    """构造与接口返回结构一致的测试数据"""
+    now = datetime.utcnow()
+    teacher = schemas.User(
+        id=1, email="teacher@example.com", username="teacher", full_name="Teacher One",
+        role=UserRole.TEACHER, created_at=now
+    )
+    courses = [
+        schemas.Course(
+            id=i, name=f"Course {i}", code=f"C{i:04d}", description="课程简介 " * 10,
+            icon="📘", teacher_id=1, created_at=now, teacher=teacher
+        )
+        for i in range(1, size + 1)
+    ]
+    attachments = [
+        schemas.TaskAttachment(id=i, filename=f"file{i}.pdf", file_size=1024 * i,
+                               mime_type="application/pdf", uploaded_at=now)
+        for i in range(3)
+    ]
+    tasks = [
+        schemas.Task(
+            id=i, title=f"Task {i}", description="任务说明 " * 20, task_type=TaskType.ASSIGNMENT,
+            due_date=now + timedelta(hours=i), course_id=courses[i % size].id, created_at=now,
+            course=courses[i % size], attachments=attachments
+        )
+        for i in range(size)
+    ]
+    events = [
+        schemas.CalendarEvent(
+            id=i, title=f"Event {i}", start_time=now + timedelta(hours=i),
+            end_time=now + timedelta(hours=i + 1), event_type="class", course_id=courses[i % size].id,
+            created_at=now, course=courses[i % size]
+        )
+        for i in range(size)
+    ]
+    dashboard = schemas.DashboardData(
+        stats=schemas.DashboardStats(total_courses=8, active_tasks=size, upcoming_deadlines=12, attendance_rate=96.5),
+        upcoming_tasks=[
+            schemas.UpcomingTask(
+                id=i, title=f"Task {i}", course_name=f"Course {i}", due_date=now + timedelta(days=i % 7),
+                task_type=TaskType.QUIZ, status=TaskStatus.IN_PROGRESS, days_until_due=i % 7
+            )
+            for i in range(size)
+        ]
+    )
+    return {
+        "courses": (List[schemas.Course], courses),
+        "tasks": (List[schemas.Task], tasks),
+        "calendar_events": (List[schemas.CalendarEvent], events),
+        "dashboard": (schemas.DashboardData, dashboard),
+    }
+
+
+def encoders(response_type, value):
+    """各种编码方式，均返回最终的响应体字节"""
+    adapter = TypeAdapter(response_type)
+    return {
+        # 未声明 response_model 的接口：jsonable_encoder + 标准库 json
+        "jsonable_encoder+json": lambda: JSONResponse(jsonable_encoder(value)).body,
+        # 声明了 response_model、未启用Pydantic快速路径的 FastAPI：Pydantic导出 + 标准库 json
+        "pydantic+json": lambda: JSONResponse(adapter.dump_python(value, mode="json")).body,
+        # 同上，使用 ORJSONResponse
+        "pydantic+orjson": lambda: ORJSONResponse(adapter.dump_python(value, mode="json")).body,
+        # 较新的 FastAPI 的快速路径：Pydantic直接输出JSON字节
+        "pydantic dump_json": lambda: adapter.dump_json(value),
+    }
+
+
+def measure(func, repeat: int) -> float:
+    """返回中位耗时（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比JSON响应编码方式的耗时")
+    parser.add_argument("--size", type=int, default=200, help="每个列表的条数")
+    parser.add_argument("--repeat", type=int, default=50, help="每种编码方式的执行次数")
+    args = parser.parse_args()
+
+    print(f"当前默认响应类: {default_response_class.__name__} (Pydantic快速路径: {PYDANTIC_JSON_FAST_PATH})")
+    for name, (response_type, value) in build_payloads(args.size).items():
+        results = {label: measure(func, args.repeat) for label, func in encoders(response_type, value).items()}
+        baseline = results["jsonable_encoder+json"]
+        size_kb = len(ORJSONResponse(jsonable_encoder(value)).body) / 1024
+        print(f"\n{name} ({size_kb:.0f} KB)")
+        for label, elapsed in results.items():
+            print(f"  {label:<24}{elapsed:>10.2f} ms{baseline / elapsed:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
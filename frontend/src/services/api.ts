@@ -19,8 +19,12 @@ import type {
   PaginatedResponse
 } from '../types';
 
+// 写请求返回的读写窗口，后续请求带回使读请求在副本同步前走主库（任意后端进程均可识别）
+const READ_YOUR_WRITES_HEADER = 'X-Read-Your-Writes-Until';
+
 class ApiService {
   private api: AxiosInstance;
+  private readYourWritesUntil: string | null = null;
 
   constructor() {
     this.api = axios.create({
@@ -38,6 +42,13 @@ class ApiService {
         if (token) {
           config.headers.Authorization = `Bearer ${token}`;
         }
+        // 值为 "<截止时间>.<签名>"，只需读取截止时间判断是否过期，原样带回
+        const until = this.readYourWritesUntil
+          ? Number(this.readYourWritesUntil.slice(0, this.readYourWritesUntil.lastIndexOf('.')))
+          : 0;
+        if (this.readYourWritesUntil && until * 1000 > Date.now()) {
+          config.headers[READ_YOUR_WRITES_HEADER] = this.readYourWritesUntil;
+        }
         return config;
       },
       (error) => {
@@ -47,7 +58,13 @@ class ApiService {
 
     // 响应拦截器 - 处理错误
     this.api.interceptors.response.use(
-      (response) => response,
+      (response) => {
+        const readYourWritesUntil = response.headers[READ_YOUR_WRITES_HEADER.toLowerCase()];
+        if (readYourWritesUntil) {
+          this.readYourWritesUntil = readYourWritesUntil;
+        }
+        return response;
+      },
       (error) => {
         if (error.response?.status === 401) {
           // Token过期，清除本地存储并跳转到登录页
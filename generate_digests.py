@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+SUMA LMS AI学习摘要生成脚本
+为所有活跃学生预生成仪表板AI摘要，可通过cron等定时运行
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+
+# 将应用目录添加到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+from app.database import AsyncSessionLocal, async_engine, engine, Base
+from app.ai_digest import generate_all_digests
+from app.ollama_client import ollama_client
+
+
+async def run(force: bool, concurrency: int):
+    """检查Ollama后批量生成摘要"""
+    if not await ollama_client.is_healthy():
+        print("✗ Ollama服务不可用，请先运行: ollama serve")
+        return 1
+    
+    try:
+        async with AsyncSessionLocal() as db:
+            stats = await generate_all_digests(db, force=force, concurrency=concurrency)
+    finally:
+        await ollama_client.aclose()
+        await async_engine.dispose()
+    
+    print(f"✓ 已生成: {stats['generated']}  失败: {stats['failed']}  跳过(仍有效): {stats['skipped']}")
+    return 0 if stats["failed"] == 0 else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预生成所有学生的AI学习摘要")
+    parser.add_argument("--force", action="store_true", help="忽略有效期，重新生成全部摘要")
+    parser.add_argument("--concurrency", type=int, default=None, help="同时进行的推理请求数")
+    args = parser.parse_args()
+    
+    # 确保摘要表存在
+    Base.metadata.create_all(bind=engine)
+    
+    print("正在生成AI学习摘要...")
+    sys.exit(asyncio.run(run(args.force, args.concurrency)))
+
+
+if __name__ == "__main__":
+    main()
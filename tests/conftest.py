@@ -0,0 +1,90 @@
+"""
+测试公共配置
+每次测试会话使用临时SQLite数据库和示例数据，开启懒加载保护（DB_RAISE_ON_LAZY_LOAD），
+后台任务不随应用启动，由测试直接调用
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+_test_dir = tempfile.mkdtemp(prefix="suma-test-")
+atexit.register(shutil.rmtree, _test_dir, ignore_errors=True)
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{_test_dir}/test.db",
+    UPLOAD_DIR=os.path.join(_test_dir, "uploads"),
+    DB_RAISE_ON_LAZY_LOAD="true",
+    OLLAMA_WARMUP_ON_STARTUP="false",
+    AI_DIGEST_INTERVAL_MINUTES="0",
+    OVERDUE_SWEEP_INTERVAL_MINUTES="0",
+    REMINDER_SCHEDULER_ENABLED="false",
+    OUTBOX_DISPATCHER_ENABLED="false",
+)
+
+from typing import Dict, List
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from app.database import SessionLocal, async_engine
+from app.main import app
+from app.utils import create_sample_data
+
+PASSWORDS = {"admin": "admin123", "teacher": "teacher123", "student1": "student123", "student2": "student123"}
+
+
+@pytest.fixture(scope="session")
+def client():
+    db = SessionLocal()
+    try:
+        create_sample_data(db)
+    finally:
+        db.close()
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    """按用户名返回Bearer请求头"""
+    tokens: Dict[str, str] = {}
+
+    def headers(username: str) -> Dict[str, str]:
+        if username not in tokens:
+            response = client.post(
+                "/api/v1/auth/login-json", json={"username": username, "password": PASSWORDS[username]}
+            )
+            tokens[username] = response.json()["access_token"]
+        return {"Authorization": f"Bearer {tokens[username]}"}
+
+    return headers
+
+
+@pytest.fixture
+def run(client):
+    """在应用的事件循环中执行协程（异步引擎的连接属于该循环）"""
+    return lambda async_fn, *args: client.portal.call(async_fn, *args)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def clear(self):
+        self.statements.clear()
+
+
+@pytest.fixture
+def queries():
+    """记录异步引擎上执行的SQL语句"""
+    counter = QueryCounter()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    yield counter
+    event.remove(async_engine.sync_engine, "before_cursor_execute", record)
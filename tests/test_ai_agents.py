@@ -0,0 +1,13 @@
+"""
+智能体生成参数测试
+"""
+
+from app.ai_agents import AgentRole, get_generation_config
+from app.config import settings
+
+
+def test_generation_config_passes_other_ollama_options_through(monkeypatch):
+    monkeypatch.setattr(settings, "ollama_agent_options", {"learning_analyst": {"top_p": 0.9, "num_predict": 200}})
+    config = get_generation_config(AgentRole.LEARNING_ANALYST)
+    assert config.options == {"top_p": 0.9, "temperature": 0.5, "num_predict": 200}
+    assert get_generation_config(AgentRole.CODE_REVIEWER).options == {"temperature": 0.3, "num_predict": 500}
@@ -0,0 +1,85 @@
+"""
+学习画像缓存失效测试：CRUD写操作提交后失效，不依赖路由层
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+import pytest
+from sqlalchemy import select
+from app import crud
+from app.ai_context import learning_profiles
+from app.database import AsyncSessionLocal
+from app.models import User
+from app.schemas import TaskCreate, TaskUpdate
+
+
+class TaskMove(TaskUpdate):
+    course_id: Optional[int] = None
+
+
+async def load_profiles(*usernames: str):
+    async with AsyncSessionLocal() as db:
+        for username in usernames:
+            user = await db.scalar(select(User).where(User.username == username))
+            await learning_profiles.get(db, user)
+
+
+def cached(username: str) -> bool:
+    return USER_IDS[username] in learning_profiles.profiles
+
+
+USER_IDS = {}
+
+
+@pytest.fixture(autouse=True)
+def user_ids(run):
+    async def load():
+        async with AsyncSessionLocal() as db:
+            USER_IDS.update((await db.execute(select(User.username, User.id))).all())
+
+    run(load)
+
+
+def test_task_writes_invalidate_old_and_new_course(run):
+    async def setup():
+        async with AsyncSessionLocal() as db:
+            task = await crud.create_task(db, TaskCreate(
+                title="moving", task_type="quiz", course_id=2, due_date=datetime.utcnow() + timedelta(days=3)
+            ))
+            return task.id
+
+    async def move(task_id: int, course_id: int):
+        async with AsyncSessionLocal() as db:
+            await crud.update_task(db, task_id, TaskMove(course_id=course_id))
+
+    task_id = run(setup)
+    # student1 选了课程1、2、3，student2 只选了课程1、2
+    run(load_profiles, "student1", "student2")
+    run(move, task_id, 3)
+    assert not cached("student1") and not cached("student2")  # 原课程2的学生也失效
+
+    run(load_profiles, "student1", "student2")
+    run(move, task_id, 3)
+    assert not cached("student1") and cached("student2")
+
+
+def test_rolled_back_write_does_not_invalidate(run):
+    async def rolled_back_update():
+        async with AsyncSessionLocal() as db:
+            task = await crud.get_task(db, 1)
+            crud.record_event(db, "task.updated", {"id": task.id, "course_id": task.course_id})
+            await db.rollback()
+
+    run(load_profiles, "student1")
+    run(rolled_back_update)
+    assert cached("student1")
+
+
+def test_enrollment_invalidates_user(run):
+    async def enroll():
+        async with AsyncSessionLocal() as db:
+            assert await crud.enroll_user_in_course(db, USER_IDS["student2"], 3)
+
+    run(load_profiles, "student2")
+    run(enroll)
+    assert not cached("student2")
@@ -0,0 +1,78 @@
+"""
+仪表板AI摘要测试：迁移链包含 ai_digests 表，过期摘要会重新生成或标记为 stale
+"""
+
+from datetime import datetime, timedelta
+import os
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect, select, text
+from app.config import settings
+from app.database import Base, SessionLocal
+from app.models import AIDigest, User
+from app.routers import ai as ai_router
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_migrations_create_ai_digests_on_existing_database(tmp_path, monkeypatch):
+    database_url = f"sqlite:///{tmp_path}/existing.db"
+    db_engine = create_engine(database_url)
+    Base.metadata.create_all(db_engine)
+    with db_engine.begin() as connection:
+        connection.execute(text("DROP TABLE ai_digests"))
+    monkeypatch.setattr(settings, "database_url", database_url)
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    command.stamp(config, "f2b8d4e6a0c7")
+    command.upgrade(config, "head")
+    assert inspect(db_engine).has_table("ai_digests")
+    db_engine.dispose()
+
+
+def _set_digest(username: str, age: timedelta, response: str = "stored summary"):
+    db = SessionLocal()
+    try:
+        user = db.scalar(select(User).where(User.username == username))
+        digest = db.scalar(select(AIDigest).where(AIDigest.user_id == user.id)) or AIDigest(user_id=user.id)
+        digest.response = response
+        digest.agent_role = "learning_analyst"
+        digest.generated_at = datetime.utcnow() - age
+        db.add(digest)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_stale_digest_is_flagged_when_ollama_is_down(client, auth_headers, monkeypatch):
+    async def offline():
+        return False
+
+    monkeypatch.setattr(ai_router, "test_ollama_connection", offline)
+    headers = auth_headers("student2")
+
+    _set_digest("student2", timedelta(minutes=1))
+    body = client.get("/api/v1/ai/dashboard-summary", headers=headers).json()
+    assert body["response"] == "stored summary" and body["stale"] is False
+
+    _set_digest("student2", timedelta(minutes=settings.ai_digest_max_age_minutes + 1))
+    body = client.get("/api/v1/ai/dashboard-summary", headers=headers).json()
+    assert body["response"] == "stored summary" and body["stale"] is True
+
+
+def test_stale_digest_is_regenerated(client, auth_headers, monkeypatch):
+    async def online():
+        return True
+
+    async def regenerate(db, user):
+        digest = await ai_router.get_user_digest(db, user.id)
+        digest.response = "regenerated"
+        digest.generated_at = datetime.utcnow()
+        await db.commit()
+        return digest
+
+    monkeypatch.setattr(ai_router, "test_ollama_connection", online)
+    monkeypatch.setattr(ai_router, "generate_user_digest", regenerate)
+    _set_digest("student2", timedelta(minutes=settings.ai_digest_max_age_minutes + 1))
+    body = client.get("/api/v1/ai/dashboard-summary", headers=auth_headers("student2")).json()
+    assert body["response"] == "regenerated" and body["stale"] is False
@@ -0,0 +1,63 @@
+"""
+日历接口测试
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app.database import SessionLocal
+from app.models import User
+
+
+def _create_event(client, headers, start: datetime) -> dict:
+    response = client.post("/api/v1/calendar/events", headers=headers, json={
+        "title": "review", "event_type": "personal",
+        "start_time": start.isoformat(), "end_time": (start + timedelta(hours=1)).isoformat(),
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_weekly_and_range_accept_timezone_aware_bounds(client, auth_headers):
+    headers = auth_headers("student2")
+    week_start = (datetime.utcnow() + timedelta(days=60)).replace(hour=0, minute=0, second=0, microsecond=0)
+    event = _create_event(client, headers, week_start + timedelta(days=1, hours=9))
+
+    response = client.get("/api/v1/calendar/weekly", headers=headers,
+                          params={"week_start": week_start.isoformat() + "Z"})
+    assert response.status_code == 200, response.text
+    weekly = response.json()
+    day = weekly["days"][(week_start + timedelta(days=1)).strftime("%Y-%m-%d")]
+    assert [item["id"] for item in day["events"]] == [event["id"]]
+
+    # 同一时刻用+08:00表示：UTC 00:00 即当地 08:00
+    local = week_start + timedelta(hours=8)
+    response = client.get("/api/v1/calendar/range", headers=headers, params={
+        "start": local.isoformat() + "+08:00", "end": (local + timedelta(days=7)).isoformat() + "+08:00",
+    })
+    assert response.status_code == 200, response.text
+    events = [item["id"] for day in response.json()["days"].values() for item in day["events"]]
+    assert events == [event["id"]]
+
+
+def _set_active(username: str, active: bool):
+    db = SessionLocal()
+    try:
+        db.execute(update(User).where(User.username == username).values(is_active=active))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_feed_rejects_rotated_token_and_inactive_user(client, auth_headers):
+    headers = auth_headers("student2")
+    old_url = client.post("/api/v1/calendar/feed/token", headers=headers).json()["url"]
+    assert client.get(old_url).status_code == 200
+    new_url = client.post("/api/v1/calendar/feed/token", headers=headers).json()["url"]
+    assert client.get(old_url).status_code == 404
+    assert client.get(new_url).status_code == 200
+
+    _set_active("student2", False)
+    try:
+        assert client.get(new_url).status_code == 404
+    finally:
+        _set_active("student2", True)
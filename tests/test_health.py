@@ -0,0 +1,12 @@
+"""
+健康检查接口测试
+"""
+
+
+def test_database_health_requires_admin(client, auth_headers):
+    assert client.get("/api/health").status_code == 200
+    assert client.get("/api/health/db").status_code == 401
+    assert client.get("/api/health/db", headers=auth_headers("teacher")).status_code == 403
+    response = client.get("/api/health/db", headers=auth_headers("admin"))
+    assert response.status_code == 200
+    assert "primary" in response.json()["pools"]
@@ -0,0 +1,53 @@
+"""
+列表接口 view=summary 测试：摘要视图只返回摘要模型的字段，完整视图不变
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from app.pagination import NEXT_CURSOR_HEADER
+from app.schemas import (
+    CalendarEvent, CalendarEventSummary, Course, CourseSummary, Task, TaskSubmission, TaskSubmissionSummary,
+    TaskSummary
+)
+
+WINDOW = {
+    "start_date": (datetime.utcnow() - timedelta(days=1)).replace(microsecond=0).isoformat(),
+    "end_date": (datetime.utcnow() + timedelta(days=30)).replace(microsecond=0).isoformat(),
+}
+
+LIST_VIEWS = [
+    ("/api/v1/courses/", {}, Course, CourseSummary),
+    ("/api/v1/courses/all", {}, Course, CourseSummary),
+    ("/api/v1/tasks/", {}, Task, TaskSummary),
+    ("/api/v1/tasks/course/1", {}, Task, TaskSummary),
+    ("/api/v1/tasks/submissions/my", {}, TaskSubmission, TaskSubmissionSummary),
+    ("/api/v1/calendar/events", WINDOW, CalendarEvent, CalendarEventSummary),
+]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def calendar_event(client, auth_headers):
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=2)
+    response = client.post("/api/v1/calendar/events", headers=auth_headers("student1"), json={
+        "title": "reading", "event_type": "personal",
+        "start_time": start.isoformat(), "end_time": (start + timedelta(hours=1)).isoformat(),
+    })
+    assert response.status_code == 200, response.text
+
+
+@pytest.mark.parametrize("path,params,full_model,summary_model", LIST_VIEWS)
+def test_view_selects_response_model(client, auth_headers, path, params, full_model, summary_model):
+    headers = auth_headers("student1")
+    full = client.get(path, headers=headers, params=params)
+    summary = client.get(path, headers=headers, params={**params, "view": "summary"})
+    assert full.status_code == summary.status_code == 200
+    assert full.json() and len(full.json()) == len(summary.json())
+    assert all(set(item) == set(full_model.model_fields) for item in full.json())
+    assert all(set(item) == set(summary_model.model_fields) for item in summary.json())
+
+
+def test_summary_view_keeps_next_cursor_header(client, auth_headers):
+    response = client.get("/api/v1/courses/all", params={"view": "summary", "limit": 1})
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    assert NEXT_CURSOR_HEADER in response.headers
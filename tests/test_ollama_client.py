@@ -0,0 +1,143 @@
+"""
+Ollama多后端客户端测试：用 httpx.MockTransport 模拟多个推理节点
+"""
+
+from typing import Callable, Dict, List
+import asyncio
+import zlib
+import httpx
+import pytest
+from app.config import settings
+from app.ollama_client import OllamaClient, OllamaUnavailableError
+
+URLS = ["http://node-a:11434", "http://node-b:11434", "http://node-c:11434"]
+CHAT_REPLY = {"message": {"role": "assistant", "content": "ok"}, "done": True}
+
+
+def make_client(handler: Callable[[httpx.Request], httpx.Response]) -> OllamaClient:
+    client = OllamaClient(URLS)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def node(request: httpx.Request) -> str:
+    return f"{request.url.scheme}://{request.url.host}:{request.url.port}"
+
+
+async def chat(client: OllamaClient, affinity_key=None) -> Dict:
+    return await client.chat("llama3.1:8b", [{"role": "user", "content": "hi"}], affinity_key=affinity_key)
+
+
+@pytest.fixture(autouse=True)
+def backend_settings(monkeypatch):
+    monkeypatch.setattr(settings, "ollama_max_attempts", 3)
+    monkeypatch.setattr(settings, "ollama_eject_after_failures", 2)
+    monkeypatch.setattr(settings, "ollama_eject_seconds", 60)
+
+
+def test_least_outstanding_backend_is_picked():
+    calls: List[str] = []
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(node(request))
+            if len(calls) <= 2:
+                await release.wait()  # 前两个请求保持在途
+            return httpx.Response(200, json=CHAT_REPLY)
+
+        client = make_client(handler)
+        first = [asyncio.create_task(chat(client)) for _ in range(2)]
+        while len(calls) < 2:
+            await asyncio.sleep(0)
+        busy = set(calls)
+        await chat(client)  # 只有空闲的节点没有在途请求
+        assert calls[2] not in busy
+        release.set()
+        await asyncio.gather(*first)
+        assert [backend.outstanding for backend in client.backends] == [0, 0, 0]
+
+    asyncio.run(scenario())
+    assert len(set(calls[:2])) == 2
+
+
+def test_failed_request_is_retried_on_another_backend():
+    calls: List[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(node(request))
+        if node(request) == URLS[0]:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, json=CHAT_REPLY)
+
+    async def scenario():
+        client = make_client(handler)
+        for _ in range(3):
+            assert (await chat(client))["message"]["content"] == "ok"
+        return client
+
+    client = asyncio.run(scenario())
+    backend_a = client.backends[0]
+    assert backend_a.total_failures == calls.count(URLS[0]) >= 1
+    assert calls[-1] != URLS[0]
+
+
+def test_backend_is_ejected_after_consecutive_failures():
+    calls: List[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(node(request))
+        if node(request) == URLS[1]:
+            return httpx.Response(503)
+        return httpx.Response(200, json=CHAT_REPLY)
+
+    async def scenario():
+        client = make_client(handler)
+        backend_b = client.backends[1]
+        while backend_b.consecutive_failures < settings.ollama_eject_after_failures:
+            await chat(client)
+        assert backend_b.is_ejected
+        calls.clear()
+        for _ in range(6):
+            await chat(client)
+        assert URLS[1] not in calls
+        assert client.get_backend_stats()[1]["healthy"] is False
+
+    asyncio.run(scenario())
+
+
+def test_all_backends_failing_raises_unavailable():
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("connection refused", request=request)
+
+    async def scenario():
+        with pytest.raises(OllamaUnavailableError):
+            await chat(make_client(handler))
+
+    asyncio.run(scenario())
+
+
+def test_affinity_key_pins_to_crc32_backend():
+    calls: List[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(node(request))
+        return httpx.Response(200, json=CHAT_REPLY)
+
+    session_id = "session-42"
+    preferred = URLS[zlib.crc32(session_id.encode()) % len(URLS)]
+
+    async def scenario():
+        client = make_client(handler)
+        for _ in range(5):
+            await chat(client, affinity_key=session_id)
+        assert calls == [preferred] * 5
+
+        # 首选节点被摘除后改用其他节点
+        client.backends[URLS.index(preferred)].ejected_until = float("inf")
+        calls.clear()
+        await chat(client, affinity_key=session_id)
+        assert calls[0] != preferred
+
+    asyncio.run(scenario())
@@ -0,0 +1,39 @@
+"""
+逾期批处理与截止时间修改测试
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from app import overdue
+from app.database import AsyncSessionLocal
+
+
+def test_update_task_accepts_timezone_aware_due_date(client, auth_headers):
+    headers = auth_headers("teacher")
+    task = client.post("/api/v1/tasks/", headers=headers, json={
+        "title": "Essay", "task_type": "assignment", "course_id": 1,
+        "due_date": (datetime.utcnow() + timedelta(days=3)).isoformat(),
+    }).json()
+
+    response = client.put(f"/api/v1/tasks/{task['id']}", headers=headers,
+                          json={"due_date": "2030-01-01T08:00:00+08:00"})
+    assert response.status_code == 200, response.text
+    assert response.json()["due_date"] == "2030-01-01T00:00:00"
+
+
+def test_sweep_gives_up_on_repeated_conflicts(run, monkeypatch):
+    attempts = []
+
+    async def conflicting_batch(db, now, batch_size):
+        attempts.append(now)
+        raise IntegrityError("INSERT", {}, Exception("UNIQUE constraint failed"))
+
+    monkeypatch.setattr(overdue, "_insert_batch", conflicting_batch)
+
+    async def sweep():
+        async with AsyncSessionLocal() as db:
+            return await overdue.sweep_overdue(db)
+
+    stats = run(sweep)
+    assert stats["created"] == 0
+    assert len(attempts) == overdue.MAX_CONFLICT_RETRIES + 1
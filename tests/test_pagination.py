@@ -0,0 +1,39 @@
+"""
+游标分页测试：不带分页参数时返回完整列表，带 limit 时按游标翻页得到同样的结果
+"""
+
+from datetime import datetime, timedelta
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Task, TaskType
+from app.pagination import NEXT_CURSOR_HEADER
+
+
+def test_unpaged_request_returns_full_list_and_cursors_cover_it(client, auth_headers):
+    db = SessionLocal()
+    try:
+        due = datetime.utcnow() + timedelta(days=1)
+        db.add_all([
+            Task(title=f"Bulk {index}", task_type=TaskType.QUIZ, course_id=1, due_date=due, is_published=True)
+            for index in range(settings.default_page_size + 10)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+    headers = auth_headers("student1")
+    response = client.get("/api/v1/tasks/course/1", headers=headers)
+    full = [task["id"] for task in response.json()]
+    assert len(full) > settings.default_page_size
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+    paged, params = [], {"limit": 20}
+    while True:
+        response = client.get("/api/v1/tasks/course/1", headers=headers, params=params)
+        page = [task["id"] for task in response.json()]
+        assert len(page) <= 20
+        paged += page
+        if NEXT_CURSOR_HEADER not in response.headers:
+            break
+        params = {"limit": 20, "cursor": response.headers[NEXT_CURSOR_HEADER]}
+    assert paged == full
@@ -0,0 +1,183 @@
+"""
+N+1 回归测试：列表、日历和仪表板接口的查询条数不随行数增加，后台任务在懒加载保护下正常执行
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select
+from app.database import AsyncSessionLocal, LazyLoadError, SessionLocal
+from app.events import EventBus, record_event
+from app.models import (
+    CalendarEvent, Course, OutboxEvent, SubmissionAttachment, Task, TaskAttachment,
+    TaskStatus, TaskSubmission, TaskType, User
+)
+from app.overdue import sweep_overdue
+from app.reminders import ReminderScheduler
+
+WINDOW_START = (datetime.utcnow() - timedelta(days=1)).replace(microsecond=0).isoformat()
+WINDOW_END = (datetime.utcnow() + timedelta(days=30)).replace(microsecond=0).isoformat()
+
+STUDENT_ENDPOINTS = [
+    "/api/v1/courses/",
+    "/api/v1/courses/?view=summary",
+    "/api/v1/courses/all",
+    "/api/v1/courses/all?view=summary",
+    "/api/v1/courses/1/progress",
+    "/api/v1/tasks/",
+    "/api/v1/tasks/?view=summary",
+    "/api/v1/tasks/upcoming",
+    "/api/v1/tasks/course/1",
+    "/api/v1/tasks/course/1?view=summary",
+    "/api/v1/tasks/submissions/my",
+    "/api/v1/tasks/submissions/my?view=summary",
+    f"/api/v1/calendar/events?start_date={WINDOW_START}&end_date={WINDOW_END}",
+    f"/api/v1/calendar/events?start_date={WINDOW_START}&end_date={WINDOW_END}&view=summary",
+    f"/api/v1/calendar/weekly?week_start={WINDOW_START}",
+    f"/api/v1/calendar/range?start={WINDOW_START}&end={WINDOW_END}",
+    "/api/v1/calendar/dashboard",
+]
+
+
+def add_rows(count: int):
+    """为每门课程添加带附件的任务、学生1的带附件提交，以及课程和个人日历事件"""
+    db = SessionLocal()
+    try:
+        student = db.scalar(select(User).where(User.username == "student1"))
+        now = datetime.utcnow()
+        for course_id in db.scalars(select(Course.id)).all():
+            for index in range(count):
+                task = Task(
+                    title=f"Task {course_id}-{index}", task_type=TaskType.ASSIGNMENT, course_id=course_id,
+                    due_date=now + timedelta(days=2, hours=index), is_published=True
+                )
+                db.add(task)
+                db.flush()
+                db.add(TaskAttachment(task_id=task.id, filename="a.txt", file_path="a.txt", file_size=1, mime_type="text/plain"))
+                submission = TaskSubmission(task_id=task.id, user_id=student.id, status=TaskStatus.SUBMITTED)
+                db.add(submission)
+                db.flush()
+                db.add(SubmissionAttachment(
+                    submission_id=submission.id, filename="b.txt", file_path="b.txt", file_size=1, mime_type="text/plain"
+                ))
+                start = now + timedelta(days=1, hours=index)
+                db.add(CalendarEvent(title="class", start_time=start, end_time=start + timedelta(hours=1),
+                                     event_type="class", course_id=course_id))
+                db.add(CalendarEvent(title="study", start_time=start, end_time=start + timedelta(hours=1),
+                                     event_type="personal", user_id=student.id))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_lazy_load_guard_is_enabled(run):
+    async def touch_relationship():
+        async with AsyncSessionLocal() as db:
+            task = await db.scalar(select(Task).limit(1))
+            await db.run_sync(lambda session: task.course)
+
+    with pytest.raises(LazyLoadError):
+        run(touch_relationship)
+
+
+def test_list_endpoints_query_count_does_not_grow(client, auth_headers, queries):
+    headers = auth_headers("student1")
+    for path in STUDENT_ENDPOINTS:
+        assert client.get(path, headers=headers).status_code == 200, path
+
+    def count_queries():
+        counts = {}
+        for path in STUDENT_ENDPOINTS:
+            queries.clear()
+            response = client.get(path, headers=headers)
+            assert response.status_code == 200, (path, response.text)
+            counts[path] = len(queries)
+        return counts
+
+    before = count_queries()
+    add_rows(5)
+    after = count_queries()
+    assert after == before
+    assert max(after.values()) <= 10
+
+
+def test_teacher_task_list_query_count_does_not_grow(client, auth_headers, queries):
+    headers = auth_headers("teacher")
+    client.get("/api/v1/tasks/course/2", headers=headers)
+    queries.clear()
+    assert client.get("/api/v1/tasks/course/2", headers=headers).status_code == 200
+    before = len(queries)
+    add_rows(3)
+    queries.clear()
+    assert client.get("/api/v1/tasks/course/2", headers=headers).status_code == 200
+    assert len(queries) == before
+
+
+def test_overdue_sweep_statements_do_not_grow(run, queries):
+    def add_overdue_tasks(count: int):
+        db = SessionLocal()
+        try:
+            for index in range(count):
+                db.add(Task(title=f"Past {index}", task_type=TaskType.QUIZ, course_id=1,
+                            due_date=datetime.utcnow() - timedelta(hours=1), is_published=True))
+            db.commit()
+        finally:
+            db.close()
+
+    async def sweep():
+        async with AsyncSessionLocal() as db:
+            return await sweep_overdue(db)
+
+    add_overdue_tasks(1)
+    queries.clear()
+    first = run(sweep)
+    statements = len(queries)
+    add_overdue_tasks(5)
+    queries.clear()
+    second = run(sweep)
+    assert first["created"] == 2 and second["created"] == 10  # 课程1有两名学生
+    assert len(queries) == statements
+
+
+def test_outbox_dispatch_and_purge_with_guard(run, queries):
+    bus = EventBus()
+    received = []
+
+    async def handler(event_type, payload):
+        received.append((event_type, payload["n"]))
+
+    bus.subscribe("test.event", handler)
+
+    async def record(count: int):
+        async with AsyncSessionLocal() as db:
+            for n in range(count):
+                record_event(db, "test.event", {"n": n})
+            await db.commit()
+
+    async def dispatch():
+        async with AsyncSessionLocal() as db:
+            dispatched = await bus.dispatch_pending(db)
+            pending = await db.scalar(select(OutboxEvent.id).where(OutboxEvent.dispatched_at.is_(None)).limit(1))
+            return dispatched, pending
+
+    run(record, 2)
+    queries.clear()
+    assert run(dispatch)[0] >= 2
+    statements = len(queries)
+    run(record, 6)
+    queries.clear()
+    dispatched, pending = run(dispatch)
+    assert dispatched == 6 and pending is None
+    assert len(queries) == statements
+    assert received[-6:] == [("test.event", n) for n in range(6)]
+
+    async def purge():
+        async with AsyncSessionLocal() as db:
+            return await bus.purge_dispatched(db)
+
+    assert run(purge) == 0  # 保留期内的事件不删除
+
+
+def test_reminder_load_with_guard(run):
+    scheduler = ReminderScheduler()
+    run(scheduler.load, datetime.utcnow() + timedelta(days=30))
+    assert len(scheduler) > 0
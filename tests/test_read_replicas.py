@@ -0,0 +1,65 @@
+"""
+读写分离测试：两个SQLite数据库分别作为主库和（未同步的）副本
+"""
+
+from datetime import datetime, timedelta
+import sqlite3
+import time
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app import database
+from app.config import settings
+
+
+def test_read_your_writes_window_is_carried_in_header(client, auth_headers, run, tmp_path, monkeypatch):
+    # 副本为主库的快照，之后主库的写入不会同步过去
+    replica_path = tmp_path / "replica.db"
+    primary = sqlite3.connect(make_url(settings.database_url).database)
+    replica = sqlite3.connect(replica_path)
+    primary.backup(replica)
+    primary.close()
+    replica.close()
+
+    replica_engine = database.create_async_db_engine(f"sqlite+aiosqlite:///{replica_path}", "replica_test")
+    replica_factory = async_sessionmaker(bind=replica_engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(database, "ReplicaSessionLocals", [replica_factory])
+    try:
+        headers = auth_headers("student1")
+        start = datetime.utcnow().replace(microsecond=0) + timedelta(days=3)
+        response = client.post("/api/v1/calendar/events", headers=headers, json={
+            "title": "written to primary", "event_type": "personal",
+            "start_time": start.isoformat(), "end_time": (start + timedelta(hours=1)).isoformat(),
+        })
+        assert response.status_code == 200
+        window = response.headers[database.READ_YOUR_WRITES_HEADER]
+        until = float(window.rpartition(".")[0])
+        assert time.time() < until <= time.time() + settings.db_read_your_writes_seconds
+
+        # 下一个请求落到另一个工作进程：本进程的写入记录不可见
+        database.read_your_writes.last_writes.clear()
+        params = {"start_date": start.isoformat(), "end_date": (start + timedelta(days=1)).isoformat()}
+
+        def titles(extra_headers):
+            events = client.get("/api/v1/calendar/events", headers={**headers, **extra_headers}, params=params).json()
+            return [event["title"] for event in events]
+
+        assert "written to primary" not in titles({})
+        assert "written to primary" in titles({database.READ_YOUR_WRITES_HEADER: window})
+        expired = database.sign_read_your_writes_window("student1", time.time() - 1)
+        assert "written to primary" not in titles({database.READ_YOUR_WRITES_HEADER: expired})
+
+        # 客户端自行构造或延长的窗口不被接受
+        forged = [
+            f"{time.time() + 3600:.3f}",
+            f"{time.time() + 3600:.3f}.{window.rpartition('.')[2]}",
+            database.sign_read_your_writes_window("student2", until),
+            database.sign_read_your_writes_window("student1", time.time() + 3600),
+        ]
+        for value in forged:
+            assert "written to primary" not in titles({database.READ_YOUR_WRITES_HEADER: value}), value
+
+        # 读请求不返回窗口
+        assert database.READ_YOUR_WRITES_HEADER not in client.get("/api/v1/auth/me", headers=headers).headers
+    finally:
+        run(replica_engine.dispose)
+        database.pool_metrics.pop("replica_test", None)
@@ -0,0 +1,39 @@
+"""
+重复事件回归测试
+"""
+
+from datetime import datetime, timedelta
+
+
+def test_exception_cancels_occurrence_when_series_start_has_microseconds(client, auth_headers):
+    headers = auth_headers("student2")
+    start = (datetime.utcnow() + timedelta(days=1)).replace(microsecond=547099)
+    response = client.post("/api/v1/calendar/events", headers=headers, json={
+        "title": "standup", "event_type": "personal", "rrule": "FREQ=DAILY;COUNT=3",
+        "start_time": start.isoformat(), "end_time": (start + timedelta(minutes=15)).isoformat(),
+    })
+    assert response.status_code == 200, response.text
+    series = response.json()
+    assert series["start_time"] == start.replace(microsecond=0).isoformat()
+
+    # 客户端用创建请求中的（带微秒的）开始时间取消第一次发生
+    response = client.post(f"/api/v1/calendar/events/{series['id']}/exceptions", headers=headers,
+                           json={"occurrence_start": start.isoformat()})
+    assert response.status_code == 200, response.text
+
+    window = {
+        "start_date": (start - timedelta(days=1)).isoformat(),
+        "end_date": (start + timedelta(days=5)).isoformat(),
+    }
+    events = client.get("/api/v1/calendar/events", headers=headers, params=window).json()
+    starts = [event["start_time"] for event in events if event["id"] == series["id"]]
+    assert starts == [
+        (start.replace(microsecond=0) + timedelta(days=day)).isoformat() for day in (1, 2)
+    ]
+
+    weekly = client.get("/api/v1/calendar/weekly", headers=headers,
+                        params={"week_start": (start - timedelta(days=1)).isoformat()}).json()
+    weekly_starts = [
+        event["start_time"] for day in weekly["days"].values() for event in day["events"] if event["id"] == series["id"]
+    ]
+    assert weekly_starts == starts